@@ -0,0 +1,55 @@
+"""Periodic tasks.
+
+Celery beat reads this schedule when a broker is configured; without one,
+``manage.py run_scheduler`` runs the same entries in process. Schedules are
+intervals in seconds.
+"""
+
+SCHEDULE = {
+    'check-budget-alerts': {
+        'task': 'tracker.tasks.check_budget_alerts',
+        'schedule': 86400.0,  # Daily sweep; change events alert on writes as they happen
+    },
+    'check-bill-reminders': {
+        'task': 'tracker.tasks.check_bill_reminders',
+        'schedule': 3600.0,  # Run every hour
+    },
+    'calculate-financial-health': {
+        'task': 'tracker.tasks.calculate_financial_health_scores',
+        'schedule': 86400.0,  # Run daily
+    },
+    'generate-monthly-reports': {
+        'task': 'tracker.tasks.generate_monthly_reports',
+        'schedule': 86400.0,  # Run daily (but only executes on 1st of month)
+    },
+    'check-goal-milestones': {
+        'task': 'tracker.tasks.check_savings_goal_milestones',
+        'schedule': 86400.0,  # Daily sweep; change events alert on writes as they happen
+    },
+    'detect-unusual-spending': {
+        'task': 'tracker.tasks.detect_unusual_spending',
+        'schedule': 86400.0,  # Run daily
+    },
+    'send-hourly-digests': {
+        'task': 'tracker.tasks.send_notification_digests',
+        'schedule': 3600.0,  # Run every hour
+        'args': ('hourly',),
+    },
+    'send-daily-digests': {
+        'task': 'tracker.tasks.send_notification_digests',
+        'schedule': 86400.0,  # Run daily
+        'args': ('daily',),
+    },
+    'purge-old-notifications': {
+        'task': 'tracker.tasks.purge_old_notifications',
+        'schedule': 86400.0,  # Run daily
+    },
+    'process-change-events': {
+        'task': 'tracker.tasks.process_change_events',
+        'schedule': 60.0,  # Writes schedule their own run; this catches any that were dropped
+    },
+    'drain-mail-outbox': {
+        'task': 'tracker.tasks.drain_mail_outbox',
+        'schedule': 60.0,  # Run every minute, for retries and anything a worker dropped
+    },
+}
@@ -41,6 +41,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tracker.middleware.QueryInstrumentationMiddleware',
+    'tracker.middleware.SlowQueryMiddleware',
+    'tracker.middleware.MetricsMiddleware',
+    'tracker.middleware.ProfilingMiddleware',
+    'tracker.routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'expense_tracker.urls'
@@ -67,14 +72,36 @@ WSGI_APPLICATION = 'expense_tracker.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # Use dj-database-url to configure the database from DATABASE_URL
+# Connections are kept for DATABASE_CONN_MAX_AGE seconds and checked before
+# reuse. The default of 0 suits Neon's own pooler; raise it elsewhere so
+# requests skip connection setup.
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '0'))
 DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv('DATABASE_URL'),
-        conn_max_age=0,  # Disable connection pooling for Neon compatibility
+        conn_max_age=DATABASE_CONN_MAX_AGE,
         conn_health_checks=True  # Enable health checks
     )
 }
 
+# Optional read replica for analytics pages and scheduled scans (see
+# tracker/routers.py). Locally, point it at a second SQLite file and copy the
+# primary into it with `manage.py replica_status --sync`.
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL', '')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['tracker.routers.ReplicaRouter']
+REPLICA_VIEWS = os.getenv(
+    'REPLICA_VIEWS',
+    'dashboard,dashboard_enhanced,ai_insights,calendar_view,financial_health,generate_pdf_report,export_csv',
+).split(',')
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))  # Primary-only reads after a user writes
+REPLICA_HEALTH_CHECK_SECONDS = int(os.getenv('REPLICA_HEALTH_CHECK_SECONDS', '30'))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '30'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,6 +144,24 @@ LOGOUT_REDIRECT_URL = '/'
 
 # Email Configuration (for development - use console backend)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@expensetracker.com')
+
+# Mail outbox. Tasks queue emails in OutgoingEmail; the drainer sends them in
+# batches over one backend connection each and retries failures with
+# exponential backoff (MAIL_RETRY_BASE_SECONDS, doubling per attempt).
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', '100'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '5'))
+MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', '60'))
+MAIL_CLAIM_TIMEOUT = int(os.getenv('MAIL_CLAIM_TIMEOUT', '600'))  # Seconds before a crashed drainer's batch is retried
+MAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('MAIL_OUTBOX_RETENTION_DAYS', '7'))
+
+# Notification retention. Read notifications older than the retention period
+# are deleted daily in batches, or moved to NotificationArchive when archiving
+# is on. Unread notifications are kept however old they are.
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '90'))
+NOTIFICATION_PURGE_BATCH_SIZE = int(os.getenv('NOTIFICATION_PURGE_BATCH_SIZE', '1000'))
+NOTIFICATION_ARCHIVE = os.getenv('NOTIFICATION_ARCHIVE', 'False').lower() == 'true'
+NOTIFICATIONS_PER_PAGE = int(os.getenv('NOTIFICATIONS_PER_PAGE', '20'))
 
 # Caching Configuration for Performance
 CACHES = {
@@ -134,6 +179,123 @@ CACHES = {
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'
 
+# Background jobs
+# When CELERY_BROKER_URL is set, background work is queued on Celery; otherwise
+# it runs on a small in-process thread pool inside the web worker.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+
+# Scheduled tasks hold a lease so runs never overlap. The lease is renewed
+# every third of its length while a run is alive and lapses this many seconds
+# after a worker dies. Runs are recorded in TaskRun (see manage.py task_history).
+TASK_LOCK_LEASE_SECONDS = int(os.getenv('TASK_LOCK_LEASE_SECONDS', '300'))
+TASK_LOCK_RETRY_SECONDS = int(os.getenv('TASK_LOCK_RETRY_SECONDS', '60'))  # Delay before a queued run retries
+
+# Expense, budget and goal writes append change events; a consumer run starts
+# CHANGE_EVENTS_DELAY seconds after a write commits and evaluates only the
+# budgets, goals and users those events touched (see utils.change_events).
+CHANGE_EVENTS_DELAY = float(os.getenv('CHANGE_EVENTS_DELAY', '2'))
+CHANGE_EVENTS_BATCH_SIZE = int(os.getenv('CHANGE_EVENTS_BATCH_SIZE', '500'))
+
+# Without a broker, `manage.py run_scheduler` runs the periodic tasks in
+# expense_tracker/schedule.py on SCHEDULER_WORKERS threads, at most
+# SCHEDULER_TASK_CONCURRENCY runs of a task at once, each with a time limit.
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '2'))
+SCHEDULER_TASK_CONCURRENCY = int(os.getenv('SCHEDULER_TASK_CONCURRENCY', '1'))
+SCHEDULER_TASK_TIMEOUT = int(os.getenv('SCHEDULER_TASK_TIMEOUT', '1800'))
+SCHEDULER_STATE_FILE = os.getenv('SCHEDULER_STATE_FILE', str(BASE_DIR / '.scheduler-state.json'))
+
+# Per-user scheduled tasks split the users into up to TASK_SHARDS id ranges,
+# one per TASK_SHARD_MIN_USERS users, and run one shard per worker. Shard
+# starts are spread over the window plus random jitter to smooth the load.
+TASK_SHARDS = int(os.getenv('TASK_SHARDS', '1'))
+TASK_SHARD_MIN_USERS = int(os.getenv('TASK_SHARD_MIN_USERS', '1000'))
+TASK_SHARD_WINDOW_SECONDS = int(os.getenv('TASK_SHARD_WINDOW_SECONDS', '600'))
+TASK_SHARD_JITTER_SECONDS = int(os.getenv('TASK_SHARD_JITTER_SECONDS', '30'))
+
+# Transaction import pipeline
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_ASYNC_THRESHOLD = int(os.getenv('IMPORT_ASYNC_THRESHOLD', str(512 * 1024)))  # Bytes
+IMPORT_ERROR_REPORT_LIMIT = int(os.getenv('IMPORT_ERROR_REPORT_LIMIT', '500'))
+
+# PDF reports are rendered by background jobs into default storage. Behind nginx,
+# set this to an internal location aliased to MEDIA_ROOT (e.g. /protected-media/)
+# so downloads are sent by nginx via X-Accel-Redirect instead of a web worker.
+REPORT_ACCEL_REDIRECT_PREFIX = os.getenv('REPORT_ACCEL_REDIRECT_PREFIX', '')
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', '600'))  # Seconds before an unfinished job is replaced
+
+# Monthly PDF statements, rendered in batches on a process pool at month end.
+# The monthly email links to the statement (SITE_URL builds the absolute link)
+# and attaches it too when MONTHLY_STATEMENT_ATTACH is on.
+STATEMENT_WORKERS = int(os.getenv('STATEMENT_WORKERS', str(os.cpu_count() or 1)))
+STATEMENT_CHUNK_SIZE = int(os.getenv('STATEMENT_CHUNK_SIZE', '100'))
+MONTHLY_STATEMENT_ATTACH = os.getenv('MONTHLY_STATEMENT_ATTACH', 'False').lower() == 'true'
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000').rstrip('/')
+
+# Live events for open pages. Under ASGI they are streamed as server-sent
+# events; under WSGI pages long-poll instead. LocalBroker only reaches pages
+# served by the same process; use tracker.utils.events.CacheBroker with a
+# shared cache (Redis, Memcached) when there are several web or Celery workers.
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'tracker.utils.events.LocalBroker')
+EVENTS_CACHE_ALIAS = os.getenv('EVENTS_CACHE_ALIAS', 'default')
+EVENTS_HISTORY = int(os.getenv('EVENTS_HISTORY', '100'))  # Events kept per user for reconnecting pages
+EVENTS_TTL = int(os.getenv('EVENTS_TTL', '600'))  # Seconds, CacheBroker only
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '1.0'))  # Seconds between broker checks
+EVENTS_LONG_POLL_TIMEOUT = float(os.getenv('EVENTS_LONG_POLL_TIMEOUT', '25'))
+EVENTS_STREAM_MAX_SECONDS = float(os.getenv('EVENTS_STREAM_MAX_SECONDS', '300'))
+
+# Sections of the enhanced dashboard and AI insights pages load concurrently
+# on a shared pool of WIDGET_WORKERS threads (see tracker/utils/widgets.py),
+# under WSGI and ASGI alike. Each thread may hold a database connection, so
+# count them against the database's connection limit. A section slower than
+# WIDGET_TIMEOUT_SECONDS is shown as unavailable. WIDGET_WORKERS=1 loads the
+# sections one after another on the request's connection.
+WIDGET_WORKERS = int(os.getenv('WIDGET_WORKERS', '8'))
+WIDGET_TIMEOUT_SECONDS = float(os.getenv('WIDGET_TIMEOUT_SECONDS', '3'))
+
+# Query instrumentation (per-request query counts and N+1 detection)
+QUERY_INSTRUMENTATION_ENABLED = os.getenv('QUERY_INSTRUMENTATION', str(DEBUG)).lower() == 'true'
+QUERY_INSTRUMENTATION_HEADERS = os.getenv('QUERY_INSTRUMENTATION_HEADERS', 'False').lower() == 'true'
+QUERY_COUNT_THRESHOLD = int(os.getenv('QUERY_COUNT_THRESHOLD', '50'))
+QUERY_TIME_THRESHOLD_MS = float(os.getenv('QUERY_TIME_THRESHOLD_MS', '500'))
+QUERY_DUPLICATE_THRESHOLD = int(os.getenv('QUERY_DUPLICATE_THRESHOLD', '5'))
+
+# Slow-query log. Queries over the threshold are stored per fingerprint with
+# their EXPLAIN plan; ANALYZE (PostgreSQL only) runs the query a second time.
+SLOW_QUERY_ENABLED = os.getenv('SLOW_QUERY_ENABLED', 'True').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'False').lower() == 'true'
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '3600'))  # Seconds
+SLOW_QUERY_REDACT_PARAMS = os.getenv('SLOW_QUERY_REDACT_PARAMS', 'True').lower() == 'true'
+
+# Prometheus metrics. Every process writes its samples to METRICS_DIR, which
+# must be shared by all gunicorn workers; /metrics aggregates the files.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# On-demand profiling. Staff add ?_profile=1 or an X-Profile: 1 header to a
+# request; PROFILING_SAMPLE_RATE is the percentage of all requests profiled.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', '0.005'))  # Seconds
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '200'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tracker': {
+            'handlers': ['console'],
+            'level': os.getenv('TRACKER_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 # Advanced features will be enabled after installing dependencies
 # Django Allauth, Celery, and other advanced features are commented out
 # until the required packages are installed
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals
+        from .utils.slow_queries import install
+
+        connection_created.connect(install, dispatch_uid='tracker_slow_query_log')
+        signals.connect()
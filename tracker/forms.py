@@ -19,7 +19,18 @@ class ProfileForm(forms.ModelForm):
         fields = ('phone', 'currency', 'timezone', 'profile_pic')
 
 
-class TransactionForm(forms.ModelForm):
+class AccountChoicesMixin:
+    """Load account choices with their user; Account.__str__ shows the username"""
+    account_fields = ('account', 'transfer_account')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.account_fields:
+            if name in self.fields:
+                self.fields[name].queryset = self.fields[name].queryset.select_related('user')
+
+
+class TransactionForm(AccountChoicesMixin, forms.ModelForm):
     class Meta:
         model = Transaction
         fields = ('amount', 'category', 'account', 'transfer_account', 'trans_type', 'date', 'time', 'description', 'receipt', 'tags')
@@ -30,7 +41,34 @@ class TransactionForm(forms.ModelForm):
 
 
 class CSVUploadForm(forms.Form):
+    """Upload form for CSV, OFX/QFX and QIF imports with an optional CSV column mapping"""
+    MAPPED_FIELDS = ('date', 'amount', 'description', 'type', 'category', 'account', 'tags')
+    FORMAT_CHOICES = (
+        ('auto', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX / QFX'),
+        ('qif', 'QIF'),
+    )
+
     file = forms.FileField()
+    file_format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='auto', required=False)
+    date_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'date'}))
+    amount_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'amount'}))
+    description_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'description'}))
+    type_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'type'}))
+    category_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'category'}))
+    account_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'account'}))
+    tags_column = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'placeholder': 'tags'}))
+    skip_duplicates = forms.BooleanField(required=False, initial=True,
+                                         help_text="Skip rows that match a transaction you already have")
+
+    def column_mapping(self):
+        """Return the {field: header} overrides entered by the user"""
+        return {
+            field: self.cleaned_data[f'{field}_column'].strip()
+            for field in self.MAPPED_FIELDS
+            if self.cleaned_data.get(f'{field}_column', '').strip()
+        }
 
 
 class BudgetForm(forms.ModelForm):
@@ -43,7 +81,7 @@ class BudgetForm(forms.ModelForm):
         }
 
 
-class RecurringTransactionForm(forms.ModelForm):
+class RecurringTransactionForm(AccountChoicesMixin, forms.ModelForm):
     class Meta:
         model = RecurringTransaction
         fields = ('amount', 'category', 'account', 'trans_type', 'description', 'tags', 'frequency', 'next_date', 'end_date', 'active')
@@ -59,7 +97,7 @@ class TransactionSplitForm(forms.ModelForm):
         fields = ('category', 'amount')
 
 
-class TransactionTemplateForm(forms.ModelForm):
+class TransactionTemplateForm(AccountChoicesMixin, forms.ModelForm):
     class Meta:
         model = TransactionTemplate
         fields = ('name', 'amount', 'category', 'account', 'trans_type', 'description', 'tags')
@@ -87,7 +125,7 @@ class GoalContributionForm(forms.ModelForm):
         }
 
 
-class BillForm(forms.ModelForm):
+class BillForm(AccountChoicesMixin, forms.ModelForm):
     class Meta:
         model = Bill
         fields = ('name', 'amount', 'category', 'account', 'due_date', 'frequency', 'description', 'reminder_days', 'auto_pay')
@@ -134,4 +172,4 @@ class AdvancedSearchForm(forms.Form):
         if user:
             from .models import Category, Account
             self.fields['category'].queryset = Category.objects.all()
-            self.fields['account'].queryset = Account.objects.filter(user=user)
+            self.fields['account'].queryset = Account.objects.filter(user=user).select_related('user')
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from tracker.utils.benchmarks import celery_eager
+from tracker.utils.query_budgets import TASK_BUDGETS, VIEW_BUDGETS, check_results, measure_dataset
+
+
+class Command(BaseCommand):
+    help = ('Check that every view and task stays within its query budget and that '
+            'query counts do not grow when the dataset doubles')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=2, help='Dataset multiplier for the second run (default: 2)')
+        parser.add_argument('--only', help='Comma-separated view URL names or task names to check')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        only = set(options['only'].split(',')) if options['only'] else None
+        views = [name for name in VIEW_BUDGETS if only is None or name in only]
+        tasks = [name for name in TASK_BUDGETS if only is None or name in only]
+        self.errors = set()
+
+        # Measure against a throwaway test database, never the real one
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            with celery_eager():
+                base = self.measure(1, views, tasks)
+                scaled = self.measure(options['scale'], views, tasks)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        rows, failures = check_results(base, scaled)
+        failures += [f"{name}: request failed" for name in sorted(self.errors)]
+        width = max((len(row[0]) for row in rows), default=10)
+        self.stdout.write(f"{'target'.ljust(width)}  budget   x1   x{options['scale']}  status")
+        for name, budget, count, scaled_count, status in rows:
+            line = f"{name.ljust(width)}  {budget:6d} {count:4d} {scaled_count:4d}  {status}"
+            self.stdout.write(line if status == 'ok' else self.style.ERROR(line))
+
+        if failures:
+            raise CommandError(f"{len(failures)} query budget failures:\n" + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f"All {len(rows)} targets within their query budgets"))
+
+    def measure(self, scale, views, tasks):
+        counts, failed = measure_dataset(scale, views, tasks)
+        for name in failed:
+            self.errors.add(name)
+            self.stderr.write(self.style.ERROR(f"{name} failed with a server error"))
+        return counts
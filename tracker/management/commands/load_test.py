@@ -0,0 +1,129 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tracker.models import Account, Category
+from tracker.utils.loadtest import (
+    DEFAULT_MIX, LoadTestError, Session, balance_snapshot, cache_counts, cache_hit_rates, check_balances,
+    parse_mix, run_load, start_server, stop_server, summarize_samples,
+)
+
+
+class Command(BaseCommand):
+    help = ('Start the app under gunicorn and drive it with many concurrent simulated users; '
+            'report throughput, latency, errors and balance consistency')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Load-test a server that is already running instead of starting gunicorn')
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes (default: 4)')
+        parser.add_argument('--threads', type=int, default=1, help='Threads per gunicorn worker (default: 1)')
+        parser.add_argument('--port', type=int, default=8765, help='Port for the local server (default: 8765)')
+        parser.add_argument('--server-log', help='Append gunicorn output to this file')
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent simulated users (default: 20)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run after ramp-up (default: 30)')
+        parser.add_argument('--ramp-up', type=float, default=2, help='Seconds over which clients start (default: 2)')
+        parser.add_argument('--requests', type=int, help='Stop each client after this many journeys')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Journey weights (default: {DEFAULT_MIX})')
+        parser.add_argument('--prefix', default='bench', help='Username prefix of seeded users (default: bench)')
+        parser.add_argument('--password', default='benchpass', help='Password of the seeded users')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--max-error-rate', type=float,
+                            help='Exit with an error when the overall error rate is above this fraction')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except LoadTestError as e:
+            raise CommandError(str(e))
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_user_").order_by('pk'))
+        if not users:
+            raise CommandError('No seeded users found. Run seed_benchmark_data first.')
+        if connection.vendor == 'sqlite' and not options['url'] and options['workers'] > 1:
+            self.stderr.write(self.style.WARNING(
+                'SQLite serializes writes across workers; use PostgreSQL for worker sizing'
+            ))
+
+        user_ids = [user.pk for user in users]
+        snapshot = balance_snapshot(user_ids)
+        caches_before = cache_counts()
+        process = None
+        base_url = options['url']
+        try:
+            if not base_url:
+                process, base_url = start_server(options['port'], options['workers'], options['threads'],
+                                                 log_file=options['server_log'])
+                self.stderr.write(f"Started gunicorn with {options['workers']} workers at {base_url}")
+            sessions = self.login(base_url, users, options)
+            self.stderr.write(f"Running {len(sessions)} clients for {options['duration']}s...")
+            samples, elapsed = run_load(sessions, mix, options['duration'], options['requests'], options['ramp_up'])
+        except LoadTestError as e:
+            raise CommandError(str(e))
+        finally:
+            if process is not None:
+                stop_server(process)
+
+        summary = summarize_samples(samples, elapsed)
+        # Workers flush metrics on exit; with --url the counts may lag by METRICS_FLUSH_INTERVAL
+        caches = cache_hit_rates(caches_before, cache_counts())
+        mismatches = check_balances(user_ids, snapshot)
+        report = {
+            'meta': {
+                'url': base_url,
+                'workers': None if options['url'] else options['workers'],
+                'threads': None if options['url'] else options['threads'],
+                'clients': len(sessions),
+                'elapsed_seconds': round(elapsed, 2),
+                'mix': mix,
+                'database': connection.vendor,
+            },
+            'results': summary,
+            'caches': caches,
+            'balance_mismatches': [
+                {'account': pk, 'expected': str(expected), 'actual': str(actual)}
+                for pk, expected, actual in mismatches
+            ],
+        }
+
+        self.print_summary(summary)
+        for cache_name, row in caches.items():
+            self.stdout.write(f"{cache_name} cache: {row['hit_rate']:.1%} hit rate "
+                              f"({row['hits']} hits, {row['misses']} misses)")
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Wrote load test report to {options['output']}"))
+
+        if mismatches:
+            for pk, expected, actual in mismatches:
+                self.stderr.write(self.style.ERROR(f"Account {pk}: expected balance {expected}, found {actual}"))
+            raise CommandError(f"{len(mismatches)} account balances are inconsistent")
+        self.stdout.write(self.style.SUCCESS(f"Balances consistent across {len(snapshot[0])} accounts"))
+
+        total = summary.get('total', {})
+        if options['max_error_rate'] is not None and total.get('error_rate', 0) > options['max_error_rate']:
+            raise CommandError(f"Error rate {total['error_rate']:.2%} is above {options['max_error_rate']:.2%}")
+
+    def login(self, base_url, users, options):
+        accounts, categories = {}, list(Category.objects.values_list('pk', flat=True))
+        for user_id, account_id in Account.objects.filter(user__in=users).values_list('user_id', 'pk'):
+            accounts.setdefault(user_id, []).append(account_id)
+        sessions = []
+        for i in range(options['clients']):
+            # More clients than users means several sessions share a user, as with multiple devices
+            user = users[i % len(users)]
+            if not accounts.get(user.pk):
+                raise CommandError(f"{user.username} has no accounts")
+            session = Session(base_url, user.username, accounts[user.pk], categories)
+            session.login(options['password'])
+            sessions.append(session)
+        return sessions
+
+    def print_summary(self, summary):
+        self.stdout.write(f"{'journey':<20} {'requests':>8} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'p99 ms':>9} {'errors':>7}")
+        for name, row in summary.items():
+            line = (f"{name:<20} {row['requests']:>8} {row['rps']:>8} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                    f"{row['p99_ms']:>9} {row['errors']:>7}")
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
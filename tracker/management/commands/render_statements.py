@@ -0,0 +1,56 @@
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.utils.pdf_statements import generate_statements, statement_period, statement_workers
+
+
+class Command(BaseCommand):
+    help = ('Render monthly PDF statements for many users on a process pool and store them '
+            'where the report view serves them from')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Statement month as YYYY-MM (default: last month)')
+        parser.add_argument('--users', help='Comma-separated usernames (default: users opted in to monthly reports)')
+        parser.add_argument('--all-users', action='store_true', help='Render statements for every active user')
+        parser.add_argument('--workers', type=int,
+                            help='Render processes (default: STATEMENT_WORKERS); 1 renders in this process')
+        parser.add_argument('--chunk-size', type=int, help='Users loaded per batch (default: STATEMENT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        month = None
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must look like 2024-01')
+        start_date, end_date = statement_period(month)
+
+        if options['users']:
+            usernames = [name.strip() for name in options['users'].split(',') if name.strip()]
+            users = User.objects.filter(username__in=usernames)
+        elif options['all_users']:
+            users = User.objects.filter(is_active=True)
+        else:
+            users = User.objects.filter(userpreferences__monthly_reports=True)
+        users = list(users.order_by('pk'))
+        if not users:
+            raise CommandError('No users to render statements for')
+
+        workers = statement_workers(options['workers'])
+        self.stderr.write(f"Rendering {start_date:%B %Y} statements for {len(users)} users "
+                          f"with {max(workers, 1)} process(es)...")
+
+        def progress(done, rendered):
+            self.stderr.write(f"  {done}/{len(users)} users, {rendered} rendered")
+
+        start = time.perf_counter()
+        paths, rendered = generate_statements(users, start_date, end_date, workers=workers,
+                                              chunk_size=options['chunk_size'], progress=progress)
+        elapsed = time.perf_counter() - start
+        rate = f", {rendered / elapsed:.1f} statements/s" if rendered and elapsed else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} statements, {len(paths) - rendered} already stored, in {elapsed:.1f}s{rate}"
+        ))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tracker.routers import REPLICA, check_replica, replica_configured, replica_lag
+
+
+class Command(BaseCommand):
+    help = 'Show whether the read replica is reachable and how far behind it is'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true',
+                            help='Copy the primary SQLite database into the replica (local testing only)')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            self.stdout.write('No read replica configured (set DATABASE_REPLICA_URL); all reads use the primary')
+            return
+        if options['sync']:
+            self.sync_sqlite()
+
+        replica = settings.DATABASES[REPLICA]
+        self.stdout.write(f"Replica: {replica['ENGINE'].rsplit('.', 1)[-1]} {replica.get('HOST') or replica['NAME']}")
+        self.stdout.write(f"Connections kept for {settings.DATABASE_CONN_MAX_AGE}s, health checked before reuse")
+        self.stdout.write(f"Views read from the replica: {', '.join(settings.REPLICA_VIEWS)}")
+        healthy = check_replica()
+        if healthy:
+            self.stdout.write(self.style.SUCCESS(f"Healthy, {replica_lag():.1f}s behind"))
+        else:
+            self.stdout.write(self.style.WARNING('Unhealthy: reads stay on the primary until it recovers'))
+
+    def sync_sqlite(self):
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('--sync only copies SQLite databases; real replicas use database replication')
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+        self.stdout.write(f"Copied {primary.settings_dict['NAME']} into {replica.settings_dict['NAME']}")
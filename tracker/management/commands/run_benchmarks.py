@@ -0,0 +1,117 @@
+import json
+import platform
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from tracker.models import Transaction
+from tracker.utils.benchmarks import TASK_TARGETS, VIEW_TARGETS, celery_eager, compare, run_task, run_view
+
+
+class Command(BaseCommand):
+    help = 'Time the heavy views and Celery tasks and compare p95 latency and query counts to a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to benchmark as (default: first seeded bench user)')
+        parser.add_argument('--iterations', type=int, default=10, help='Timed runs per target (default: 10)')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per target (default: 1)')
+        parser.add_argument('--only', help='Comma-separated target names to run')
+        parser.add_argument('--skip-views', action='store_true')
+        parser.add_argument('--skip-tasks', action='store_true')
+        parser.add_argument('--warm-cache', action='store_true', help='Keep the dashboard cache and rendered reports between runs')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--baseline', help='Compare against a JSON report saved earlier')
+        parser.add_argument('--save-baseline', help='Also write the report to this baseline file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed relative p95 slowdown before flagging a regression (default: 0.25)')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Ignore p95 slowdowns smaller than this many ms (default: 5)')
+        parser.add_argument('--query-slack', type=int, default=0,
+                            help='Extra queries allowed over the baseline (default: 0)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error on regressions')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        user = self.get_user(options['user'])
+        only = set(options['only'].split(',')) if options['only'] else None
+        unknown = only - set(VIEW_TARGETS) - set(TASK_TARGETS) if only else set()
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+        results = {}
+        # Allows the test client's host and sends mail to the in-memory outbox
+        setup_test_environment()
+        try:
+            if not options['skip_views']:
+                client = Client()
+                client.force_login(user)
+                for name in VIEW_TARGETS:
+                    if only is None or name in only:
+                        results[name] = run_view(client, user, name, options['iterations'],
+                                                 options['warmup'], options['warm_cache'])
+                        self.progress(name, results[name])
+            if not options['skip_tasks']:
+                self.run_tasks(user, only, options, results)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'user': user.username,
+                'transactions': Transaction.objects.filter(user=user).count(),
+                'iterations': options['iterations'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+            },
+            'results': results,
+        }
+
+        regressions = []
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(results, baseline.get('results', {}), options['threshold'],
+                                  options['min_delta_ms'], options['query_slack'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}"))
+        else:
+            self.stdout.write(output)
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(output)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['save_baseline']}"))
+
+        for regression in regressions:
+            self.stderr.write(self.style.ERROR(f"Regression: {regression}"))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} benchmark regressions")
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username} does not exist")
+        user = User.objects.filter(username__startswith='bench_user_').order_by('pk').first()
+        if user is None:
+            raise CommandError('No benchmark data found. Run seed_benchmark_data first or pass --user.')
+        return user
+
+    def run_tasks(self, user, only, options, results):
+        with celery_eager():
+            for name in TASK_TARGETS:
+                if only is None or name in only:
+                    results[name] = run_task(user, name, options['iterations'], options['warmup'])
+                    self.progress(name, results[name])
+
+    def progress(self, name, result):
+        if self.verbosity:
+            self.stderr.write(f"{name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, {result['queries']} queries")
@@ -0,0 +1,53 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from expense_tracker.schedule import SCHEDULE
+from tracker.utils.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the periodic tasks in process, for deployments without a Celery broker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Tasks run at the same time (default: SCHEDULER_WORKERS)')
+        parser.add_argument('--processes', action='store_true',
+                            help='Run each task in its own process so time limits can stop it')
+        parser.add_argument('--once', action='store_true', help='Run what is due, wait for it and exit (for cron)')
+        parser.add_argument('--only', action='append', metavar='ENTRY', help='Only this schedule entry (repeatable)')
+        parser.add_argument('--list', action='store_true', help='Show the schedule and when each entry is due')
+
+    def handle(self, *args, **options):
+        schedule = SCHEDULE
+        if options['only']:
+            unknown = set(options['only']) - set(SCHEDULE)
+            if unknown:
+                self.stderr.write(f"Unknown schedule entries: {', '.join(sorted(unknown))}")
+                return
+            schedule = {name: SCHEDULE[name] for name in options['only']}
+
+        scheduler = Scheduler(schedule, workers=options['workers'], processes=options['processes'])
+        if options['list']:
+            import time
+            now = time.time()
+            for entry in scheduler.entries:
+                due = max(0, entry.seconds_until_due(now))
+                self.stdout.write(f"{entry.name:<28} {entry.task:<48} every {entry.interval:>7.0f}s  "
+                                  f"{'due now' if not due else f'due in {due:.0f}s'}")
+            return
+
+        logging.getLogger('tracker.utils.scheduler').setLevel(logging.INFO)
+        if options['once']:
+            scheduler.run_once()
+            return
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running tasks finish...')
+            scheduler.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f"Scheduler running {len(scheduler.entries)} entries on {scheduler.workers} workers")
+        scheduler.run_forever()
+        scheduler.shutdown()
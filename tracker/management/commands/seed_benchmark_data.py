@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from tracker.models import Transaction
+from tracker.utils.seeding import seed_users
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic users and years of transactions for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create (default: 10)')
+        parser.add_argument('--years', type=int, default=2, help='Years of transaction history (default: 2)')
+        parser.add_argument('--transactions-per-month', type=int, default=60,
+                            help='Average expense transactions per user per month (default: 60)')
+        parser.add_argument('--accounts', type=int, default=4, help='Accounts per user, up to 5 (default: 4)')
+        parser.add_argument('--budgets', type=int, default=6, help='Budgets per user (default: 6)')
+        parser.add_argument('--bills', type=int, default=5, help='Bills per user (default: 5)')
+        parser.add_argument('--goals', type=int, default=3, help='Savings goals per user (default: 3)')
+        parser.add_argument('--recurring', type=int, default=4, help='Recurring rules per user (default: 4)')
+        parser.add_argument('--templates', type=int, default=3, help='Transaction templates per user (default: 3)')
+        parser.add_argument('--split-ratio', type=float, default=0.05,
+                            help='Share of expenses that are split across two categories (default: 0.05)')
+        parser.add_argument('--notifications', type=int, default=20, help='Notifications per user (default: 20)')
+        parser.add_argument('--prefix', default='bench', help='Username prefix (default: bench)')
+        parser.add_argument('--password', default='benchpass', help='Password for every seeded user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded users with this prefix first')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        seeded = User.objects.filter(username__startswith=f"{prefix}_user_")
+        if options['clear']:
+            deleted = seeded.count()
+            seeded.delete()
+            self.stdout.write(f"Deleted {deleted} existing {prefix} users")
+            start_index = 0
+        else:
+            start_index = seeded.count()
+
+        users = seed_users(
+            users=options['users'], years=options['years'], accounts=options['accounts'],
+            transactions_per_month=options['transactions_per_month'], budgets=options['budgets'],
+            bills=options['bills'], goals=options['goals'], recurring=options['recurring'],
+            templates=options['templates'], split_ratio=options['split_ratio'], notifications=options['notifications'],
+            prefix=prefix, password=options['password'], seed=options['seed'],
+            start_index=start_index, log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        transactions = Transaction.objects.filter(user__in=users).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users with {transactions} transactions "
+            f"(log in as {users[0].username if users else prefix + '_user_0'} / {options['password']})"
+        ))
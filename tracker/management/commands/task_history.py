@@ -0,0 +1,59 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.models import TaskLock, TaskRun
+from tracker.utils.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = 'Summarize recorded runs of the scheduled tasks and show the locks currently held'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Look back this many days (default: 30)')
+        parser.add_argument('--task', help='Only this task')
+        parser.add_argument('--purge', type=int, metavar='DAYS', help='Delete runs older than DAYS first')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['purge'] is not None:
+            deleted, _ = TaskRun.objects.filter(started_at__lt=now - timedelta(days=options['purge'])).delete()
+            self.stdout.write(f"Deleted {deleted} old runs")
+
+        runs = TaskRun.objects.filter(started_at__gte=now - timedelta(days=options['days']))
+        if options['task']:
+            runs = runs.filter(task_name=options['task'])
+        by_task = defaultdict(list)
+        for run in runs.order_by('started_at').values('task_name', 'outcome', 'duration_ms', 'rows_processed',
+                                                       'started_at'):
+            by_task[run['task_name']].append(run)
+
+        header = (f"{'task':<36} {'runs':>5} {'ok':>5} {'fail':>5} {'skip':>5} "
+                  f"{'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'avg rows':>9}  last run")
+        self.stdout.write(header)
+        for name in sorted(by_task):
+            task_runs = by_task[name]
+            outcomes = defaultdict(int)
+            for run in task_runs:
+                outcomes[run['outcome']] += 1
+            # Skipped runs did no work, so they stay out of the timings
+            worked = [run for run in task_runs if run['outcome'] != 'skipped']
+            durations = [run['duration_ms'] for run in worked]
+            avg_rows = sum(run['rows_processed'] for run in worked) / len(worked) if worked else 0
+            self.stdout.write(
+                f"{name:<36} {len(task_runs):>5} {outcomes['success']:>5} {outcomes['failure']:>5} "
+                f"{outcomes['skipped']:>5} {percentile(durations, 50):>9.0f} {percentile(durations, 95):>9.0f} "
+                f"{max(durations, default=0):>9.0f} {avg_rows:>9.0f}  {task_runs[-1]['started_at']:%Y-%m-%d %H:%M}"
+            )
+        if not by_task:
+            self.stdout.write('No runs recorded in this period')
+
+        locks = list(TaskLock.objects.order_by('name'))
+        if locks:
+            self.stdout.write('\nLocks held:')
+            for lock in locks:
+                state = 'expired' if lock.expires_at < now else f"expires in {(lock.expires_at - now).seconds}s"
+                self.stdout.write(f"  {lock.name}: since {lock.acquired_at:%Y-%m-%d %H:%M:%S}, "
+                                  f"last heartbeat {lock.heartbeat_at:%H:%M:%S}, {state}")
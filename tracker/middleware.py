@@ -0,0 +1,173 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+from .utils import metrics
+from .utils.instrumentation import QueryRecorder, current_source, record_queries
+from .utils.profiling import profile_call, profile_trigger, save_profile
+
+
+logger = logging.getLogger('tracker.queries')
+profiling_logger = logging.getLogger('tracker.profiling')
+
+OFFENDERS_CACHE_KEY = 'query_instrumentation:offenders'
+
+
+def request_source(request):
+    """Name requests by URL name so offenders group per view"""
+    match = getattr(request, 'resolver_match', None)
+    if match and match.url_name:
+        return match.url_name
+    return request.path
+
+
+class QueryInstrumentationMiddleware:
+    """Count queries per request and report views that look like N+1 offenders.
+
+    A request is an offender when it exceeds QUERY_COUNT_THRESHOLD queries,
+    QUERY_TIME_THRESHOLD_MS of database time, or repeats one query
+    fingerprint QUERY_DUPLICATE_THRESHOLD times. Offenders are logged to
+    the ``tracker.queries`` logger and kept in the cache for the staff
+    query report.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.count_threshold = settings.QUERY_COUNT_THRESHOLD
+        self.time_threshold = settings.QUERY_TIME_THRESHOLD_MS
+        self.duplicate_threshold = settings.QUERY_DUPLICATE_THRESHOLD
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = current_source.set(request.path)
+        try:
+            with record_queries(recorder):
+                response = self.get_response(request)
+        finally:
+            current_source.reset(token)
+
+        source = request_source(request)
+        report = recorder.report(duplicate_threshold=self.duplicate_threshold)
+        if (recorder.count > self.count_threshold
+                or report['db_time_ms'] > self.time_threshold
+                or report['duplicates']):
+            self.report_offender(source, request, report)
+
+        if settings.DEBUG or getattr(settings, 'QUERY_INSTRUMENTATION_HEADERS', False):
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = str(report['db_time_ms'])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_source.set(request_source(request))
+
+    def report_offender(self, source, request, report):
+        logger.warning(
+            "%s ran %d queries (%.1f ms DB), %d repeated query patterns",
+            source, report['query_count'], report['db_time_ms'], len(report['duplicates']),
+            extra={'query_report': report},
+        )
+        for duplicate in report['duplicates']:
+            logger.info("%s repeated %dx from %s: %s", source, duplicate['count'],
+                        ', '.join(duplicate['call_sites']) or 'unknown', duplicate['sql'][:200])
+
+        offenders = cache.get(OFFENDERS_CACHE_KEY) or {}
+        previous = offenders.get(source)
+        if previous is None or report['query_count'] >= previous['query_count']:
+            offenders[source] = dict(report, path=request.get_full_path())
+            cache.set(OFFENDERS_CACHE_KEY, offenders, None)
+
+
+class SlowQueryMiddleware:
+    """Name the view running each query so the slow-query log can attribute it"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_source.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            current_source.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_source.set(request_source(request))
+
+
+class DBTimer:
+    """Execute wrapper that only sums database time"""
+
+    def __init__(self):
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total_time += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Record request latency and DB time per URL name for the /metrics endpoint"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = DBTimer()
+        start = time.perf_counter()
+        status = 500
+        try:
+            with record_queries(timer):
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            duration = time.perf_counter() - start
+            match = getattr(request, 'resolver_match', None)
+            view = match.url_name if match and match.url_name else 'unmatched'
+            if view != 'metrics':
+                metrics.inc('tracker_requests_total', {'view': view, 'method': request.method, 'status': str(status)})
+                metrics.observe('tracker_request_duration_seconds', {'view': view}, duration)
+                metrics.observe('tracker_request_db_seconds', {'view': view}, timer.total_time)
+
+
+class ProfilingMiddleware:
+    """Profile staff-flagged or randomly sampled requests and store the result.
+
+    Staff trigger a profile with ``?_profile=1`` or an ``X-Profile: 1``
+    header; PROFILING_SAMPLE_RATE percent of all requests are profiled too.
+    Stored profiles are listed at the staff profiles page.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with record_queries(recorder):
+            response, result = profile_call(self.get_response, request)
+        try:
+            profile = save_profile(request, response, trigger, result, recorder)
+        except Exception:
+            profiling_logger.exception("Could not store profile for %s", request.path)
+            return response
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:06
+
+import hashlib
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+NON_WORD = re.compile(r'[^\w]+')
+
+
+def transaction_fingerprint(trans_date, amount, description):
+    # Frozen copy of tracker.utils.dedup.transaction_fingerprint as of this migration
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    description = ' '.join(NON_WORD.sub(' ', (description or '').casefold()).split())
+    key = f"{trans_date.isoformat()}|{amount}|{description}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Transaction = apps.get_model('tracker', 'Transaction')
+    batch = []
+    for t in Transaction.objects.only('pk', 'date', 'amount', 'description').iterator(chunk_size=2000):
+        t.fingerprint = transaction_fingerprint(t.date, t.amount, t.description)
+        batch.append(t)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='skip_duplicates',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'fingerprint'], name='tracker_tra_user_id_b5b5ca_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='file_format',
+            field=models.CharField(default='csv', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='external_id',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'external_id'], name='tracker_acc_user_id_23c621_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'external_id'], name='tracker_tra_user_id_51747e_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0010_statement_external_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(blank=True, max_length=100)),
+                ('path', models.CharField(max_length=500)),
+                ('method', models.CharField(max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField(default=0)),
+                ('trigger', models.CharField(choices=[('flag', 'Requested by staff'), ('sample', 'Random sample')], default='flag', max_length=10)),
+                ('duration_ms', models.FloatField(default=0)),
+                ('query_count', models.IntegerField(default=0)),
+                ('db_time_ms', models.FloatField(default=0)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('pstats_file', models.FileField(upload_to='request_profiles/')),
+                ('stacks_file', models.FileField(upload_to='request_profiles/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint_hash', models.CharField(max_length=40, unique=True)),
+                ('fingerprint', models.TextField()),
+                ('sql', models.TextField()),
+                ('params', models.JSONField(blank=True, default=list)),
+                ('source', models.CharField(blank=True, max_length=200)),
+                ('call_site', models.CharField(blank=True, max_length=300)),
+                ('vendor', models.CharField(max_length=20)),
+                ('explain', models.TextField(blank=True)),
+                ('explain_analyzed', models.BooleanField(default=False)),
+                ('explained_at', models.DateTimeField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total_time_ms', models.FloatField(default=0)),
+                ('max_time_ms', models.FloatField(default=0)),
+                ('last_time_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-total_time_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_reportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('monthly', 'Monthly report'), ('quarterly', 'Quarterly report'), ('yearly', 'Yearly report'), ('custom', 'Custom range report')], default='monthly', max_length=20),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0016_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpreferences',
+            name='digest_mode',
+            field=models.CharField(choices=[('immediate', 'Immediate'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('budget_alert', 'Budget Alert'), ('bill_reminder', 'Bill Reminder'), ('goal_milestone', 'Goal Milestone'), ('unusual_spending', 'Unusual Spending'), ('monthly_summary', 'Monthly Summary'), ('digest', 'Digest')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('budget_alert', 'Budget Alert'), ('bill_reminder', 'Bill Reminder'), ('goal_milestone', 'Goal Milestone'), ('unusual_spending', 'Unusual Spending'), ('monthly_summary', 'Monthly Summary'), ('digest', 'Digest')], max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=10)),
+                ('send_email', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('digested_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['digested_at', 'user'], name='tracker_not_digeste_3440ed_idx'), models.Index(fields=['user', 'notification_type', 'created_at'], name='tracker_not_user_id_a2028e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    """Start every user's unread counter from their current unread notifications"""
+    Notification = apps.get_model('tracker', 'Notification')
+    NotificationCounter = apps.get_model('tracker', 'NotificationCounter')
+    counts = Notification.objects.filter(is_read=False).values('user').annotate(
+        unread=models.Count('id')
+    ).order_by()
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['user'], unread=row['unread']) for row in counts], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0017_notification_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('budget_alert', 'Budget Alert'), ('bill_reminder', 'Bill Reminder'), ('goal_milestone', 'Goal Milestone'), ('unusual_spending', 'Unusual Spending'), ('monthly_summary', 'Monthly Summary'), ('digest', 'Digest')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='tracker_not_user_id_dd33f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'created_at'], name='tracker_not_is_read_ff7458_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['user', '-created_at'], name='tracker_not_user_id_3f43e5_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
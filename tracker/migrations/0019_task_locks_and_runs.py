@@ -0,0 +1,42 @@
+# Generated by Django 4.2.8 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0018_notification_retention_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('owner', models.CharField(max_length=64)),
+                ('acquired_at', models.DateTimeField()),
+                ('heartbeat_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=200)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('failure', 'Failure'), ('skipped', 'Skipped')], max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField(default=0)),
+                ('rows_processed', models.BigIntegerField(default=0)),
+                ('hostname', models.CharField(blank=True, max_length=255)),
+                ('message', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['task_name', '-started_at'], name='tracker_tas_task_na_138b06_idx')],
+            },
+        ),
+    ]
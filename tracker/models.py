@@ -1,7 +1,19 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg
+from django.db.models import Sum, Count, Avg, F, Case, Value, When
+from django.db.models.functions import Greatest
+from collections import defaultdict
+from decimal import Decimal
+import uuid
+
+
+class AtomicSaveMixin:
+    """Save in a transaction, so the change event the post_save receiver writes commits with the row"""
+
+    def save(self, *args, **kwargs):
+        with db_transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
 
 
 class Profile(models.Model):
@@ -36,10 +48,23 @@ class Account(models.Model):
     name = models.CharField(max_length=100)
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES, default='cash')
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    external_id = models.CharField(max_length=64, blank=True)  # Bank account id from imported statements
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'external_id']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
+    @classmethod
+    def apply_balance_deltas(cls, deltas):
+        """Apply {account_id: delta} balance changes with atomic F() updates"""
+        for account_id, delta in deltas.items():
+            if account_id and delta:
+                cls.objects.filter(pk=account_id).update(balance=F('balance') + delta)
+
 
 class Transaction(models.Model):
     TRAN_TYPES = (
@@ -58,6 +83,8 @@ class Transaction(models.Model):
     description = models.TextField(blank=True)
     receipt = models.FileField(upload_to='receipts/', null=True, blank=True)
     tags = models.CharField(max_length=200, blank=True)
+    fingerprint = models.CharField(max_length=40, blank=True, editable=False)  # See utils.dedup
+    external_id = models.CharField(max_length=255, blank=True, editable=False)  # Bank FITID for imported statements
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -68,6 +95,8 @@ class Transaction(models.Model):
             models.Index(fields=['user', 'trans_type']),
             models.Index(fields=['user', 'category']),
             models.Index(fields=['date', 'trans_type']),
+            models.Index(fields=['user', 'fingerprint']),
+            models.Index(fields=['user', 'external_id']),
         ]
         ordering = ['-date', '-created_at']
 
@@ -75,74 +104,126 @@ class Transaction(models.Model):
         return f"{self.trans_type} {self.amount} - {self.user.username}"
 
     def save(self, *args, **kwargs):
-        # Get the old transaction data before saving
-        old = None
-        if self.pk:
-            try:
-                old = Transaction.objects.get(pk=self.pk)
-                # Make a copy of the old values before they're overwritten
-                old_amount = old.amount
-                old_trans_type = old.trans_type
-                old_account = old.account
-                old_transfer_account = old.transfer_account
-            except Transaction.DoesNotExist:
-                old = None
-
-        # If this is an update, reverse the old transaction's effect
-        if old:
-            # Temporarily restore old values to properly reverse the transaction
-            current_amount = self.amount
-            current_trans_type = self.trans_type
-            current_account = self.account
-            current_transfer_account = self.transfer_account
+        # The row, the balance updates and the change event written by the
+        # post_save receiver (see signals) commit together
+        with db_transaction.atomic(savepoint=False):
+            # Get the old transaction data before saving
+            old = None
+            if self.pk:
+                try:
+                    old = Transaction.objects.get(pk=self.pk)
+                    # Make a copy of the old values before they're overwritten
+                    old_amount = old.amount
+                    old_trans_type = old.trans_type
+                    old_account = old.account
+                    old_transfer_account = old.transfer_account
+                except Transaction.DoesNotExist:
+                    old = None
+
+            # If this is an update, reverse the old transaction's effect
+            if old:
+                # Temporarily restore old values to properly reverse the transaction
+                current_amount = self.amount
+                current_trans_type = self.trans_type
+                current_account = self.account
+                current_transfer_account = self.transfer_account
             
-            # Set old values for reversal
-            self.amount = old_amount
-            self.trans_type = old_trans_type
-            self.account = old_account
-            self.transfer_account = old_transfer_account
+                # Set old values for reversal
+                self.amount = old_amount
+                self.trans_type = old_trans_type
+                self.account = old_account
+                self.transfer_account = old_transfer_account
             
-            # Reverse the old transaction
-            self._apply_balance_change(reverse=True)
+                # Reverse the old transaction
+                self._apply_balance_change(reverse=True)
             
-            # Restore new values
-            self.amount = current_amount
-            self.trans_type = current_trans_type
-            self.account = current_account
-            self.transfer_account = current_transfer_account
+                # Restore new values
+                self.amount = current_amount
+                self.trans_type = current_trans_type
+                self.account = current_account
+                self.transfer_account = current_transfer_account
 
-        # Save the transaction with the new data
-        super().save(*args, **kwargs)
+            self.update_fingerprint()
 
-        # Apply the new transaction's effect
-        self._apply_balance_change(reverse=False)
+            # Save the transaction with the new data
+            super().save(*args, **kwargs)
+
+            # Apply the new transaction's effect
+            self._apply_balance_change(reverse=False)
 
     def delete(self, *args, **kwargs):
         # reverse balance changes then delete
         self._apply_balance_change(reverse=True)
         super().delete(*args, **kwargs)
 
-    def _apply_balance_change(self, reverse=False):
-        # reverse==True -> undo the transaction
-        from decimal import Decimal
+    def update_fingerprint(self):
+        from .utils.dedup import transaction_fingerprint
+        self.fingerprint = transaction_fingerprint(self.date, self.amount, self.description)
+        return self.fingerprint
+
+    def balance_deltas(self, reverse=False):
+        """Return the {account_id: delta} balance changes this transaction causes"""
         mul = -1 if reverse else 1
         amount_decimal = Decimal(str(self.amount))
-        
-        if self.trans_type == 'income' and self.account:
-            self.account.balance += mul * amount_decimal
-            self.account.save()
-        elif self.trans_type == 'expense' and self.account:
-            self.account.balance -= mul * amount_decimal
-            self.account.save()
-        elif self.trans_type == 'transfer' and self.account and self.transfer_account:
+        deltas = {}
+
+        if self.trans_type == 'income' and self.account_id:
+            deltas[self.account_id] = mul * amount_decimal
+        elif self.trans_type == 'expense' and self.account_id:
+            deltas[self.account_id] = -mul * amount_decimal
+        elif self.trans_type == 'transfer' and self.account_id and self.transfer_account_id:
             # subtract from source, add to destination
-            self.account.balance -= mul * amount_decimal
-            self.account.save()
-            self.transfer_account.balance += mul * amount_decimal
-            self.transfer_account.save()
+            deltas[self.account_id] = -mul * amount_decimal
+            deltas[self.transfer_account_id] = deltas.get(self.transfer_account_id, 0) + mul * amount_decimal
+        return deltas
+
+    def _apply_balance_change(self, reverse=False):
+        # reverse==True -> undo the transaction
+        deltas = self.balance_deltas(reverse=reverse)
+        # Only accounts already loaded need adjusting; one loaded after the
+        # update below already has the new balance
+        fields = (Transaction.account.field, Transaction.transfer_account.field)
+        loaded = [field.get_cached_value(self) for field in fields if field.is_cached(self)]
+        # Update balances in the database with F() expressions so concurrent
+        # writers can't overwrite each other's changes
+        Account.apply_balance_deltas(deltas)
+        # Keep the in-memory account instances in step with the database
+        for account in loaded:
+            if account is not None and account.pk in deltas:
+                account.balance += deltas.pop(account.pk)
 
 
-class Budget(models.Model):
+class BudgetQuerySet(models.QuerySet):
+    def with_spent(self, start=None, end=None, use_budget_dates=False):
+        """Annotate each budget with ``spent`` on its category in a single query.
+
+        Expenses are counted between ``start`` and ``end`` (inclusive, both
+        optional). With ``use_budget_dates`` a budget's own start/end dates
+        take precedence where they are set.
+        """
+        from datetime import date
+        from django.db.models import DecimalField, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+
+        expenses = Transaction.objects.filter(
+            user=OuterRef('user'), category=OuterRef('category'), trans_type='expense'
+        )
+        if use_budget_dates:
+            expenses = expenses.filter(
+                date__gte=Coalesce(OuterRef('start_date'), Value(start or date.min)),
+                date__lte=Coalesce(OuterRef('end_date'), Value(end or date.max)),
+            )
+        else:
+            if start:
+                expenses = expenses.filter(date__gte=start)
+            if end:
+                expenses = expenses.filter(date__lte=end)
+        totals = expenses.order_by().values('category').annotate(total=Sum('amount')).values('total')
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(spent=Coalesce(Subquery(totals, output_field=money), Value(Decimal('0')), output_field=money))
+
+
+class Budget(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=150)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -151,6 +232,8 @@ class Budget(models.Model):
     end_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BudgetQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} - {self.user.username}"
 
@@ -206,10 +289,10 @@ class TransactionTemplate(models.Model):
     def create_transaction(self):
         """Create a transaction from this template"""
         transaction = Transaction.objects.create(
-            user=self.user,
+            user_id=self.user_id,
             amount=self.amount,
-            category=self.category,
-            account=self.account,
+            category_id=self.category_id,
+            account_id=self.account_id,
             trans_type=self.trans_type,
             description=self.description,
             tags=self.tags,
@@ -220,7 +303,7 @@ class TransactionTemplate(models.Model):
         return transaction
 
 
-class SavingsGoal(models.Model):
+class SavingsGoal(AtomicSaveMixin, models.Model):
     GOAL_STATUS = (
         ('active', 'Active'),
         ('completed', 'Completed'),
@@ -259,7 +342,7 @@ class SavingsGoal(models.Model):
         self.save()
 
 
-class GoalContribution(models.Model):
+class GoalContribution(AtomicSaveMixin, models.Model):
     goal = models.ForeignKey(SavingsGoal, related_name='contributions', on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateField(default=timezone.now)
@@ -371,83 +454,104 @@ class FinancialHealthScore(models.Model):
     
     def calculate_score(self):
         """Calculate financial health score based on various factors"""
-        from decimal import Decimal
-        
-        # Get user's financial data
-        total_income = Transaction.objects.filter(
-            user=self.user, 
-            trans_type='income',
-            date__month=timezone.now().month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        total_expenses = Transaction.objects.filter(
-            user=self.user, 
-            trans_type='expense',
-            date__month=timezone.now().month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        total_balance = Account.objects.filter(user=self.user).aggregate(
-            Sum('balance'))['balance__sum'] or Decimal('0')
-        
-        # Calculate metrics
-        if total_income > 0:
-            self.savings_rate = ((total_income - total_expenses) / total_income) * 100
-            monthly_expenses = total_expenses if total_expenses > 0 else Decimal('1')
-            self.emergency_fund_months = total_balance / monthly_expenses
-        
-        # Calculate budget adherence
-        budgets = Budget.objects.filter(user=self.user)
-        if budgets.exists():
-            adherence_scores = []
-            for budget in budgets:
-                spent = Transaction.objects.filter(
-                    user=self.user,
-                    category=budget.category,
-                    trans_type='expense',
-                    date__gte=budget.start_date or timezone.now().date().replace(day=1)
-                ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-                
-                if budget.amount > 0:
-                    adherence = max(0, 100 - ((spent / budget.amount) * 100))
-                    adherence_scores.append(adherence)
-            
-            if adherence_scores:
-                self.budget_adherence = sum(adherence_scores) / len(adherence_scores)
-        
-        # Calculate overall score (weighted average)
-        score = 0
-        if self.savings_rate >= 20:
-            score += 30
-        elif self.savings_rate >= 10:
-            score += 20
-        elif self.savings_rate >= 0:
-            score += 10
-        
-        if self.emergency_fund_months >= 6:
-            score += 25
-        elif self.emergency_fund_months >= 3:
-            score += 15
-        elif self.emergency_fund_months >= 1:
-            score += 10
-        
-        if self.budget_adherence >= 90:
-            score += 25
-        elif self.budget_adherence >= 75:
-            score += 20
-        elif self.budget_adherence >= 50:
-            score += 15
-        
-        # Bonus points for having multiple accounts and goals
-        if Account.objects.filter(user=self.user).count() >= 3:
-            score += 10
-        
-        if SavingsGoal.objects.filter(user=self.user, status='active').count() >= 1:
-            score += 10
-        
-        self.score = min(100, score)
-        self.save()
+        type(self).calculate_scores([self])
         return self.score
 
+    @classmethod
+    def calculate_scores(cls, scores):
+        """Recalculate and save many users' scores with a fixed number of queries"""
+        from collections import defaultdict
+        from django.db.models import Q
+
+        if not scores:
+            return scores
+        user_ids = [score.user_id for score in scores]
+        now = timezone.now()
+
+        # Current month's income and expenses per user
+        totals = {
+            row['user']: row for row in Transaction.objects.filter(
+                user__in=user_ids, date__year=now.year, date__month=now.month
+            ).values('user').annotate(
+                income=Sum('amount', filter=Q(trans_type='income')),
+                expenses=Sum('amount', filter=Q(trans_type='expense')),
+            ).order_by()
+        }
+        accounts = {
+            row['user']: row for row in Account.objects.filter(user__in=user_ids)
+            .values('user').annotate(total=Sum('balance'), count=Count('id')).order_by()
+        }
+        adherence = defaultdict(list)
+        budgets = Budget.objects.filter(user__in=user_ids, amount__gt=0).with_spent(
+            start=now.date().replace(day=1), use_budget_dates=True
+        ).values_list('user_id', 'amount', 'spent')
+        for user_id, amount, spent in budgets:
+            adherence[user_id].append(max(0, 100 - ((spent / amount) * 100)))
+        with_goals = set(
+            SavingsGoal.objects.filter(user__in=user_ids, status='active').values_list('user_id', flat=True)
+        )
+
+        for health in scores:
+            user_totals = totals.get(health.user_id, {})
+            total_income = user_totals.get('income') or Decimal('0')
+            total_expenses = user_totals.get('expenses') or Decimal('0')
+            user_accounts = accounts.get(health.user_id, {})
+            total_balance = user_accounts.get('total') or Decimal('0')
+
+            # Calculate metrics
+            if total_income > 0:
+                health.savings_rate = ((total_income - total_expenses) / total_income) * 100
+                monthly_expenses = total_expenses if total_expenses > 0 else Decimal('1')
+                health.emergency_fund_months = total_balance / monthly_expenses
+
+            # Calculate budget adherence
+            if adherence[health.user_id]:
+                health.budget_adherence = sum(adherence[health.user_id]) / len(adherence[health.user_id])
+
+            # Calculate overall score (weighted average)
+            score = 0
+            if health.savings_rate >= 20:
+                score += 30
+            elif health.savings_rate >= 10:
+                score += 20
+            elif health.savings_rate >= 0:
+                score += 10
+
+            if health.emergency_fund_months >= 6:
+                score += 25
+            elif health.emergency_fund_months >= 3:
+                score += 15
+            elif health.emergency_fund_months >= 1:
+                score += 10
+
+            if health.budget_adherence >= 90:
+                score += 25
+            elif health.budget_adherence >= 75:
+                score += 20
+            elif health.budget_adherence >= 50:
+                score += 15
+
+            # Bonus points for having multiple accounts and goals
+            if user_accounts.get('count', 0) >= 3:
+                score += 10
+
+            if health.user_id in with_goals:
+                score += 10
+
+            health.score = min(100, score)
+            # bulk_update skips auto_now
+            health.last_calculated = now
+
+        fields = ['score', 'savings_rate', 'budget_adherence', 'emergency_fund_months', 'last_calculated']
+        stored = []
+        for health in scores:
+            if health.pk is None:
+                health.save()
+            else:
+                stored.append(health)
+        cls.objects.bulk_update(stored, fields)
+        return scores
+
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
@@ -456,6 +560,7 @@ class Notification(models.Model):
         ('goal_milestone', 'Goal Milestone'),
         ('unusual_spending', 'Unusual Spending'),
         ('monthly_summary', 'Monthly Summary'),
+        ('digest', 'Digest'),
     )
     
     PRIORITY_LEVELS = (
@@ -473,11 +578,104 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Kept past the retention period: the milestone check reads their titles
+    RETAINED_TYPES = ('goal_milestone',)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['is_read', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+    
+    @classmethod
+    def create_many(cls, notifications):
+        """Bulk-create notifications and add the unread ones to their users' counters"""
+        from .utils.events import publish
+
+        created = cls.objects.bulk_create(notifications)
+        counts = defaultdict(int)
+        for notification in created:
+            if not notification.is_read:
+                counts[notification.user_id] += 1
+        NotificationCounter.add(counts)
+        for user_id, count in counts.items():
+            publish(user_id, 'notifications', created=count)
+        return created
+    
+    @classmethod
+    def mark_read(cls, user_id, pk=None):
+        """Mark one or all of a user's notifications read; return how many changed"""
+        unread = cls.objects.filter(user_id=user_id, is_read=False)
+        if pk is not None:
+            unread = unread.filter(pk=pk)
+        changed = unread.update(is_read=True)
+        NotificationCounter.subtract(user_id, changed)
+        if changed:
+            from .utils.events import publish
+            publish(user_id, 'notifications', read=changed)
+        return changed
+
+
+class NotificationCounter(models.Model):
+    """A user's unread notification count, so the badge never counts rows"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+    @classmethod
+    def unread_for(cls, user_id):
+        unread = cls.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+        if unread is None:
+            # First visit since the user was created; count once and keep it from here
+            counter, _ = cls.objects.get_or_create(user_id=user_id, defaults={
+                'unread': Notification.objects.filter(user_id=user_id, is_read=False).count(),
+            })
+            unread = counter.unread
+        return unread
+
+    @classmethod
+    def add(cls, counts):
+        """Add ``{user_id: n}`` to the counters in one INSERT and one UPDATE"""
+        if not counts:
+            return
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in counts], ignore_conflicts=True)
+        by_amount = defaultdict(list)
+        for user_id, amount in counts.items():
+            by_amount[amount].append(user_id)
+        increment = Case(
+            *[When(user_id__in=user_ids, then=Value(amount)) for amount, user_ids in by_amount.items()],
+            default=Value(0),
+        )
+        cls.objects.filter(user_id__in=list(counts)).update(unread=F('unread') + increment)
+
+    @classmethod
+    def subtract(cls, user_id, amount):
+        if amount:
+            cls.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - amount, 0))
+
+
+class NotificationArchive(models.Model):
+    """Read notifications moved out of Notification by the retention task"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_LEVELS, default='medium')
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', '-created_at'])]
+
+    def __str__(self):
+        return f"{self.title} - {self.user_id}"
 
 
 class BudgetAlert(models.Model):
@@ -501,6 +699,12 @@ class BudgetAlert(models.Model):
 
 
 class UserPreferences(models.Model):
+    DIGEST_MODES = (
+        ('immediate', 'Immediate'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    )
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     email_notifications = models.BooleanField(default=True)
     budget_alerts = models.BooleanField(default=True)
@@ -510,6 +714,319 @@ class UserPreferences(models.Model):
     language = models.CharField(max_length=10, default='en')
     date_format = models.CharField(max_length=20, default='%Y-%m-%d')
     number_format = models.CharField(max_length=10, default='en-US')
+    # Alerts for users on a digest are queued as NotificationEvents and sent together
+    digest_mode = models.CharField(max_length=10, choices=DIGEST_MODES, default='immediate')
     
     def __str__(self):
         return f"{self.user.username} Preferences"
+
+
+class NotificationEvent(models.Model):
+    """An alert waiting for its user's next digest.
+
+    Digested events are kept for a week so the alert tasks can still tell
+    what they already sent.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_LEVELS, default='medium')
+    send_email = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    digested_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['digested_at', 'user']),
+            models.Index(fields=['user', 'notification_type', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.title}"
+
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255, blank=True)
+    file_format = models.CharField(max_length=10, default='csv')
+    file_size = models.PositiveBigIntegerField(default=0)
+    column_mapping = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    bytes_processed = models.PositiveBigIntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    imported_rows = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    duplicate_count = models.IntegerField(default=0)
+    skip_duplicates = models.BooleanField(default=True)
+    errors = models.JSONField(default=list, blank=True)  # First IMPORT_ERROR_REPORT_LIMIT row errors
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.original_name} ({self.status}) - {self.user.username}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    @property
+    def progress_percentage(self):
+        if self.status == 'completed':
+            return 100
+        if self.file_size > 0:
+            return min(99, int(self.bytes_processed * 100 / self.file_size))
+        return 0
+
+
+class ReportJob(models.Model):
+    """A PDF report rendered in the background and served from file storage"""
+    STATUS_CHOICES = ImportJob.STATUS_CHOICES
+    REPORT_TYPES = (
+        ('monthly', 'Monthly report'),
+        ('quarterly', 'Quarterly report'),
+        ('yearly', 'Yearly report'),
+        ('custom', 'Custom range report'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPES, default='monthly')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file_path = models.CharField(max_length=255, blank=True)  # Path in default_storage
+    filename = models.CharField(max_length=100, blank=True)  # Download name
+    file_size = models.PositiveBigIntegerField(default=0)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.start_date} ({self.status}) - {self.user.username}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+
+class OutgoingEmail(models.Model):
+    """An email waiting in the outbox; sent in batches by utils.mailer.drain_outbox"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)  # DEFAULT_FROM_EMAIL when blank
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    attachment_path = models.CharField(max_length=255, blank=True)  # In default_storage, read when sending
+    attachment_name = models.CharField(max_length=100, blank=True)
+    category = models.CharField(max_length=30, blank=True)  # e.g. budget_alert, monthly_report
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['claim_token']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    TRIGGER_CHOICES = (
+        ('flag', 'Requested by staff'),
+        ('sample', 'Random sample'),
+    )
+
+    url_name = models.CharField(max_length=100, blank=True)
+    path = models.CharField(max_length=500)
+    method = models.CharField(max_length=10)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, default='flag')
+    duration_ms = models.FloatField(default=0)
+    query_count = models.IntegerField(default=0)
+    db_time_ms = models.FloatField(default=0)
+    sample_count = models.IntegerField(default=0)
+    pstats_file = models.FileField(upload_to='request_profiles/')
+    stacks_file = models.FileField(upload_to='request_profiles/')  # Collapsed stacks for flamegraph tools
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Profile {self.url_name or self.path} ({self.duration_ms:.0f} ms)"
+
+    def delete(self, *args, **kwargs):
+        # Remove the stored files along with the row
+        for field in (self.pstats_file, self.stacks_file):
+            if field:
+                field.delete(save=False)
+        super().delete(*args, **kwargs)
+
+
+class SlowQuery(models.Model):
+    """One row per slow SQL fingerprint, with its latest EXPLAIN output"""
+    fingerprint_hash = models.CharField(max_length=40, unique=True)
+    fingerprint = models.TextField()
+    sql = models.TextField()  # Latest example, parameters not interpolated
+    params = models.JSONField(default=list, blank=True)  # Redacted unless SLOW_QUERY_REDACT_PARAMS is off
+    source = models.CharField(max_length=200, blank=True)  # URL name or task:<name>
+    call_site = models.CharField(max_length=300, blank=True)
+    vendor = models.CharField(max_length=20)
+    explain = models.TextField(blank=True)
+    explain_analyzed = models.BooleanField(default=False)
+    explained_at = models.DateTimeField(null=True, blank=True)
+    count = models.IntegerField(default=0)
+    total_time_ms = models.FloatField(default=0)
+    max_time_ms = models.FloatField(default=0)
+    last_time_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-total_time_ms']
+
+    def __str__(self):
+        return f"{self.source or 'unknown'}: {self.count}x, max {self.max_time_ms:.0f} ms"
+
+    @property
+    def avg_time_ms(self):
+        return self.total_time_ms / self.count if self.count else 0
+
+
+class TaskLock(models.Model):
+    """A lease on a background task so only one run of it is active at a time"""
+    name = models.CharField(max_length=200, unique=True)
+    owner = models.CharField(max_length=64)
+    acquired_at = models.DateTimeField()
+    heartbeat_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner} until {self.expires_at}"
+
+
+class TaskRun(models.Model):
+    """One run of a locked background task, for capacity planning"""
+    OUTCOME_CHOICES = (
+        ('success', 'Success'),
+        ('failure', 'Failure'),
+        ('skipped', 'Skipped'),
+    )
+
+    task_name = models.CharField(max_length=200)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    duration_ms = models.FloatField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+    hostname = models.CharField(max_length=255, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [models.Index(fields=['task_name', '-started_at'])]
+
+    def __str__(self):
+        return f"{self.task_name} {self.outcome} at {self.started_at}"
+
+
+def new_version_token():
+    return uuid.uuid4().hex
+
+
+class DataVersion(models.Model):
+    """Changes whenever a user's financial data changes; keys cached reports.
+
+    The token is random rather than a counter so that keys never repeat
+    across databases that share one media storage.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    token = models.CharField(max_length=32, default=new_version_token)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.token}"
+
+    @classmethod
+    def current(cls, user_id):
+        return cls.objects.get_or_create(user_id=user_id)[0].token
+
+    @classmethod
+    def current_many(cls, user_ids):
+        """{user_id: token} for many users, creating missing rows in one insert"""
+        tokens = dict(cls.objects.filter(user_id__in=user_ids).values_list('user_id', 'token'))
+        missing = [user_id for user_id in user_ids if user_id not in tokens]
+        if missing:
+            cls.objects.bulk_create([cls(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+            tokens.update(cls.objects.filter(user_id__in=missing).values_list('user_id', 'token'))
+        return tokens
+
+    @classmethod
+    def bump(cls, *user_ids):
+        """Invalidate everything cached for these users.
+
+        Users without a row have nothing cached yet, so only existing rows
+        change; that also keeps cascading user deletes from recreating one.
+        """
+        from .utils.events import publish
+
+        for user_id in set(filter(None, user_ids)):
+            if cls.objects.filter(user_id=user_id).update(token=new_version_token(), updated_at=timezone.now()):
+                publish(user_id, 'data_version')
+
+
+class ChangeEvent(models.Model):
+    """A write that may cross an alert threshold, waiting for the change-event consumer.
+
+    Rows are appended in the same database transaction as the write and
+    deleted once processed (see utils.change_events).
+    """
+    KINDS = (
+        ('spending', 'Spending'),
+        ('budget', 'Budget'),
+        ('goal', 'Savings goal'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.CASCADE)
+    goal = models.ForeignKey(SavingsGoal, null=True, blank=True, on_delete=models.CASCADE)
+    period = models.DateField(null=True, blank=True)  # First day of the month the write affects
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} change for {self.user_id}"
@@ -0,0 +1,149 @@
+"""Send analytics reads to the optional read replica.
+
+Reads of the financial data models go to the 'replica' database only inside
+``use_replica()``: ReplicaMiddleware turns it on for the views named in
+REPLICA_VIEWS, and the read-only scheduled scans in tracker.tasks run in it.
+Writes, reads inside a transaction on the primary, and everything else stay
+on 'default'. So do tasks that read back or update rows they have just
+written (health scores, goal milestones), as the replica may not have them
+yet. The replica is only used while its health check passes: it answers,
+and on PostgreSQL it is no more than REPLICA_MAX_LAG_SECONDS behind. A
+failed check is remembered for REPLICA_HEALTH_CHECK_SECONDS.
+
+A request that writes sets a cookie that keeps that browser on the primary
+for REPLICA_PIN_SECONDS, so users see their own changes on the next page.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+PIN_COOKIE = 'replica_pin'
+
+# The data analytics pages read; state the app reads and then writes
+# (versions, counters, jobs, locks, sessions) always comes from the primary
+REPLICA_MODELS = {
+    'account', 'bill', 'budget', 'category', 'financialhealthscore', 'goalcontribution',
+    'recurringtransaction', 'savingsgoal', 'transaction', 'transactionsplit',
+}
+
+reading_replica = ContextVar('reading_replica', default=False)
+# Set per request by ReplicaMiddleware; the router appends when a tracker model is written
+request_writes = ContextVar('request_writes', default=None)
+
+_health_lock = threading.Lock()
+_health = {'checked_at': float('-inf'), 'healthy': False}
+
+LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Read the financial data from the replica while this block runs; also works as a decorator"""
+    token = reading_replica.set(True)
+    try:
+        yield
+    finally:
+        reading_replica.reset(token)
+
+
+def replica_lag():
+    """Seconds the replica is behind; 0 for backends that cannot tell"""
+    connection = connections[REPLICA]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return 0.0
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def check_replica():
+    """Run the health check now and remember the result"""
+    try:
+        lag = replica_lag()
+        healthy = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if not healthy:
+            logger.warning("Read replica is %.1fs behind; reading from the primary", lag)
+    except Exception:
+        logger.warning("Read replica is unavailable; reading from the primary", exc_info=True)
+        healthy = False
+    with _health_lock:
+        _health.update(checked_at=time.monotonic(), healthy=healthy)
+    return healthy
+
+
+def replica_healthy():
+    with _health_lock:
+        fresh = time.monotonic() - _health['checked_at'] < settings.REPLICA_HEALTH_CHECK_SECONDS
+        healthy = _health['healthy']
+    return healthy if fresh else check_replica()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (reading_replica.get() and model._meta.model_name in REPLICA_MODELS
+                and model._meta.app_label == 'tracker'
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block and replica_healthy()):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = request_writes.get()
+        if writes is not None and model._meta.app_label == 'tracker':
+            writes.append(model._meta.model_name)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA
+
+
+class ReplicaMiddleware:
+    """Read the REPLICA_VIEWS pages from the replica, unless this browser wrote in the last few seconds"""
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        writes_token = request_writes.set(writes)
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                reading_replica.reset(request.replica_token)
+            request_writes.reset(writes_token)
+        if writes:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if (request.method in ('GET', 'HEAD') and match and match.url_name in settings.REPLICA_VIEWS
+                and PIN_COOKIE not in request.COOKIES):
+            request.replica_token = reading_replica.set(True)
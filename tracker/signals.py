@@ -0,0 +1,60 @@
+"""Keep DataVersion in step with the data that reports are built from, and
+append the change events that drive real-time alerts (see utils.change_events).
+
+Saves and deletes go through these receivers. Bulk operations that skip
+signals (imports, ``QuerySet.update``) call ``DataVersion.bump`` and the
+change_events recorders themselves.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .models import (
+    Account, Budget, ChangeEvent, DataVersion, GoalContribution, SavingsGoal, Transaction, TransactionSplit,
+)
+from .utils import change_events
+
+
+def bump_owner(sender, instance, **kwargs):
+    DataVersion.bump(instance.user_id)
+
+
+def bump_transaction_owner(sender, instance, **kwargs):
+    DataVersion.bump(*Transaction.objects.filter(pk=instance.transaction_id).values_list('user_id', flat=True))
+
+
+def bump_goal_owner(sender, instance, **kwargs):
+    DataVersion.bump(*SavingsGoal.objects.filter(pk=instance.goal_id).values_list('user_id', flat=True))
+
+
+# Deletes only lower spending or remove goals, so they never trigger an alert
+def record_spending(sender, instance, raw=False, **kwargs):
+    if not raw:
+        change_events.record([change_events.spending_event(instance)])
+
+
+def record_budget(sender, instance, raw=False, **kwargs):
+    if not raw:
+        change_events.record([ChangeEvent(user_id=instance.user_id, kind='budget', category_id=instance.category_id,
+                                           period=change_events.month_start(instance.start_date))])
+
+
+def record_goal(sender, instance, raw=False, **kwargs):
+    if not raw:
+        change_events.record([ChangeEvent(user_id=instance.user_id, kind='goal', goal_id=instance.pk)])
+
+
+def record_contribution(sender, instance, raw=False, **kwargs):
+    if not raw:
+        change_events.record([ChangeEvent(user_id=instance.goal.user_id, kind='goal', goal_id=instance.goal_id)])
+
+
+def connect():
+    receivers = [(model, bump_owner) for model in (Transaction, Account, Budget, SavingsGoal)]
+    receivers += [(TransactionSplit, bump_transaction_owner), (GoalContribution, bump_goal_owner)]
+    for model, receiver in receivers:
+        post_save.connect(receiver, sender=model, dispatch_uid=f'data_version_{model.__name__}_save')
+        post_delete.connect(receiver, sender=model, dispatch_uid=f'data_version_{model.__name__}_delete')
+
+    recorders = [(Transaction, record_spending), (Budget, record_budget), (SavingsGoal, record_goal),
+                 (GoalContribution, record_contribution)]
+    for model, receiver in recorders:
+        post_save.connect(receiver, sender=model, dispatch_uid=f'change_events_{model.__name__}_save')
@@ -1,119 +1,100 @@
-from celery import shared_task
+try:
+    from celery import shared_task
+except ImportError:
+    # Without Celery the tasks run in process (see manage.py run_scheduler)
+    from .utils.jobs import shared_task
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from decimal import Decimal
 from datetime import date, timedelta
 
 from .models import (
-    Transaction, Budget, Bill, SavingsGoal, FinancialHealthScore, 
-    Notification, BudgetAlert, UserPreferences
+    Bill, SavingsGoal, FinancialHealthScore, 
+    Notification, BudgetAlert, UserPreferences, DataVersion, OutgoingEmail, NotificationEvent
 )
+from .routers import use_replica
+from .utils.alerts import active_budgets, budget_alerts, goal_milestones, unusual_spending
+from .utils.change_events import process_events
+from .utils.mailer import drain_outbox, queue_email, queue_emails
+from .utils.locks import single_instance
+from .utils.metrics import instrument_task, record_rows
+from .utils.notifications import already_notified, notify, purge_notifications, send_digests
+from .utils.sharding import merge_results, shard_q, sharded
+
+# Users per query when a task works through every user
+BATCH_SIZE = 500
 
 
 @shared_task
-def calculate_financial_health_scores():
+@instrument_task
+@single_instance()
+@sharded
+def calculate_financial_health_scores(shard=None):
     """Calculate financial health scores for all users"""
-    users = User.objects.all()
-    for user in users:
-        health_score, created = FinancialHealthScore.objects.get_or_create(user=user)
-        health_score.calculate_score()
-    return f"Updated financial health scores for {users.count()} users"
+    user_ids = list(User.objects.filter(shard_q(shard, 'pk')).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        FinancialHealthScore.objects.bulk_create(
+            [FinancialHealthScore(user_id=user_id) for user_id in batch], ignore_conflicts=True
+        )
+        FinancialHealthScore.calculate_scores(list(FinancialHealthScore.objects.filter(user_id__in=batch)))
+    record_rows(len(user_ids))
+    return f"Updated financial health scores for {len(user_ids)} users"
 
 
 @shared_task
-def check_budget_alerts():
+@instrument_task
+@single_instance()
+@sharded
+@use_replica()
+def check_budget_alerts(shard=None):
     """Check for budget threshold alerts and create notifications"""
-    budgets = Budget.objects.filter(
-        start_date__lte=timezone.now().date(),
-        end_date__gte=timezone.now().date()
-    )
+    budgets = active_budgets(timezone.now().date(), shard_q(shard))
+    alerts, events = budget_alerts(budgets)
     
-    alerts_created = 0
-    for budget in budgets:
-        # Calculate spent amount for this budget period
-        spent = Transaction.objects.filter(
-            user=budget.user,
-            category=budget.category,
-            trans_type='expense',
-            date__gte=budget.start_date or timezone.now().date().replace(day=1),
-            date__lte=budget.end_date or timezone.now().date()
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        if budget.amount > 0:
-            percentage_used = (spent / budget.amount) * 100
-            
-            # Check thresholds and create alerts
-            alert_types = []
-            if percentage_used >= 100:
-                alert_types.append('100_percent')
-            elif percentage_used >= 90:
-                alert_types.append('90_percent')
-            elif percentage_used >= 75:
-                alert_types.append('75_percent')
-            elif percentage_used >= 50:
-                alert_types.append('50_percent')
-            
-            for alert_type in alert_types:
-                alert, created = BudgetAlert.objects.get_or_create(
-                    budget=budget,
-                    alert_type=alert_type
-                )
-                
-                if created and not alert.is_sent:
-                    # Create notification
-                    title = f"Budget Alert: {budget.name}"
-                    message = f"You've used {percentage_used:.1f}% of your {budget.name} budget (${spent} of ${budget.amount})"
-                    
-                    Notification.objects.create(
-                        user=budget.user,
-                        title=title,
-                        message=message,
-                        notification_type='budget_alert',
-                        priority='high' if percentage_used >= 90 else 'medium'
-                    )
-                    
-                    # Send email if user has email notifications enabled
-                    preferences = getattr(budget.user, 'userpreferences', None)
-                    if preferences and preferences.budget_alerts and preferences.email_notifications:
-                        send_budget_alert_email.delay(budget.user.id, title, message)
-                    
-                    alert.is_sent = True
-                    alert.save()
-                    alerts_created += 1
+    BudgetAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    notify(events)
     
-    return f"Created {alerts_created} budget alerts"
+    record_rows(len(budgets))
+    return f"Created {len(alerts)} budget alerts"
 
 
 @shared_task
-def send_budget_alert_email(user_id, title, message):
-    """Send budget alert email to user"""
+@instrument_task
+def send_budget_alert_email(user_id, title, message, email=None):
+    """Queue a budget alert email to user"""
     try:
-        user = User.objects.get(id=user_id)
-        send_mail(
-            subject=title,
-            message=message,
-            from_email='noreply@expensetracker.com',
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        return f"Budget alert email sent to {user.email}"
+        # Callers that already loaded the user pass the address to skip the lookup
+        email = email or User.objects.get(id=user_id).email
+        queue_email(email, title, message, user_id=user_id, category='budget_alert')
+        record_rows(1)
+        return f"Budget alert email queued for {email}"
     except Exception as e:
-        return f"Failed to send email: {str(e)}"
+        return f"Failed to queue email: {str(e)}"
 
 
 @shared_task
-def check_bill_reminders():
+@instrument_task
+@single_instance()
+@sharded
+def check_bill_reminders(shard=None):
     """Check for upcoming bills and send reminders"""
     today = timezone.now().date()
-    upcoming_bills = Bill.objects.filter(
-        status='pending',
-        due_date__lte=today + timedelta(days=7)
+    upcoming_bills = list(
+        Bill.objects.filter(shard_q(shard), status='pending', due_date__lte=today + timedelta(days=7))
+        .select_related('user__userpreferences')
+    )
+    # Reminders already sent or queued today, so reruns within the day do not repeat them
+    sent_today = already_notified(
+        'bill_reminder', {bill.user_id for bill in upcoming_bills},
+        since=timezone.now().replace(hour=0, minute=0, second=0, microsecond=0),
     )
     
-    reminders_sent = 0
+    overdue, events = [], []
     for bill in upcoming_bills:
         days_until_due = (bill.due_date - today).days
         
@@ -126,94 +107,91 @@ def check_bill_reminders():
             elif days_until_due < 0:
                 message = f"Your bill '{bill.name}' for ${bill.amount} is {abs(days_until_due)} days overdue!"
                 priority = 'urgent'
-                bill.status = 'overdue'
-                bill.save()
+                overdue.append(bill.pk)
             else:
                 message = f"Your bill '{bill.name}' for ${bill.amount} is due in {days_until_due} days."
                 priority = 'medium'
             
-            # Check if reminder already sent today
-            existing_notification = Notification.objects.filter(
-                user=bill.user,
-                notification_type='bill_reminder',
-                title=title,
-                created_at__date=today
-            ).exists()
-            
-            if not existing_notification:
-                Notification.objects.create(
+            if (bill.user_id, title) not in sent_today:
+                sent_today.add((bill.user_id, title))
+                # Send email if enabled
+                preferences = getattr(bill.user, 'userpreferences', None)
+                events.append(NotificationEvent(
                     user=bill.user,
                     title=title,
                     message=message,
                     notification_type='bill_reminder',
-                    priority=priority
-                )
-                
-                # Send email if enabled
-                preferences = getattr(bill.user, 'userpreferences', None)
-                if preferences and preferences.bill_reminders and preferences.email_notifications:
-                    send_bill_reminder_email.delay(bill.user.id, title, message)
-                
-                reminders_sent += 1
+                    priority=priority,
+                    send_email=bool(preferences and preferences.bill_reminders and preferences.email_notifications),
+                ))
+    
+    if overdue:
+        Bill.objects.filter(pk__in=overdue).update(status='overdue')
+    notify(events)
     
-    return f"Sent {reminders_sent} bill reminders"
+    record_rows(len(upcoming_bills))
+    return f"Sent {len(events)} bill reminders"
 
 
 @shared_task
-def send_bill_reminder_email(user_id, title, message):
-    """Send bill reminder email to user"""
+@instrument_task
+def send_bill_reminder_email(user_id, title, message, email=None):
+    """Queue a bill reminder email to user"""
     try:
-        user = User.objects.get(id=user_id)
-        send_mail(
-            subject=title,
-            message=message,
-            from_email='noreply@expensetracker.com',
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        return f"Bill reminder email sent to {user.email}"
+        email = email or User.objects.get(id=user_id).email
+        queue_email(email, title, message, user_id=user_id, category='bill_reminder')
+        record_rows(1)
+        return f"Bill reminder email queued for {email}"
     except Exception as e:
-        return f"Failed to send email: {str(e)}"
+        return f"Failed to queue email: {str(e)}"
 
 
 @shared_task
-def generate_monthly_reports():
-    """Generate and send monthly financial reports"""
-    today = timezone.now().date()
+@instrument_task
+@single_instance()
+@sharded
+@use_replica()
+def generate_monthly_reports(today=None, shard=None):
+    """Generate and send monthly financial reports.
+
+    ``today`` (an ISO date) lets a missed month be run later; users who
+    already have that month's report notification are skipped.
+    """
+    from django.db.models import F, FilteredRelation
+
+    today = date.fromisoformat(today) if today else timezone.now().date()
     if today.day != 1:  # Only run on first day of month
         return "Monthly reports only generated on 1st of month"
     
     last_month = today.replace(day=1) - timedelta(days=1)
-    users_with_reports = User.objects.filter(
-        userpreferences__monthly_reports=True,
-        userpreferences__email_notifications=True
+    start_date = last_month.replace(day=1)
+    title = f"Monthly Report - {last_month.strftime('%B %Y')}"
+    already_sent = Notification.objects.filter(notification_type='monthly_summary', title=title).values('user')
+    # Last month's totals and the health score for every user in one grouped query
+    users_with_reports = list(
+        User.objects.filter(
+            shard_q(shard, 'pk'),
+            userpreferences__monthly_reports=True,
+            userpreferences__email_notifications=True
+        ).exclude(pk__in=already_sent).annotate(
+            last_month=FilteredRelation('transaction', condition=Q(
+                transaction__date__gte=start_date, transaction__date__lte=last_month
+            )),
+            income=Sum('last_month__amount', filter=Q(last_month__trans_type='income')),
+            expenses=Sum('last_month__amount', filter=Q(last_month__trans_type='expense')),
+            health_score=F('financialhealthscore__score'),
+        ).order_by('pk')
     )
     
-    reports_sent = 0
+    # PDF statements for everyone first, so the emails can link to a stored file
+    statements, statement_url = render_monthly_statements(users_with_reports, last_month)
+    
+    notifications, emails = [], []
     for user in users_with_reports:
-        # Calculate last month's statistics
-        income = Transaction.objects.filter(
-            user=user,
-            trans_type='income',
-            date__year=last_month.year,
-            date__month=last_month.month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        expenses = Transaction.objects.filter(
-            user=user,
-            trans_type='expense',
-            date__year=last_month.year,
-            date__month=last_month.month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
+        income = user.income or Decimal('0')
+        expenses = user.expenses or Decimal('0')
         savings = income - expenses
-        
-        # Get financial health score
-        health_score = getattr(user, 'financialhealthscore', None)
-        score = health_score.score if health_score else 0
-        
-        # Create notification
-        title = f"Monthly Report - {last_month.strftime('%B %Y')}"
+        score = user.health_score or 0
         message = f"""
         Monthly Financial Summary:
         • Income: ${income:,.2f}
@@ -221,146 +199,178 @@ def generate_monthly_reports():
         • Net Savings: ${savings:,.2f}
         • Financial Health Score: {score}/100
         """
-        
-        Notification.objects.create(
+        notifications.append(Notification(
             user=user,
             title=title,
             message=message,
             notification_type='monthly_summary',
             priority='low'
-        )
-        
-        # Send email report
-        send_monthly_report_email.delay(user.id, title, message, income, expenses, savings, score)
-        reports_sent += 1
+        ))
+        emails.append(monthly_report_email(title, {
+            'user_id': user.pk, 'email': user.email, 'name': user.first_name or user.username,
+            'message': message, 'income': income, 'expenses': expenses,
+            'savings': savings, 'score': score, 'statement_path': statements.get(user.pk, ''),
+        }, statement_url))
+    Notification.create_many(notifications)
+    # The outbox drainer sends these in batches over one mail connection each
+    queue_emails(emails)
+    
+    record_rows(len(users_with_reports))
+    return f"Generated {len(emails)} monthly reports"
+
+
+def render_monthly_statements(users, last_month):
+    """Render last month's PDF statements; return ``({user_id: path}, statement link)``"""
+    import logging
+    from django.urls import reverse
+    from .utils.pdf_statements import generate_statements, statement_period
+
+    start_date, end_date = statement_period(last_month)
+    statement_url = (f"{settings.SITE_URL}{reverse('generate_pdf_report')}"
+                     f"?type=monthly&start_date={start_date}&end_date={end_date}")
+    try:
+        paths, _ = generate_statements(users, start_date, end_date)
+    except Exception:
+        # The link still works: the report view renders statements that are missing
+        logging.getLogger(__name__).exception("Rendering monthly statements failed")
+        paths = {}
+    return paths, statement_url
+
+
+def monthly_report_email(title, report, statement_url=''):
+    """Build the unsaved monthly report OutgoingEmail for one ``report`` dict"""
+    html_message = render_to_string('emails/monthly_report.html', {
+        'name': report['name'],
+        'income': Decimal(str(report['income'])),
+        'expenses': Decimal(str(report['expenses'])),
+        'savings': Decimal(str(report['savings'])),
+        'score': report['score'],
+        'statement_url': statement_url,
+    })
+    message = report['message']
+    if statement_url:
+        message = f"{message}\n        Download your PDF statement: {statement_url}\n"
     
-    return f"Generated {reports_sent} monthly reports"
+    email = OutgoingEmail(
+        user_id=report.get('user_id'),
+        to_email=report['email'],
+        subject=title,
+        body=message,
+        html_body=html_message,
+        category='monthly_summary',
+    )
+    statement_path = report.get('statement_path')
+    if statement_path and settings.MONTHLY_STATEMENT_ATTACH and default_storage.exists(statement_path):
+        email.attachment_path = statement_path
+        # monthly_<start>_<end>_<version>.pdf, without the version
+        email.attachment_name = statement_path.rsplit('/', 1)[-1].rsplit('_', 1)[0] + '.pdf'
+    return email
 
 
 @shared_task
-def send_monthly_report_email(user_id, title, message, income, expenses, savings, score):
-    """Send monthly report email with detailed statistics"""
+@instrument_task
+def send_monthly_report_email(user_id, title, message, income, expenses, savings, score,
+                              statement_url='', statement_path=''):
+    """Queue a monthly report email with detailed statistics and the PDF statement"""
     try:
         user = User.objects.get(id=user_id)
-        
-        # Render HTML email template
-        html_message = render_to_string('emails/monthly_report.html', {
-            'user': user,
-            'income': income,
-            'expenses': expenses,
-            'savings': savings,
-            'score': score,
-        })
-        
-        send_mail(
-            subject=title,
-            message=message,
-            from_email='noreply@expensetracker.com',
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return f"Monthly report email sent to {user.email}"
+        queue_emails([monthly_report_email(title, {
+            'user_id': user.pk, 'email': user.email, 'name': user.first_name or user.username,
+            'message': message, 'income': income, 'expenses': expenses, 'savings': savings,
+            'score': score, 'statement_path': statement_path,
+        }, statement_url)])
+        record_rows(1)
+        return f"Monthly report email queued for {user.email}"
     except Exception as e:
-        return f"Failed to send monthly report: {str(e)}"
+        return f"Failed to queue monthly report: {str(e)}"
+
+
+@shared_task
+@instrument_task
+def drain_mail_outbox():
+    """Send queued emails in batches, one mail connection per batch"""
+    return drain_outbox()
 
 
 @shared_task
-def check_savings_goal_milestones():
+@instrument_task
+@single_instance()
+@sharded
+def check_savings_goal_milestones(shard=None):
     """Check for savings goal milestones and create celebrations"""
-    goals = SavingsGoal.objects.filter(status='active')
-    
-    milestones_created = 0
-    for goal in goals:
-        progress = goal.progress_percentage
-        
-        # Check for milestone achievements (25%, 50%, 75%, 100%)
-        milestones = [25, 50, 75, 100]
-        for milestone in milestones:
-            if progress >= milestone:
-                # Check if milestone notification already exists
-                existing = Notification.objects.filter(
-                    user=goal.user,
-                    notification_type='goal_milestone',
-                    title__contains=f"{milestone}% of {goal.name}"
-                ).exists()
-                
-                if not existing:
-                    if milestone == 100:
-                        title = f"🎉 Goal Achieved: {goal.name}"
-                        message = f"Congratulations! You've reached your savings goal of ${goal.target_amount}!"
-                        goal.status = 'completed'
-                        goal.completed_at = timezone.now()
-                        goal.save()
-                    else:
-                        title = f"🎯 Milestone Reached: {milestone}% of {goal.name}"
-                        message = f"Great progress! You've saved ${goal.current_amount} towards your ${goal.target_amount} goal."
-                    
-                    Notification.objects.create(
-                        user=goal.user,
-                        title=title,
-                        message=message,
-                        notification_type='goal_milestone',
-                        priority='medium'
-                    )
-                    milestones_created += 1
+    goals = list(SavingsGoal.objects.filter(shard_q(shard), status='active').select_related('user'))
+    completed, events = goal_milestones(goals)
     
-    return f"Created {milestones_created} goal milestone notifications"
+    SavingsGoal.objects.bulk_update(completed, ['status', 'completed_at'])
+    DataVersion.bump(*(goal.user_id for goal in completed))
+    notify(events)
+    record_rows(len(goals))
+    return f"Created {len(events)} goal milestone notifications"
 
 
 @shared_task
-def detect_unusual_spending():
+@instrument_task
+@single_instance()
+@sharded
+@use_replica()
+def detect_unusual_spending(shard=None):
     """Detect unusual spending patterns and alert users"""
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    users = User.objects.all()
-    alerts_created = 0
-    
-    for user in users:
-        # Calculate average daily spending for last month
-        monthly_expenses = Transaction.objects.filter(
-            user=user,
-            trans_type='expense',
-            date__gte=month_ago,
-            date__lt=week_ago
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        avg_daily_spending = monthly_expenses / 23 if monthly_expenses > 0 else Decimal('0')
-        
-        # Calculate this week's daily spending
-        weekly_expenses = Transaction.objects.filter(
-            user=user,
-            trans_type='expense',
-            date__gte=week_ago
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        days_this_week = (today - week_ago).days or 1
-        weekly_daily_avg = weekly_expenses / days_this_week
-        
-        # Alert if spending is 50% higher than usual
-        if avg_daily_spending > 0 and weekly_daily_avg > (avg_daily_spending * Decimal('1.5')):
-            increase_percent = ((weekly_daily_avg - avg_daily_spending) / avg_daily_spending) * 100
-            
-            title = "⚠️ Unusual Spending Detected"
-            message = f"Your daily spending this week (${weekly_daily_avg:.2f}) is {increase_percent:.0f}% higher than usual (${avg_daily_spending:.2f})"
-            
-            # Check if alert already sent this week
-            existing = Notification.objects.filter(
-                user=user,
-                notification_type='unusual_spending',
-                created_at__gte=week_ago
-            ).exists()
-            
-            if not existing:
-                Notification.objects.create(
-                    user=user,
-                    title=title,
-                    message=message,
-                    notification_type='unusual_spending',
-                    priority='medium'
-                )
-                alerts_created += 1
+    users_checked, events = unusual_spending(timezone.now().date(), shard_q(shard))
     
-    return f"Created {alerts_created} unusual spending alerts"
+    notify(events)
+    record_rows(users_checked)
+    return f"Created {len(events)} unusual spending alerts"
+
+
+@shared_task
+@instrument_task
+@single_instance()
+def process_change_events():
+    """Evaluate alerts for just the budgets, goals and users that recent writes touched"""
+    events, alerts = process_events()
+    record_rows(events)
+    return f"Processed {events} change events into {alerts} alerts"
+
+
+@shared_task
+@instrument_task
+@single_instance(key=lambda mode='hourly', **kwargs: mode)
+@sharded
+def send_notification_digests(mode='hourly', shard=None):
+    """Send each digest user one notification and email covering their queued alerts"""
+    digests, events = send_digests(mode, shard=shard)
+    record_rows(events)
+    return f"Sent {digests} {mode} digests covering {events} alerts"
+
+
+@shared_task
+@instrument_task
+def merge_shard_results(results, task_name):
+    """Summarize the results of a sharded task's shards once they have all finished"""
+    return f"{task_name}: {merge_results(results)} ({len(results)} shards)"
+
+
+@shared_task
+@instrument_task
+@single_instance()
+def purge_old_notifications():
+    """Delete, or archive, read notifications past the retention period"""
+    purged, archived = purge_notifications()
+    record_rows(purged)
+    return f"Purged {purged} old notifications ({archived} archived)"
+
+
+@shared_task
+@instrument_task
+def process_import_job(job_id):
+    """Import a large uploaded transaction file in the background"""
+    from .utils.importers import run_import_job
+    return run_import_job(job_id)
+
+
+@shared_task
+@instrument_task
+def process_report_job(job_id):
+    """Render a PDF report in the background"""
+    from .utils.reports import run_report_job
+    return run_report_job(job_id)
@@ -0,0 +1,76 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from tracker.models import Budget, BudgetAlert, Category, ChangeEvent, Notification, SavingsGoal, Transaction
+from tracker.utils.change_events import budget_touched, process_events, record_transactions
+
+
+TODAY = date(2026, 10, 15)
+
+
+class ChangeEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('events')
+        self.food = Category.objects.create(name='Food')
+        self.budget = Budget.objects.create(user=self.user, name='Groceries', category=self.food,
+                                            amount=Decimal('100.00'), start_date=date(2026, 10, 1),
+                                            end_date=date(2026, 10, 31))
+        ChangeEvent.objects.all().delete()
+
+    def spend(self, amount, day=TODAY, **kwargs):
+        return Transaction.objects.create(user=self.user, category=self.food, amount=Decimal(amount),
+                                          trans_type='expense', date=day, **kwargs)
+
+    def test_expenses_record_a_spending_event_for_their_month(self):
+        self.spend('10.00')
+        Transaction.objects.create(user=self.user, amount=Decimal('50.00'), trans_type='income', date=TODAY)
+        event = ChangeEvent.objects.get()
+        self.assertEqual((event.kind, event.category_id, event.period), ('spending', self.food.pk, date(2026, 10, 1)))
+
+    def test_bulk_transactions_record_one_event_per_month(self):
+        transactions = [Transaction(user=self.user, category=self.food, amount=Decimal('1.00'),
+                                    trans_type='expense', date=day)
+                        for day in (date(2026, 10, 2), date(2026, 10, 9), date(2026, 9, 30))]
+        self.assertEqual(len(record_transactions(transactions)), 2)
+
+    def test_crossing_a_threshold_alerts_once_and_drains_the_events(self):
+        self.spend('40.00')
+        self.assertEqual(process_events(today=TODAY), (1, 0))
+
+        self.spend('52.00')
+        self.assertEqual(process_events(today=TODAY), (1, 1))
+        self.assertEqual(list(BudgetAlert.objects.values_list('alert_type', flat=True)), ['90_percent'])
+        self.assertTrue(Notification.objects.filter(user=self.user, notification_type='budget_alert').exists())
+        self.assertFalse(ChangeEvent.objects.exists())
+
+        self.spend('1.00')
+        self.assertEqual(process_events(today=TODAY), (1, 0))
+
+    def test_writes_outside_the_budget_dates_are_ignored(self):
+        self.spend('95.00', day=date(2026, 9, 20))
+        self.assertEqual(process_events(today=TODAY), (1, 0))
+        self.assertFalse(BudgetAlert.objects.exists())
+
+    def test_completed_goals_are_marked_and_announced(self):
+        goal = SavingsGoal.objects.create(user=self.user, name='Bike', target_amount=Decimal('200.00'),
+                                          current_amount=Decimal('200.00'))
+        process_events(today=TODAY)
+        goal.refresh_from_db()
+        self.assertEqual(goal.status, 'completed')
+        self.assertIsNotNone(goal.completed_at)
+        self.assertTrue(Notification.objects.filter(user=self.user, title__contains='Goal Achieved').exists())
+
+    def test_drains_in_batches(self):
+        for _ in range(3):
+            self.spend('1.00')
+        self.assertEqual(process_events(batch_size=2, max_batches=1, today=TODAY), (2, 0))
+        self.assertEqual(ChangeEvent.objects.count(), 1)
+        self.assertEqual(process_events(batch_size=2, today=TODAY), (1, 0))
+
+    def test_budget_touched_by_overlapping_months(self):
+        self.assertTrue(budget_touched(self.budget, [date(2026, 10, 1)]))
+        self.assertTrue(budget_touched(self.budget, [None]))
+        self.assertFalse(budget_touched(self.budget, [date(2026, 9, 1), date(2026, 11, 1)]))
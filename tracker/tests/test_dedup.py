@@ -0,0 +1,52 @@
+import importlib
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from tracker.models import Transaction
+from tracker.utils.dedup import find_near_duplicates, normalize_description, transaction_fingerprint
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_normalize_description(self):
+        self.assertEqual(normalize_description('  STARBUCKS, Store #12!! '), 'starbucks store 12')
+        self.assertEqual(normalize_description(None), '')
+
+    def test_fingerprint_ignores_formatting(self):
+        day = date(2024, 1, 2)
+        self.assertEqual(transaction_fingerprint(day, '5', 'Coffee Shop'),
+                         transaction_fingerprint(day, Decimal('5.00'), 'coffee-shop '))
+        self.assertNotEqual(transaction_fingerprint(day, '5', 'Coffee'),
+                            transaction_fingerprint(day, '5.01', 'Coffee'))
+        self.assertNotEqual(transaction_fingerprint(day, '5', 'Coffee'),
+                            transaction_fingerprint(date(2024, 1, 3), '5', 'Coffee'))
+
+    def test_migration_copy_matches(self):
+        migration = importlib.import_module('tracker.migrations.0009_transaction_fingerprint')
+        for args in ((date(2024, 1, 2), '12.5', 'Café, Inc!'), (date(2020, 5, 1), 3, None)):
+            self.assertEqual(migration.transaction_fingerprint(*args), transaction_fingerprint(*args))
+
+
+class NearDuplicateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('dedup', password='x')
+
+    def add(self, day, amount, description, trans_type='expense'):
+        return Transaction.objects.create(user=self.user, date=date(2024, 1, day), amount=Decimal(amount),
+                                          description=description, trans_type=trans_type)
+
+    def test_fingerprint_is_stored_on_save(self):
+        txn = self.add(2, '5.00', 'Coffee')
+        self.assertEqual(txn.fingerprint, transaction_fingerprint(txn.date, txn.amount, txn.description))
+
+    def test_finds_similar_rows_within_the_window(self):
+        first = self.add(2, '42.00', 'Shell Gas Station')
+        second = self.add(3, '42.00', 'SHELL GAS STATION #1')
+        self.add(10, '42.00', 'Shell Gas Station')  # Too far apart
+        self.add(3, '42.00', 'Shell Gas Station', trans_type='income')  # Different type
+        self.add(2, '41.99', 'Shell Gas Station')  # Different amount
+        pairs = find_near_duplicates(self.user)
+        self.assertEqual([(a, b) for a, b, _ in pairs], [(first.pk, second.pk)])
+        self.assertGreaterEqual(pairs[0][2], 0.8)
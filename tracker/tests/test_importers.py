@@ -0,0 +1,101 @@
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from tracker.models import Account, Category, Transaction
+from tracker.utils.importers import (
+    TransactionImporter, parse_amount, parse_date, read_csv_rows, validate_records,
+)
+
+
+def csv_file(text):
+    return BytesIO(text.encode('utf-8'))
+
+
+class ParsingTests(TestCase):
+    def test_parse_amount(self):
+        self.assertEqual(parse_amount('$1,234.50'), Decimal('1234.50'))
+        self.assertEqual(parse_amount('(12.00)'), Decimal('-12.00'))
+        self.assertEqual(parse_amount('-3.456'), Decimal('-3.46'))
+        for value in ('', 'abc', 'NaN'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_amount(value)
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date('2024-01-31'), date(2024, 1, 31))
+        self.assertEqual(parse_date('01/31/2024'), date(2024, 1, 31))
+        self.assertEqual(parse_date('31.01.2024'), date(2024, 1, 31))
+        self.assertEqual(parse_date('', default=date(2020, 1, 1)), date(2020, 1, 1))
+        with self.assertRaises(ValueError):
+            parse_date('31st January')
+
+    def test_read_csv_rows_with_column_mapping(self):
+        rows = list(read_csv_rows(
+            csv_file('When,Value,Memo\n2024-01-02, 5.00 ,Coffee\n'),
+            {'date': 'When', 'amount': 'Value', 'description': 'Memo', 'type': ''},
+        ))
+        self.assertEqual(len(rows), 1)
+        line, record = rows[0]
+        self.assertEqual(line, 2)
+        self.assertEqual((record['date'], record['amount'], record['description']), ('2024-01-02', '5.00', 'Coffee'))
+        self.assertEqual(record['type'], '')
+
+    def test_validate_records(self):
+        valid, errors = validate_records([
+            (2, {'date': '2024-01-02', 'amount': '-5.00', 'type': 'debit', 'description': 'Coffee'}),
+            (3, {'date': '2024-01-02', 'amount': 'lots', 'type': 'expense'}),
+            (4, {'date': '2024-01-02', 'amount': '1', 'type': 'gift'}),
+        ])
+        self.assertEqual([r['line'] for r in valid], [2])
+        self.assertEqual(valid[0]['amount'], Decimal('5.00'))
+        self.assertEqual(valid[0]['trans_type'], 'expense')
+        self.assertEqual([e['line'] for e in errors], [3, 4])
+
+
+class TransactionImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('importer', password='x')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+
+    def run_import(self, text, **kwargs):
+        return TransactionImporter(self.user, **kwargs).run(read_csv_rows(csv_file(text)))
+
+    def test_imports_in_batches_and_updates_balances_once(self):
+        importer = self.run_import(
+            'date,amount,description,type,category,account\n'
+            '2024-01-02,10.00,Groceries,expense,Food,checking\n'
+            '2024-01-03,50.00,Salary,income,,Checking\n'
+            '2024-01-04,2.50,Coffee,expense,Food,Checking\n',
+            batch_size=2,
+        )
+        self.assertEqual((importer.processed, importer.imported, importer.error_count), (3, 3, 0))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('137.50'))
+        food = Category.objects.get(name='Food')
+        self.assertEqual(Transaction.objects.filter(user=self.user, category=food).count(), 2)
+
+    def test_reports_row_errors_and_keeps_valid_rows(self):
+        importer = self.run_import(
+            'date,amount,description,account\n'
+            '2024-01-02,oops,Bad amount,\n'
+            '2024-01-03,4.00,Unknown account,Savings\n'
+            '2024-01-04,3.00,Fine,\n'
+        )
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([e['line'] for e in importer.errors], [2, 3])
+
+    @override_settings(IMPORT_ERROR_REPORT_LIMIT=1)
+    def test_error_report_is_capped_but_counted(self):
+        importer = self.run_import('date,amount\n2024-01-02,x\n2024-01-03,y\n')
+        self.assertEqual(importer.error_count, 2)
+        self.assertEqual(len(importer.errors), 1)
+
+    def test_skips_rows_already_imported(self):
+        text = 'date,amount,description\n2024-01-02,10.00,Groceries\n2024-01-02,10.00,Groceries\n'
+        self.assertEqual(self.run_import(text).imported, 2)
+        again = self.run_import(text + '2024-01-03,1.00,New\n')
+        self.assertEqual((again.imported, again.duplicate_count), (1, 2))
+        self.assertEqual(self.run_import(text, skip_duplicates=False).imported, 2)
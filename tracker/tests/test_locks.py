@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tracker.models import TaskLock, TaskRun
+from tracker.utils.locks import acquire, extend, release, single_instance
+from tracker.utils.metrics import record_rows
+
+
+class LeaseTests(TestCase):
+    def test_only_one_owner_until_released_or_expired(self):
+        self.assertTrue(acquire('job', 'a', 60))
+        self.assertFalse(acquire('job', 'b', 60))
+        self.assertTrue(extend('job', 'a', 60))
+        self.assertFalse(extend('job', 'b', 60))
+
+        release('job', 'b')  # Not the owner: no effect
+        self.assertFalse(acquire('job', 'b', 60))
+        release('job', 'a')
+        self.assertTrue(acquire('job', 'b', 60))
+
+        TaskLock.objects.filter(name='job').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(acquire('job', 'c', 60))
+        self.assertEqual(TaskLock.objects.get(name='job').owner, 'c')
+        self.assertFalse(extend('job', 'b', 60))
+
+
+class SingleInstanceTests(TestCase):
+    def test_records_successful_runs_and_releases_the_lock(self):
+        @single_instance()
+        def sweep():
+            record_rows(7)
+            return 'Swept 7 rows'
+
+        self.assertEqual(sweep(), 'Swept 7 rows')
+        run = TaskRun.objects.get()
+        self.assertEqual((run.task_name, run.outcome, run.rows_processed, run.message),
+                         ('sweep', 'success', 7, 'Swept 7 rows'))
+        self.assertFalse(TaskLock.objects.exists())
+
+    def test_overlapping_runs_are_skipped(self):
+        @single_instance()
+        def sweep():
+            return sweep_again()
+
+        @single_instance()
+        def sweep_again():
+            return 'ran'
+
+        # Both use the task name 'sweep_again'; hold it so the inner run overlaps
+        acquire('sweep_again', 'other-worker', 60)
+        self.assertEqual(sweep(), 'Skipped: sweep_again is already running; skipped')
+        self.assertEqual(
+            sorted(TaskRun.objects.values_list('task_name', 'outcome')),
+            [('sweep', 'success'), ('sweep_again', 'skipped')],
+        )
+
+    def test_queue_on_conflict_sends_the_run_again(self):
+        @single_instance(on_conflict='queue')
+        def drain(batch=1):
+            return 'drained'
+
+        acquire('drain', 'other-worker', 60)
+        with mock.patch('tracker.utils.locks.requeue') as requeue:
+            drain(batch=5)
+        requeue.assert_called_once_with('drain', (), {'batch': 5}, mock.ANY)
+
+    def test_failures_are_recorded_and_raised(self):
+        @single_instance()
+        def broken():
+            raise ValueError('bad data')
+
+        with self.assertRaises(ValueError):
+            broken()
+        run = TaskRun.objects.get()
+        self.assertEqual((run.outcome, run.message), ('failure', 'ValueError: bad data'))
+        self.assertFalse(TaskLock.objects.exists())
+
+    def test_lock_names_from_key_and_shard(self):
+        names = []
+
+        @single_instance(key=lambda mode='hourly', **kwargs: mode)
+        def digests(mode='hourly', shard=None):
+            names.extend(TaskLock.objects.values_list('name', flat=True))
+
+        digests('daily')
+        digests('daily', shard=[1, 4])
+        self.assertEqual(names, ['digests:daily', 'digests:daily:shard:1/4'])
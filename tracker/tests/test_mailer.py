@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tracker.models import OutgoingEmail
+from tracker.utils.mailer import claim_batch, drain_outbox
+
+
+class CountingBackend(EmailBackend):
+    """locmem backend that counts connections and rejects addresses at bounce.test"""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(to.endswith('@bounce.test') for message in messages for to in message.to):
+            raise ConnectionError('rejected')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='tracker.tests.test_mailer.CountingBackend', MAIL_BATCH_SIZE=2,
+                   MAIL_MAX_ATTEMPTS=2, MAIL_RETRY_BASE_SECONDS=60)
+class MailOutboxTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def queue(self, *addresses):
+        return OutgoingEmail.objects.bulk_create(
+            OutgoingEmail(to_email=address, subject=f"To {address}", body='Hello') for address in addresses
+        )
+
+    def test_sends_in_batches_over_one_connection_each(self):
+        self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        self.assertEqual(drain_outbox(), 'Sent 3 emails in 2 batches, 0 failed')
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(OutgoingEmail.objects.filter(status='sent').count(), 3)
+
+    def test_failures_back_off_then_give_up(self):
+        bounce, = self.queue('x@bounce.test')
+        self.queue('ok@example.com')
+        self.assertEqual(drain_outbox(), 'Sent 1 emails in 1 batches, 1 failed')
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts, bounce.last_error), ('pending', 1, 'rejected'))
+        self.assertGreater(bounce.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet
+        self.assertEqual(drain_outbox(), 'Sent 0 emails in 0 batches, 0 failed')
+        OutgoingEmail.objects.filter(pk=bounce.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('tracker.utils.mailer', 'ERROR'):
+            drain_outbox()
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), ('failed', 2))
+
+    @override_settings(MAIL_CLAIM_TIMEOUT=600)
+    def test_reclaims_batches_of_dead_drainers(self):
+        stuck, fresh = self.queue('a@example.com', 'b@example.com')
+        OutgoingEmail.objects.filter(pk=stuck.pk).update(
+            status='sending', claim_token='dead', claimed_at=timezone.now() - timedelta(hours=1))
+        OutgoingEmail.objects.filter(pk=fresh.pk).update(
+            status='sending', claim_token='alive', claimed_at=timezone.now())
+        self.assertEqual([email.pk for email in claim_batch(10)], [stuck.pk])
+
+    @override_settings(MAIL_OUTBOX_RETENTION_DAYS=7)
+    def test_purges_old_sent_messages(self):
+        old, = self.queue('a@example.com')
+        OutgoingEmail.objects.filter(pk=old.pk).update(status='sent', sent_at=timezone.now() - timedelta(days=8))
+        drain_outbox()
+        self.assertFalse(OutgoingEmail.objects.filter(pk=old.pk).exists())
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from tracker.utils import metrics
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(METRICS_DIR=self.directory)
+        self.settings_override.enable()
+        self.registry = metrics.registry
+        metrics.registry = metrics.MetricsRegistry()
+
+    def tearDown(self):
+        metrics.registry = self.registry
+        self.settings_override.disable()
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def write_file(self, pid, counters):
+        path = os.path.join(self.directory, f"metrics_{pid}_abcd1234.json")
+        with open(path, 'w') as f:
+            json.dump({'counters': counters, 'histograms': []}, f)
+        return path
+
+    def dead_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        return process.pid
+
+    def test_merges_processes_and_renders(self):
+        labels = [['method', 'GET'], ['status', '200'], ['view', 'dashboard']]
+        self.write_file(os.getppid(), [['tracker_requests_total', labels, 2]])
+        metrics.inc('tracker_requests_total', {'view': 'dashboard', 'method': 'GET', 'status': '200'})
+        metrics.observe('tracker_request_duration_seconds', {'view': 'dashboard'}, 0.02)
+        text = metrics.render_prometheus()
+        self.assertIn('tracker_requests_total{method="GET",status="200",view="dashboard"} 3', text)
+        self.assertIn('tracker_request_duration_seconds_bucket{view="dashboard",le="0.025"} 1', text)
+        self.assertIn('tracker_request_duration_seconds_count{view="dashboard"} 1', text)
+
+    def request_count(self, view):
+        counters, _ = metrics.collect()
+        return counters.get(('tracker_requests_total', (('view', view),)), 0)
+
+    def test_totals_survive_dead_processes(self):
+        pid = self.dead_pid()
+        stale = self.write_file(pid, [['tracker_requests_total', [['view', 'old']], 5]])
+        partial = os.path.join(self.directory, f"metrics_{pid}_abcd1234.json.tmp")
+        open(partial, 'w').close()
+        self.assertEqual(self.request_count('old'), 5)
+        self.assertFalse(os.path.exists(stale))
+        self.assertFalse(os.path.exists(partial))
+
+        # Another worker recycled later adds to the archived total
+        self.write_file(self.dead_pid(), [['tracker_requests_total', [['view', 'old']], 2]])
+        self.assertEqual(self.request_count('old'), 7)
+        self.assertEqual(self.request_count('old'), 7)
+
+    def test_totals_survive_a_process_exiting(self):
+        metrics.inc('tracker_requests_total', {'view': 'x'})
+        metrics.observe('tracker_request_duration_seconds', {'view': 'x'}, 0.3)
+        metrics.registry.flush()
+        metrics.registry.archive()
+        self.assertFalse(os.path.exists(metrics.registry.path))
+        self.assertEqual(self.request_count('x'), 1)
+
+        # Samples recorded after archiving are not counted twice
+        metrics.inc('tracker_requests_total', {'view': 'x'})
+        self.assertEqual(self.request_count('x'), 2)
+        _, histograms = metrics.collect()
+        self.assertEqual(histograms[('tracker_request_duration_seconds', (('view', 'x'),))]['count'], 1)
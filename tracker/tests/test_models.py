@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from tracker.models import Account, Transaction
+
+
+class TransactionBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('balances', password='x')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.savings = Account.objects.create(user=self.user, name='Savings', balance=Decimal('0.00'))
+
+    def balance(self, account):
+        return Account.objects.get(pk=account.pk).balance
+
+    def test_save_edit_and_delete_update_the_balance(self):
+        txn = Transaction.objects.create(user=self.user, account=self.account, amount=Decimal('10.00'),
+                                         trans_type='expense', description='Lunch')
+        self.assertEqual(self.balance(self.account), Decimal('90.00'))
+        txn.amount = Decimal('25.00')
+        txn.trans_type = 'income'
+        txn.save()
+        self.assertEqual(self.balance(self.account), Decimal('125.00'))
+        txn.delete()
+        self.assertEqual(self.balance(self.account), Decimal('100.00'))
+
+    def test_transfer_moves_money_between_accounts(self):
+        Transaction.objects.create(user=self.user, account=self.account, transfer_account=self.savings,
+                                   amount=Decimal('40.00'), trans_type='transfer')
+        self.assertEqual(self.balance(self.account), Decimal('60.00'))
+        self.assertEqual(self.balance(self.savings), Decimal('40.00'))
+
+    def test_loaded_account_matches_the_database(self):
+        cached = Transaction(user=self.user, account=self.account, amount=Decimal('10.00'), trans_type='expense')
+        cached.save()
+        self.assertEqual(self.account.balance, self.balance(self.account))
+
+        # Not loaded before saving: reading it afterwards must not count the change twice
+        lazy = Transaction(user=self.user, account_id=self.account.pk, amount=Decimal('10.00'), trans_type='expense')
+        lazy.save()
+        self.assertEqual(lazy.account.balance, Decimal('80.00'))
+        self.assertEqual(self.balance(self.account), Decimal('80.00'))
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from tracker.models import Notification, NotificationEvent, OutgoingEmail, UserPreferences
+from tracker.utils.notifications import already_notified, notify, send_digests
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.immediate = self.user('now', 'immediate')
+        self.hourly = self.user('hourly', 'hourly')
+        self.daily = self.user('daily', 'daily')
+
+    def user(self, name, digest_mode):
+        user = User.objects.create_user(name, email=f"{name}@example.com")
+        UserPreferences.objects.create(user=user, digest_mode=digest_mode)
+        return user
+
+    def event(self, user, title='Budget Alert: Food', notification_type='budget_alert', priority='medium',
+              send_email=True):
+        return NotificationEvent(user=user, title=title, message='Details', notification_type=notification_type,
+                                 priority=priority, send_email=send_email)
+
+    def test_notify_delivers_immediately_or_queues_for_the_digest(self):
+        delivered = notify([
+            self.event(self.immediate),
+            self.event(self.immediate, title='No email', send_email=False),
+            self.event(self.hourly),
+            self.event(self.daily, title='Goal', notification_type='goal_milestone', send_email=False),
+        ])
+        self.assertEqual(delivered, 3)
+        self.assertEqual(Notification.objects.filter(user=self.immediate).count(), 2)
+        self.assertEqual(list(OutgoingEmail.objects.values_list('to_email', flat=True)), ['now@example.com'])
+        self.assertFalse(Notification.objects.filter(user=self.hourly).exists())
+        self.assertEqual(NotificationEvent.objects.filter(user=self.hourly, digested_at__isnull=True).count(), 1)
+        # Goal milestones are never held back for a digest
+        self.assertTrue(Notification.objects.filter(user=self.daily, notification_type='goal_milestone').exists())
+
+    def test_send_digests_rolls_events_into_one_notification(self):
+        notify([
+            self.event(self.hourly, title='First', priority='low', send_email=False),
+            self.event(self.hourly, title='Second', priority='high'),
+            self.event(self.daily),
+        ])
+        self.assertEqual(send_digests('hourly'), (1, 2))
+        digest = Notification.objects.get(user=self.hourly)
+        self.assertEqual((digest.title, digest.priority), ('Your hourly digest: 2 alerts', 'high'))
+        self.assertIn('First', digest.message)
+        self.assertIn('Second', digest.message)
+        self.assertEqual(OutgoingEmail.objects.filter(to_email='hourly@example.com').count(), 1)
+        # The daily user's event waits for the daily run, and nothing is sent twice
+        self.assertEqual(send_digests('hourly'), (0, 0))
+        self.assertEqual(send_digests('daily'), (1, 1))
+
+    def test_users_back_on_immediate_get_leftovers_with_the_hourly_run(self):
+        notify([self.event(self.daily)])
+        UserPreferences.objects.filter(user=self.daily).update(digest_mode='immediate')
+        self.assertEqual(send_digests('hourly'), (1, 1))
+
+    def test_digested_events_count_as_already_notified_until_retention(self):
+        notify([self.event(self.hourly, title='Budget Alert: Rent'), self.event(self.immediate, title='Budget Alert: Fun')])
+        send_digests('hourly')
+        users = {self.hourly.pk, self.immediate.pk}
+        self.assertEqual(already_notified('budget_alert', users), {
+            (self.hourly.pk, 'Budget Alert: Rent'), (self.immediate.pk, 'Budget Alert: Fun'),
+        })
+        self.assertEqual(already_notified('budget_alert', users, since=timezone.now() + timedelta(minutes=1)), set())
+
+        send_digests('hourly', now=timezone.now() + timedelta(days=9))
+        self.assertFalse(NotificationEvent.objects.filter(user=self.hourly).exists())
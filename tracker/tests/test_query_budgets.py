@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from tracker.utils.benchmarks import celery_eager
+from tracker.utils.query_budgets import TASK_BUDGETS, VIEW_BUDGETS, check_results, measure_dataset
+
+
+class QueryBudgetTests(TestCase):
+    """Every view and task stays within its budget, and its query count does not grow with the data"""
+
+    def assert_within_budgets(self, views, tasks):
+        base, failed = measure_dataset(1, views, tasks)
+        scaled, scaled_failed = measure_dataset(2, views, tasks)
+        self.assertEqual(sorted(set(failed + scaled_failed)), [], 'views answered with a server error')
+        _, failures = check_results(base, scaled)
+        self.assertEqual(failures, [], '\n'.join(failures))
+
+    def test_views(self):
+        self.assert_within_budgets(list(VIEW_BUDGETS), [])
+
+    def test_tasks(self):
+        with celery_eager():
+            self.assert_within_budgets([], list(TASK_BUDGETS))
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from tracker import routers
+from tracker.models import Notification, Transaction
+from tracker.routers import PIN_COOKIE, REPLICA, ReplicaMiddleware, ReplicaRouter, use_replica
+
+
+@mock.patch('tracker.routers.replica_healthy', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_go_to_the_replica_only_when_asked(self, healthy):
+        self.assertEqual(self.router.db_for_read(Transaction), 'default')
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Transaction), REPLICA)
+            # Notifications are read and then written, and auth is not analytics data
+            self.assertEqual(self.router.db_for_read(Notification), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_read(Transaction), 'default')
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self, healthy):
+        healthy.return_value = False
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Transaction), 'default')
+
+    def test_writes_and_migrations_stay_on_the_primary(self, healthy):
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(Transaction), 'default')
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'tracker'))
+        self.assertTrue(self.router.allow_migrate('default', 'tracker'))
+
+
+@override_settings(REPLICA_HEALTH_CHECK_SECONDS=30, REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaHealthTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(routers._health, checked_at=float('-inf'), healthy=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lagging_replica_is_unhealthy(self):
+        with mock.patch('tracker.routers.replica_lag', return_value=12.0), self.assertLogs('tracker.routers', 'WARNING'):
+            self.assertFalse(routers.replica_healthy())
+
+    def test_result_is_remembered(self):
+        with mock.patch('tracker.routers.replica_lag', return_value=0.0) as lag:
+            self.assertTrue(routers.replica_healthy())
+            self.assertTrue(routers.replica_healthy())
+        self.assertEqual(lag.call_count, 1)
+
+    def test_unreachable_replica_is_unhealthy(self):
+        with mock.patch('tracker.routers.replica_lag', side_effect=OSError('refused')), \
+                self.assertLogs('tracker.routers', 'WARNING'):
+            self.assertFalse(routers.replica_healthy())
+
+
+@override_settings(REPLICA_VIEWS=['spending_report'])
+@mock.patch('tracker.routers.replica_configured', return_value=True)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def run_view(self, request, url_name, view):
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            seen['replica'] = routers.reading_replica.get()
+            view()
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        request.resolver_match = SimpleNamespace(url_name=url_name)
+        response = middleware(request)
+        self.assertFalse(routers.reading_replica.get())
+        return seen['replica'], response
+
+    def test_listed_views_read_the_replica(self, configured):
+        reads, _ = self.run_view(RequestFactory().get('/'), 'spending_report', lambda: None)
+        self.assertTrue(reads)
+        reads, _ = self.run_view(RequestFactory().get('/'), 'dashboard', lambda: None)
+        self.assertFalse(reads)
+        reads, _ = self.run_view(RequestFactory().post('/'), 'spending_report', lambda: None)
+        self.assertFalse(reads)
+
+    def test_a_write_pins_the_browser_to_the_primary(self, configured):
+        _, response = self.run_view(RequestFactory().post('/'), 'add_expense',
+                                    lambda: ReplicaRouter().db_for_write(Transaction))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/', HTTP_COOKIE=f'{PIN_COOKIE}=1')
+        reads, response = self.run_view(request, 'spending_report', lambda: None)
+        self.assertFalse(reads)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_not_installed_without_a_replica(self, configured):
+        configured.return_value = False
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(HttpResponse)
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tracker.models import FinancialHealthScore
+from tracker.tasks import calculate_financial_health_scores
+from tracker.utils.sharding import merge_results, shard_bounds, shard_count, shard_offsets, shard_q
+
+
+class ShardBoundsTests(TestCase):
+    def setUp(self):
+        self.ids = [User.objects.create_user(f'user{i}').pk for i in range(6)]
+
+    def test_shards_cover_every_user_once(self):
+        for count in (1, 2, 4, 6):
+            found = []
+            for index in range(count):
+                found += User.objects.filter(shard_q(shard_bounds(index, count), 'pk')).values_list('pk', flat=True)
+            self.assertEqual(sorted(found), self.ids, f'{count} shards')
+
+    def test_outer_shards_are_open_ended(self):
+        first, last = shard_bounds(0, 3), shard_bounds(2, 3)
+        self.assertIsNone(first[0])
+        self.assertIsNone(last[1])
+        self.assertEqual(shard_bounds(1, 3), [self.ids[2], self.ids[4] - 1])
+
+    def test_looks_up_only_the_boundary_ids(self):
+        # A count and one lookup per end, however many users there are
+        with self.assertNumQueries(3):
+            shard_bounds(1, 3)
+        with self.assertNumQueries(2):
+            shard_bounds(0, 3)
+
+    def test_shards_past_the_users_are_empty(self):
+        User.objects.filter(pk__in=self.ids[1:]).delete()
+        counts = [User.objects.filter(shard_q(shard_bounds(index, 4), 'pk')).count() for index in range(4)]
+        self.assertEqual(counts, [0, 0, 0, 1])
+
+    def test_shard_count_follows_the_number_of_users(self):
+        self.assertEqual(shard_count(8, 2), 3)
+        self.assertEqual(shard_count(2, 2), 2)
+        self.assertEqual(shard_count(8, 1000), 1)
+
+
+class MergeResultsTests(SimpleTestCase):
+    def test_sums_matching_results(self):
+        self.assertEqual(merge_results(['Created 3 budget alerts', 'Created 5 budget alerts']),
+                         'Created 8 budget alerts')
+
+    def test_lists_results_that_do_not_line_up(self):
+        self.assertEqual(merge_results(['Sent 2 reminders', 'Skipped: 1st shard busy', 'Sent 1 reminders']),
+                         'Sent 3 reminders; Skipped: 1st shard busy')
+
+    def test_offsets_spread_over_the_window(self):
+        self.assertEqual(shard_offsets(4, window=600, jitter=0), [0, 150, 300, 450])
+
+
+@override_settings(TASK_SHARDS=3, TASK_SHARD_MIN_USERS=2, CELERY_BROKER_URL='')
+class FanOutTests(TestCase):
+    def test_runs_each_shard_in_process_without_a_broker(self):
+        for i in range(5):
+            User.objects.create_user(f'user{i}')
+        self.assertEqual(calculate_financial_health_scores(),
+                         'Updated financial health scores for 5 users (3 shards)')
+        self.assertEqual(FinancialHealthScore.objects.count(), 5)
+
+    @override_settings(TASK_SHARDS=1)
+    def test_runs_once_when_sharding_is_off(self):
+        User.objects.create_user('solo')
+        self.assertEqual(calculate_financial_health_scores(), 'Updated financial health scores for 1 users')
@@ -0,0 +1,131 @@
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from tracker.models import Account, Transaction
+from tracker.utils.importers import TransactionImporter, detect_file_format, read_rows
+from tracker.utils.statements import iter_ofx_tokens, read_ofx_rows, read_qif_rows
+
+
+SGML_OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKACCTFROM><BANKID>123<ACCTID>987654321<ACCTTYPE>CHECKING</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240131120000.000[-5:EST]<TRNAMT>-12,50<FITID>A1<NAME>Coffee &amp; Co<MEMO>Card
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240201<TRNAMT>1000.00<FITID>A2<NAME>Salary
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+XML_OFX = b"""<?xml version="1.0"?>
+<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS>
+<CCACCTFROM><ACCTID>4111</ACCTID></CCACCTFROM>
+<BANKTRANLIST><STMTTRN><DTPOSTED>20240105</DTPOSTED><TRNAMT>-3.00</TRNAMT><FITID>C1</FITID><PAYEE>Bus</PAYEE></STMTTRN></BANKTRANLIST>
+</CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>
+"""
+
+QIF = b"""!Account
+NChecking
+TBank
+^
+!Type:Bank
+D1/31'24
+T-1,234.50
+PLandlord
+MJanuary
+LRent
+^
+D02/01/2024
+T200.00
+PTransfer in
+L[Savings]
+^
+!Type:Invst
+D1/1/2024
+T5.00
+^
+"""
+
+
+class OFXParserTests(SimpleTestCase):
+    def test_sgml_statement(self):
+        rows = list(read_ofx_rows(BytesIO(SGML_OFX)))
+        self.assertEqual([position for position, _ in rows], [1, 2])
+        first, second = rows[0][1], rows[1][1]
+        self.assertEqual(first['date'], date(2024, 1, 31))
+        self.assertEqual((first['amount'], first['type']), ('12.50', 'expense'))
+        self.assertEqual(first['description'], 'Coffee & Co - Card')
+        self.assertEqual((first['account_ref'], first['account_type'], first['fitid']), ('987654321', 'bank', 'A1'))
+        self.assertEqual((second['amount'], second['type'], second['fitid']), ('1000.00', 'income', 'A2'))
+
+    def test_xml_credit_card_statement(self):
+        rows = list(read_ofx_rows(BytesIO(XML_OFX)))
+        self.assertEqual(len(rows), 1)
+        record = rows[0][1]
+        self.assertEqual((record['account_ref'], record['account_type']), ('4111', 'card'))
+        self.assertEqual((record['description'], record['amount'], record['type']), ('Bus', '3.00', 'expense'))
+
+    def test_tokens_split_across_chunks(self):
+        from io import StringIO
+
+        tokens = list(iter_ofx_tokens(StringIO('<A>one<B>two</B><C>three'), chunk_size=3))
+        self.assertEqual(tokens, [(False, 'A', 'one'), (False, 'B', 'two'), (True, 'B', ''), (False, 'C', 'three')])
+
+
+class QIFParserTests(SimpleTestCase):
+    def test_bank_section(self):
+        rows = list(read_qif_rows(BytesIO(QIF)))
+        self.assertEqual(len(rows), 2)  # The investment section is skipped
+        line, rent = rows[0]
+        self.assertEqual(line, 6)
+        self.assertEqual(rent['date'], date(2024, 1, 31))
+        self.assertEqual((rent['amount'], rent['type'], rent['category']), ('1234.50', 'expense', 'Rent'))
+        self.assertEqual((rent['description'], rent['account_ref']), ('Landlord - January', 'Checking'))
+        transfer = rows[1][1]
+        self.assertEqual((transfer['type'], transfer['category']), ('income', ''))
+
+    def test_detect_file_format(self):
+        self.assertEqual(detect_file_format('Export.QFX'), 'ofx')
+        self.assertEqual(detect_file_format('money.qif'), 'qif')
+        self.assertEqual(detect_file_format('statement.txt'), 'csv')
+        self.assertEqual(detect_file_format('statement.txt', 'qif'), 'qif')
+
+
+class StatementImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('statements', password='x')
+
+    def run_import(self, data, file_format, **kwargs):
+        return TransactionImporter(self.user, **kwargs).run(read_rows(BytesIO(data), file_format))
+
+    def test_creates_accounts_and_skips_known_fitids(self):
+        importer = self.run_import(SGML_OFX, 'ofx')
+        self.assertEqual(importer.imported, 2)
+        account = Account.objects.get(user=self.user)
+        self.assertEqual((account.name, account.external_id), ('Account ...4321', '987654321'))
+        self.assertEqual(account.balance, Decimal('987.50'))
+
+        again = self.run_import(SGML_OFX, 'ofx')
+        self.assertEqual((again.imported, again.duplicate_count), (0, 2))
+        self.assertEqual(Account.objects.filter(user=self.user).count(), 1)
+
+    def test_fitids_are_unique_per_account(self):
+        self.run_import(SGML_OFX, 'ofx')
+        # The same FITIDs in another bank account are different transactions
+        other = SGML_OFX.replace(b'987654321', b'111122223').replace(b'Coffee', b'Tea').replace(b'Salary', b'Bonus')
+        self.assertEqual(self.run_import(other, 'ofx').imported, 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user, external_id='A1').count(), 2)
+
+    def test_skip_duplicates_off_keeps_known_fitids(self):
+        self.run_import(SGML_OFX, 'ofx')
+        self.assertEqual(self.run_import(SGML_OFX, 'ofx', skip_duplicates=False).imported, 2)
+
+    def test_qif_matches_existing_account_by_name(self):
+        checking = Account.objects.create(user=self.user, name='Checking')
+        importer = self.run_import(QIF, 'qif')
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(Transaction.objects.filter(account=checking).count(), 2)
@@ -12,10 +12,13 @@ urlpatterns = [
     path('transactions/<int:pk>/edit/', views.transaction_edit, name='transaction_edit'),
     path('transactions/<int:pk>/delete/', views.transaction_delete, name='transaction_delete'),
     path('transactions/<int:pk>/duplicate/', views.transaction_duplicate, name='transaction_duplicate'),
+    path('transactions/duplicates/', views.transaction_duplicates, name='transaction_duplicates'),
     path('export-csv/', views.export_transactions_csv, name='export_csv'),
 
     path('dashboard/', views.dashboard, name='dashboard'),
     path('import-csv/', views.import_transactions_csv, name='import_csv'),
+    path('imports/<int:pk>/', views.import_job_detail, name='import_job_detail'),
+    path('imports/<int:pk>/status/', views.import_job_status, name='import_job_status'),
     path('budgets/', views.budgets_list, name='budgets'),
     path('budgets/new/', views.budget_create, name='budget_create'),
     path('budgets/<int:pk>/edit/', views.budget_edit, name='budget_edit'),
@@ -56,8 +59,14 @@ urlpatterns = [
     # Enhanced Dashboard & Analytics
     path('dashboard/enhanced/', views.dashboard_enhanced, name='dashboard_enhanced'),
     path('notifications/', views.notifications_view, name='notifications'),
+    path('notifications/unread-count/', views.notification_count, name='notification_count'),
+    path('events/stream/', views.event_stream, name='event_stream'),
+    path('events/poll/', views.event_poll, name='event_poll'),
     path('financial-health/', views.financial_health_view, name='financial_health'),
     path('reports/pdf/', views.generate_pdf_report_view, name='generate_pdf_report'),
+    path('reports/jobs/<int:pk>/', views.report_job_detail, name='report_job_detail'),
+    path('reports/jobs/<int:pk>/status/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:pk>/download/', views.report_job_download, name='report_job_download'),
     
     # Advanced Search & Calendar
     path('search/advanced/', views.advanced_search_view, name='advanced_search'),
@@ -68,4 +77,12 @@ urlpatterns = [
     
     # AI Insights
     path('ai-insights/', views.ai_insights_view, name='ai_insights'),
+
+    # Staff diagnostics
+    path('staff/queries/', views.query_report_view, name='query_report'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('staff/slow-queries/', views.slow_queries_view, name='slow_queries'),
+    path('staff/profiles/', views.request_profiles_view, name='request_profiles'),
+    path('staff/profiles/<int:pk>/', views.request_profile_detail, name='request_profile'),
+    path('staff/profiles/<int:pk>/<str:kind>/', views.request_profile_download, name='request_profile_download'),
 ]
@@ -0,0 +1,157 @@
+"""Alert rules shared by the scheduled sweeps and the change-event consumer.
+
+Each function evaluates only the rows it is given (or that match ``q``), so
+utils.change_events can check just the budgets, goals and users a write
+touched, while the tasks in tracker.tasks check everything.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .notifications import already_notified
+
+
+GOAL_MILESTONES = (25, 50, 75, 100)
+
+
+def active_budgets(today, q=Q()):
+    """Budgets running today, annotated with what has been spent in them"""
+    from ..models import Budget
+
+    return list(
+        Budget.objects.filter(q, start_date__lte=today, end_date__gte=today, amount__gt=0)
+        .select_related('user__userpreferences')
+        .with_spent(start=today.replace(day=1), end=today, use_budget_dates=True)
+    )
+
+
+def budget_alerts(budgets):
+    """Return ``(BudgetAlerts, NotificationEvents)`` for budgets past a threshold not yet alerted"""
+    from ..models import BudgetAlert, NotificationEvent
+
+    already_sent = set(
+        BudgetAlert.objects.filter(budget__in=budgets).values_list('budget_id', 'alert_type')
+    )
+
+    alerts, events = [], []
+    for budget in budgets:
+        spent = budget.spent
+        percentage_used = (spent / budget.amount) * 100
+
+        # Check thresholds and create alerts
+        if percentage_used >= 100:
+            alert_type = '100_percent'
+        elif percentage_used >= 90:
+            alert_type = '90_percent'
+        elif percentage_used >= 75:
+            alert_type = '75_percent'
+        elif percentage_used >= 50:
+            alert_type = '50_percent'
+        else:
+            continue
+        if (budget.pk, alert_type) in already_sent:
+            continue
+
+        title = f"Budget Alert: {budget.name}"
+        message = f"You've used {percentage_used:.1f}% of your {budget.name} budget (${spent} of ${budget.amount})"
+        alerts.append(BudgetAlert(budget=budget, alert_type=alert_type, is_sent=True))
+        # Send email if user has email notifications enabled
+        preferences = getattr(budget.user, 'userpreferences', None)
+        events.append(NotificationEvent(
+            user=budget.user,
+            title=title,
+            message=message,
+            notification_type='budget_alert',
+            priority='high' if percentage_used >= 90 else 'medium',
+            send_email=bool(preferences and preferences.budget_alerts and preferences.email_notifications),
+        ))
+    return alerts, events
+
+
+def goal_milestones(goals):
+    """Return ``(completed goals, NotificationEvents)`` for milestones the goals have newly reached"""
+    from ..models import NotificationEvent
+
+    existing_titles = defaultdict(list)
+    for user_id, title in already_notified('goal_milestone', {goal.user_id for goal in goals}):
+        existing_titles[user_id].append(title)
+
+    completed, events = [], []
+    for goal in goals:
+        progress = goal.progress_percentage
+
+        # Check for milestone achievements (25%, 50%, 75%, 100%)
+        for milestone in GOAL_MILESTONES:
+            if progress >= milestone:
+                # Check if milestone notification already exists
+                marker = f"{milestone}% of {goal.name}"
+                if not any(marker in title for title in existing_titles[goal.user_id]):
+                    if milestone == 100:
+                        title = f"🎉 Goal Achieved: {goal.name}"
+                        message = f"Congratulations! You've reached your savings goal of ${goal.target_amount}!"
+                        goal.status = 'completed'
+                        goal.completed_at = timezone.now()
+                        completed.append(goal)
+                    else:
+                        title = f"🎯 Milestone Reached: {milestone}% of {goal.name}"
+                        message = f"Great progress! You've saved ${goal.current_amount} towards your ${goal.target_amount} goal."
+
+                    events.append(NotificationEvent(
+                        user=goal.user,
+                        title=title,
+                        message=message,
+                        notification_type='goal_milestone',
+                        priority='medium'
+                    ))
+    return completed, events
+
+
+def unusual_spending(today, q=Q()):
+    """Return ``(users checked, NotificationEvents)`` for users spending 50% above their usual rate"""
+    from ..models import NotificationEvent, Transaction
+
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    # Spending before and during the last week, per user, in one query
+    spending = list(Transaction.objects.filter(
+        q, trans_type='expense', date__gte=month_ago
+    ).values('user').annotate(
+        monthly=Sum('amount', filter=Q(date__lt=week_ago)),
+        weekly=Sum('amount', filter=Q(date__gte=week_ago)),
+    ).order_by())
+    # Users already alerted, or with an alert queued, this week
+    since = timezone.make_aware(datetime.combine(week_ago, datetime.min.time()))
+    alerted = {user_id for user_id, _ in already_notified(
+        'unusual_spending', {row['user'] for row in spending}, since=since
+    )}
+
+    events = []
+    for row in spending:
+        monthly_expenses = row['monthly'] or Decimal('0')
+        avg_daily_spending = monthly_expenses / 23 if monthly_expenses > 0 else Decimal('0')
+
+        # Calculate this week's daily spending
+        weekly_expenses = row['weekly'] or Decimal('0')
+        days_this_week = (today - week_ago).days or 1
+        weekly_daily_avg = weekly_expenses / days_this_week
+
+        # Alert if spending is 50% higher than usual
+        if avg_daily_spending > 0 and weekly_daily_avg > (avg_daily_spending * Decimal('1.5')):
+            increase_percent = ((weekly_daily_avg - avg_daily_spending) / avg_daily_spending) * 100
+
+            title = "⚠️ Unusual Spending Detected"
+            message = f"Your daily spending this week (${weekly_daily_avg:.2f}) is {increase_percent:.0f}% higher than usual (${avg_daily_spending:.2f})"
+
+            if row['user'] not in alerted:
+                events.append(NotificationEvent(
+                    user_id=row['user'],
+                    title=title,
+                    message=message,
+                    notification_type='unusual_spending',
+                    priority='medium'
+                ))
+    return len(spending), events
@@ -0,0 +1,263 @@
+"""Timing and query-count benchmarks for the heavy views and Celery tasks.
+
+Views are requested through the Django test client as a seeded user and
+tasks are called in-process inside a transaction that is rolled back, so
+repeated runs see the same data. Each target reports p50/p95 latency and
+the number of queries it ran; ``compare`` checks a run against a saved
+baseline.
+"""
+import math
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction as db_transaction
+from django.urls import reverse
+
+from .instrumentation import record_queries
+
+
+# name -> (url name, query string)
+VIEW_TARGETS = {
+    'dashboard': ('dashboard', {}),
+    'dashboard_enhanced': ('dashboard_enhanced', {}),
+    'transactions': ('transactions', {}),
+    'advanced_search_view': ('advanced_search', {'q': 'cafe'}),
+    'calendar_view': ('calendar_view', {}),
+    'ai_insights_view': ('ai_insights', {}),
+}
+
+
+def _import_job_args(user):
+    from ..models import ImportJob
+
+    rows = ['date,amount,type,description,category'] + [
+        f"2024-01-{day % 28 + 1:02d},{day + 0.99},expense,Benchmark row {day},Food & Dining" for day in range(500)
+    ]
+    job = ImportJob(user=user, original_name='benchmark.csv', file_format='csv', skip_duplicates=False)
+    job.file.save('benchmark.csv', ContentFile('\n'.join(rows).encode()), save=False)
+    job.file_size = job.file.size
+    job.save()
+    return [job.pk], lambda: job.file.delete(save=False)
+
+
+def _report_job_args(user):
+    from ..models import ReportJob
+    from .reports import report_period
+
+    # A fresh version token so the job renders instead of finding a stored PDF
+    reset_caches(user)
+    start_date, end_date = report_period()
+    job = ReportJob.objects.create(user=user, start_date=start_date, end_date=end_date)
+
+    def cleanup():
+        _delete_reports([user.pk])
+        job.delete()
+    return [job.pk], cleanup
+
+
+def _monthly_reports_args(user):
+    from django.contrib.auth.models import User
+
+    # Run as on the 1st so the task does its real work, statements included
+    user_ids = list(User.objects.filter(userpreferences__monthly_reports=True).values_list('pk', flat=True))
+    return [date.today().replace(day=1).isoformat()], lambda: _delete_reports(user_ids)
+
+
+def _mail_outbox_args(user):
+    from ..models import OutgoingEmail
+
+    emails = OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(user=user, to_email=user.email or 'benchmark@example.com', subject='Benchmark',
+                      body=f'Benchmark message {i}', html_body=f'<p>Benchmark message {i}</p>')
+        for i in range(20)
+    ])
+    return [], lambda: OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).delete()
+
+
+def _digest_args(user):
+    from ..models import NotificationEvent, UserPreferences
+
+    preferences, _ = UserPreferences.objects.get_or_create(user=user)
+    mode = preferences.digest_mode
+    UserPreferences.objects.filter(pk=preferences.pk).update(digest_mode='hourly')
+    events = NotificationEvent.objects.bulk_create([
+        NotificationEvent(user=user, notification_type='budget_alert', title=f'Budget Alert: Benchmark {i}',
+                          message='Benchmark', send_email=True)
+        for i in range(10)
+    ])
+
+    def cleanup():
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+        UserPreferences.objects.filter(pk=preferences.pk).update(digest_mode=mode)
+    return ['hourly'], cleanup
+
+
+def _purge_notifications_args(user):
+    from ..models import Notification
+
+    # Old enough to be past any retention setting
+    created = Notification.objects.bulk_create([
+        Notification(user=user, title=f'Benchmark {i}', message='Benchmark', notification_type='budget_alert',
+                     is_read=True)
+        for i in range(50)
+    ])
+    ids = [notification.pk for notification in created]
+    Notification.objects.filter(pk__in=ids).update(created_at=date(2000, 1, 1))
+    return [], lambda: Notification.objects.filter(pk__in=ids).delete()
+
+
+def _change_events_args(user):
+    from ..models import Budget, ChangeEvent, SavingsGoal
+
+    # What a burst of writes leaves behind: spending on every budget, and every goal topped up
+    period = date.today().replace(day=1)
+    events = [ChangeEvent(user=user, kind='spending', category_id=category_id, period=period)
+              for category_id in Budget.objects.filter(user=user).values_list('category_id', flat=True)]
+    events += [ChangeEvent(user=user, kind='goal', goal_id=goal_id)
+               for goal_id in SavingsGoal.objects.filter(user=user).values_list('pk', flat=True)]
+    created = ChangeEvent.objects.bulk_create(events)
+    return [], lambda: ChangeEvent.objects.filter(pk__in=[event.pk for event in created]).delete()
+
+
+def _delete_reports(user_ids):
+    """Remove the PDFs a target stored for these users"""
+    from django.core.files.storage import default_storage
+
+    for user_id in user_ids:
+        directory = f"reports/{user_id}"
+        if default_storage.exists(directory):
+            for name in default_storage.listdir(directory)[1]:
+                default_storage.delete(f"{directory}/{name}")
+
+
+def _no_cleanup():
+    return None
+
+
+# name -> callable(user) returning (args, cleanup)
+TASK_TARGETS = {
+    'calculate_financial_health_scores': lambda user: ([], _no_cleanup),
+    'check_budget_alerts': lambda user: ([], _no_cleanup),
+    'send_budget_alert_email': lambda user: ([user.pk, 'Budget Alert', 'Benchmark'], _no_cleanup),
+    'check_bill_reminders': lambda user: ([], _no_cleanup),
+    'send_bill_reminder_email': lambda user: ([user.pk, 'Bill Reminder', 'Benchmark'], _no_cleanup),
+    'generate_monthly_reports': _monthly_reports_args,
+    'send_monthly_report_email': lambda user: ([user.pk, 'Monthly Report', 'Benchmark', 1000, 800, 200, 70], _no_cleanup),
+    'drain_mail_outbox': _mail_outbox_args,
+    'send_notification_digests': _digest_args,
+    'purge_old_notifications': _purge_notifications_args,
+    'process_change_events': _change_events_args,
+    'check_savings_goal_milestones': lambda user: ([], _no_cleanup),
+    'detect_unusual_spending': lambda user: ([], _no_cleanup),
+    'process_import_job': _import_job_args,
+    'process_report_job': _report_job_args,
+}
+
+
+@contextmanager
+def celery_eager():
+    """Run Celery calls made by tasks inline; without Celery installed they already run in process"""
+    try:
+        from expense_tracker.celery import app
+    except ImportError:
+        yield
+        return
+    eager = app.conf.task_always_eager
+    app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        app.conf.task_always_eager = eager
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(kind, timings, query_counts, status=None):
+    result = {
+        'kind': kind,
+        'iterations': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2) if timings else 0.0,
+        'max_ms': round(max(timings, default=0) * 1000, 2),
+        'queries': max(query_counts, default=0),
+    }
+    if status is not None:
+        result['status'] = status
+    return result
+
+
+def reset_caches(user):
+    """Drop the user's cached dashboard and rendered reports"""
+    from ..models import DataVersion
+
+    cache.delete(f'dashboard_data_{user.id}_{date.today()}')
+    DataVersion.bump(user.id)
+
+
+def run_view(client, user, name, iterations, warmup=1, warm_cache=False):
+    url_name, params = VIEW_TARGETS[name]
+    url = reverse(url_name)
+    timings, query_counts = [], []
+    status = None
+    for i in range(warmup + iterations):
+        if not warm_cache:
+            reset_caches(user)
+        with record_queries() as recorder:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            elapsed = time.perf_counter() - start
+        status = response.status_code
+        if i >= warmup:
+            timings.append(elapsed)
+            query_counts.append(recorder.count)
+    return summarize('view', timings, query_counts, status)
+
+
+def run_task(user, name, iterations, warmup=1):
+    from .. import tasks
+
+    task = getattr(tasks, name)
+    timings, query_counts = [], []
+    for i in range(warmup + iterations):
+        args, cleanup = TASK_TARGETS[name](user)
+        try:
+            with db_transaction.atomic():
+                with record_queries() as recorder:
+                    start = time.perf_counter()
+                    task(*args)
+                    elapsed = time.perf_counter() - start
+                # Undo whatever the task wrote so every iteration sees the same data
+                db_transaction.set_rollback(True)
+        finally:
+            cleanup()
+        if i >= warmup:
+            timings.append(elapsed)
+            query_counts.append(recorder.count)
+    return summarize('task', timings, query_counts)
+
+
+def compare(results, baseline, threshold=0.25, min_delta_ms=5.0, query_slack=0):
+    """Return regression messages for results that are slower or chattier than the baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        allowed_ms = max(base['p95_ms'] * (1 + threshold), base['p95_ms'] + min_delta_ms)
+        if result['p95_ms'] > allowed_ms:
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if result['queries'] > base['queries'] + query_slack:
+            regressions.append(f"{name}: {result['queries']} queries vs baseline {base['queries']}")
+    return regressions
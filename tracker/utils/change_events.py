@@ -0,0 +1,181 @@
+"""Change events: alerts as soon as a write crosses a threshold.
+
+Every expense, budget and savings goal write appends a ChangeEvent in the
+same database transaction: saves through the receivers in tracker.signals,
+bulk paths (imports, bulk recategorizing) through ``record_transactions``
+and ``record_recategorized``. Once the write commits, a consumer run is
+scheduled CHANGE_EVENTS_DELAY seconds later so a burst of writes is handled
+by one run. ``process_events`` drains the table in batches and evaluates
+only the affected keys: the budgets on each (user, category, month), the
+goals written to, and the unusual-spending check for the users who spent.
+
+The scheduled sweeps still run daily to catch anything missed, and for
+rules that change with time rather than with writes.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .alerts import active_budgets, budget_alerts, goal_milestones, unusual_spending
+from .notifications import notify
+
+
+logger = logging.getLogger(__name__)
+
+_schedule_lock = threading.Lock()
+_scheduled_at = float('-inf')
+
+
+def month_start(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1) if value else None
+
+
+def spending_event(txn):
+    """The ChangeEvent for a saved transaction, or None when it cannot affect an alert"""
+    from ..models import ChangeEvent
+
+    if txn.trans_type != 'expense' or not txn.category_id:
+        return None
+    return ChangeEvent(user_id=txn.user_id, kind='spending', category_id=txn.category_id,
+                       period=month_start(txn.date))
+
+
+def record(events):
+    """Save unsaved ChangeEvents in one insert and schedule the consumer"""
+    from ..models import ChangeEvent
+
+    events = [event for event in events if event is not None]
+    if not events:
+        return []
+    created = ChangeEvent.objects.bulk_create(events)
+    schedule_processing()
+    return created
+
+
+def record_transactions(transactions):
+    """Events for bulk-created transactions, one per (user, category, month)"""
+    events = {}
+    for txn in transactions:
+        event = spending_event(txn)
+        if event is not None:
+            events.setdefault((event.user_id, event.category_id, event.period), event)
+    return record(events.values())
+
+
+def record_recategorized(transactions, category):
+    """Events for a queryset of expenses about to be moved to ``category`` with ``update``"""
+    from ..models import ChangeEvent
+
+    keys = (transactions.filter(trans_type='expense').annotate(period=TruncMonth('date'))
+            .values_list('user_id', 'period').distinct().order_by())
+    return record(
+        ChangeEvent(user_id=user_id, kind='spending', category=category, period=month_start(period))
+        for user_id, period in keys
+    )
+
+
+def schedule_processing():
+    """Run the consumer shortly after the current transaction commits, once per CHANGE_EVENTS_DELAY"""
+    def send():
+        global _scheduled_at
+        delay = settings.CHANGE_EVENTS_DELAY
+        with _schedule_lock:
+            now = time.monotonic()
+            # A run is already due within the window and will see these events too
+            if now - _scheduled_at < delay:
+                return
+            _scheduled_at = now
+        try:
+            from .locks import requeue
+            requeue('process_change_events', (), {}, delay)
+        except Exception:
+            # The periodic run picks the events up
+            logger.warning("Could not schedule change event processing", exc_info=True)
+
+    transaction.on_commit(send)
+
+
+def month_end(period):
+    return (period + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def budget_touched(budget, periods):
+    """Whether any written month overlaps the budget's dates"""
+    return any(
+        period is None
+        or ((budget.start_date is None or budget.start_date <= month_end(period))
+            and (budget.end_date is None or budget.end_date >= period))
+        for period in periods
+    )
+
+
+def process_batch(batch_size, today):
+    """Evaluate one batch of events and delete it; return ``(events, alerts created)``"""
+    from ..models import BudgetAlert, ChangeEvent, DataVersion, SavingsGoal
+
+    with transaction.atomic():
+        events = list(ChangeEvent.objects.order_by('pk')[:batch_size])
+        if not events:
+            return 0, 0
+
+        budget_keys, goal_ids, spenders = defaultdict(set), set(), set()
+        for event in events:
+            if event.kind == 'goal':
+                goal_ids.add(event.goal_id)
+            else:
+                budget_keys[event.user_id, event.category_id].add(event.period)
+            if event.kind == 'spending':
+                spenders.add(event.user_id)
+
+        created = 0
+        if budget_keys:
+            q = Q()
+            for user_id, category_id in budget_keys:
+                q |= Q(user_id=user_id, category_id=category_id)
+            budgets = [budget for budget in active_budgets(today, q)
+                       if budget_touched(budget, budget_keys[budget.user_id, budget.category_id])]
+            alerts, alert_events = budget_alerts(budgets)
+            BudgetAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+            notify(alert_events)
+            created += len(alert_events)
+        if goal_ids:
+            goals = list(SavingsGoal.objects.filter(pk__in=goal_ids, status='active').select_related('user'))
+            completed, goal_events = goal_milestones(goals)
+            SavingsGoal.objects.bulk_update(completed, ['status', 'completed_at'])
+            DataVersion.bump(*(goal.user_id for goal in completed))
+            notify(goal_events)
+            created += len(goal_events)
+        if spenders:
+            _, spending_events = unusual_spending(today, Q(user_id__in=spenders))
+            notify(spending_events)
+            created += len(spending_events)
+
+        ChangeEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events), created
+
+
+def process_events(batch_size=None, max_batches=None, today=None):
+    """Drain the change events in batches; return ``(events processed, alerts created)``"""
+    batch_size = batch_size or settings.CHANGE_EVENTS_BATCH_SIZE
+    today = today or timezone.now().date()
+    processed = created = batches = 0
+    while max_batches is None or batches < max_batches:
+        count, alerts = process_batch(batch_size, today)
+        processed += count
+        created += alerts
+        batches += 1
+        if count < batch_size:
+            break
+    return processed, created
@@ -0,0 +1,76 @@
+"""Duplicate detection for transactions.
+
+Exact duplicates share a fingerprint built from the normalized date, amount
+and description, which is stored on the transaction and indexed per user.
+Near-duplicates (same amount, dates a couple of days apart, similar
+description) are found with a sorted sliding window over a user's history.
+"""
+import hashlib
+import re
+from collections import deque
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+
+NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_description(description):
+    """Lowercase a description and collapse punctuation and whitespace"""
+    return ' '.join(NON_WORD.sub(' ', (description or '').casefold()).split())
+
+
+def transaction_fingerprint(trans_date, amount, description):
+    """Return the fingerprint used to spot exact duplicate transactions"""
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    date_part = trans_date.isoformat() if hasattr(trans_date, 'isoformat') else str(trans_date)
+    key = f"{date_part}|{amount}|{normalize_description(description)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def description_similarity(a, b):
+    """Similarity ratio (0-1) between two normalized descriptions"""
+    if a == b:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < 0.5:
+        return 0.0
+    return matcher.ratio()
+
+
+def find_near_duplicates(user, days=2, min_similarity=0.8, limit=200):
+    """Find pairs of likely duplicate transactions in a user's history.
+
+    Transactions are sorted by (amount, date), so candidates for each row
+    are the preceding rows with the same amount inside the date window.
+    The sort dominates, giving O(n log n) for typical histories.
+
+    Returns a list of ``(first_id, second_id, similarity)`` tuples.
+    """
+    from ..models import Transaction
+
+    rows = Transaction.objects.filter(user=user).order_by('amount', 'date', 'pk').values_list(
+        'pk', 'amount', 'date', 'description', 'trans_type'
+    ).iterator(chunk_size=2000)
+
+    pairs = []
+    window = deque()
+    current_amount = None
+    for pk, amount, trans_date, description, trans_type in rows:
+        if amount != current_amount:
+            window.clear()
+            current_amount = amount
+        while window and (trans_date - window[0][1]).days > days:
+            window.popleft()
+
+        normalized = normalize_description(description)
+        for other_pk, _, other_description, other_type in window:
+            if other_type != trans_type:
+                continue
+            similarity = description_similarity(normalized, other_description)
+            if similarity >= min_similarity:
+                pairs.append((other_pk, pk, round(similarity, 2)))
+                if len(pairs) >= limit:
+                    return pairs
+        window.append((pk, trans_date, normalized, trans_type))
+    return pairs
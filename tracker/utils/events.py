@@ -0,0 +1,197 @@
+"""Live per-user events for open pages.
+
+``publish`` sends a small event to one user's open pages once the current
+transaction commits: 'notifications' when notifications are created or
+read, 'data_version' when the user's financial data changes. Pages receive
+them over server-sent events from /events/stream/ when the app runs under
+ASGI, or by long polling /events/poll/ under WSGI, and refresh only the
+parts the event is about.
+
+The broker is set with EVENTS_BROKER. LocalBroker keeps events in process
+memory, which suits tests, runserver and single-process deployments.
+CacheBroker keeps them in the EVENTS_CACHE_ALIAS cache, so with Redis or
+Memcached every web and Celery process publishes to the same place.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keepalive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class EventBroker:
+    """Per-user event log with increasing ids; subclasses store the events"""
+
+    def __init__(self, history=None):
+        self.history = history or settings.EVENTS_HISTORY
+
+    def publish(self, user_id, event, data):
+        raise NotImplementedError
+
+    def last_id(self, user_id):
+        raise NotImplementedError
+
+    def events_since(self, user_id, last_id):
+        """Return ``[(id, event, data)]`` published after ``last_id``"""
+        raise NotImplementedError
+
+    def wait(self, user_id, last_id, timeout):
+        """Block until there are events after ``last_id`` or ``timeout`` passes"""
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events_since(user_id, last_id)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events
+            time.sleep(min(settings.EVENTS_POLL_INTERVAL, remaining))
+
+    async def aevents_since(self, user_id, last_id):
+        return await sync_to_async(self.events_since, thread_sensitive=False)(user_id, last_id)
+
+    async def await_events(self, user_id, last_id, timeout):
+        """``wait`` for async views, sleeping on the event loop between checks"""
+        deadline = time.monotonic() + timeout
+        while True:
+            events = await self.aevents_since(user_id, last_id)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events
+            await asyncio.sleep(min(settings.EVENTS_POLL_INTERVAL, remaining))
+
+
+class LocalBroker(EventBroker):
+    """Events in this process's memory; waiting threads are woken on publish"""
+
+    def __init__(self, history=None):
+        super().__init__(history)
+        self.condition = threading.Condition()
+        self.events = defaultdict(lambda: deque(maxlen=self.history))
+        self.sequence = defaultdict(int)
+
+    def publish(self, user_id, event, data):
+        with self.condition:
+            self.sequence[user_id] += 1
+            event_id = self.sequence[user_id]
+            self.events[user_id].append((event_id, event, data))
+            self.condition.notify_all()
+        return event_id
+
+    def last_id(self, user_id):
+        with self.condition:
+            return self.sequence.get(user_id, 0)
+
+    def events_since(self, user_id, last_id):
+        with self.condition:
+            return [entry for entry in self.events.get(user_id, ()) if entry[0] > last_id]
+
+    def wait(self, user_id, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                events = self.events_since(user_id, last_id)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self.condition.wait(remaining)
+
+    async def aevents_since(self, user_id, last_id):
+        # A memory read; no need for a worker thread
+        return self.events_since(user_id, last_id)
+
+
+class CacheBroker(EventBroker):
+    """Events in a shared Django cache, one key per event plus a per-user counter"""
+
+    def __init__(self, history=None):
+        from django.core.cache import caches
+
+        super().__init__(history)
+        self.cache = caches[settings.EVENTS_CACHE_ALIAS]
+
+    def publish(self, user_id, event, data):
+        key = f"events:{user_id}:last"
+        self.cache.add(key, 0, None)
+        event_id = self.cache.incr(key)
+        self.cache.set(f"events:{user_id}:{event_id}", (event, data), settings.EVENTS_TTL)
+        return event_id
+
+    def last_id(self, user_id):
+        return self.cache.get(f"events:{user_id}:last", 0)
+
+    def events_since(self, user_id, last_id):
+        newest = self.last_id(user_id)
+        if newest <= last_id:
+            return []
+        ids = range(max(last_id + 1, newest - self.history + 1), newest + 1)
+        found = self.cache.get_many([f"events:{user_id}:{event_id}" for event_id in ids])
+        return [
+            (event_id, *found[f"events:{user_id}:{event_id}"])
+            for event_id in ids if f"events:{user_id}:{event_id}" in found
+        ]
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def publish(user_id, event, **data):
+    """Send ``event`` to the user's open pages after the current transaction commits"""
+    from django.db import transaction
+
+    def send():
+        try:
+            get_broker().publish(user_id, event, data)
+        except Exception:
+            # Live updates are best effort; pages still show fresh data on reload
+            logger.warning("Could not publish %s event for user %s", event, user_id, exc_info=True)
+
+    transaction.on_commit(send)
+
+
+def event_payload(entry):
+    event_id, event, data = entry
+    return {'id': event_id, 'event': event, 'data': data}
+
+
+def sse_frame(entry):
+    event_id, event, data = entry
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_stream(user_id, last_id):
+    """Server-sent event frames for one user until EVENTS_STREAM_MAX_SECONDS.
+
+    The browser reconnects after the stream ends and sends the last id it
+    saw as Last-Event-ID, so nothing published in between is lost.
+    """
+    broker = get_broker()
+    deadline = time.monotonic() + settings.EVENTS_STREAM_MAX_SECONDS
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        events = await broker.await_events(
+            user_id, last_id, min(HEARTBEAT_SECONDS, max(0, deadline - time.monotonic()))
+        )
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for entry in events:
+            yield sse_frame(entry)
+        last_id = events[-1][0]
@@ -0,0 +1,421 @@
+"""Staged transaction import pipeline.
+
+Rows are streamed from the uploaded file (CSV, OFX/QFX or QIF), validated a batch at a time,
+resolved against cached category/account lookups and written with
+``bulk_create``. Account balances are updated once per batch from the
+aggregated deltas instead of once per transaction.
+"""
+import csv
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from io import TextIOWrapper
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import change_events
+from .dedup import transaction_fingerprint
+from .metrics import record_rows
+from .statements import read_ofx_rows, read_qif_rows
+
+
+# Logical field -> CSV header. Uploads can override any of these.
+DEFAULT_COLUMN_MAPPING = {
+    'date': 'date',
+    'amount': 'amount',
+    'description': 'description',
+    'type': 'type',
+    'category': 'category',
+    'account': 'account',
+    'tags': 'tags',
+}
+
+TRANS_TYPE_ALIASES = {
+    'expense': 'expense',
+    'debit': 'expense',
+    'withdrawal': 'expense',
+    'income': 'income',
+    'credit': 'income',
+    'deposit': 'income',
+    'transfer': 'transfer',
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%d.%m.%Y')
+
+AMOUNT_CLEANUP = re.compile(r'[^\d.\-]')
+
+
+def read_csv_rows(fileobj, column_mapping=None, encoding='utf-8-sig'):
+    """Stream (line_number, record) pairs from a binary CSV file object.
+
+    ``column_mapping`` maps logical fields to the header names used in the
+    file; blank entries fall back to ``DEFAULT_COLUMN_MAPPING``.
+    """
+    mapping = dict(DEFAULT_COLUMN_MAPPING)
+    mapping.update({field: column for field, column in (column_mapping or {}).items() if column})
+
+    text = TextIOWrapper(fileobj, encoding=encoding, errors='replace', newline='')
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {
+                field: (row.get(column) or '').strip() for field, column in mapping.items()
+            }
+    finally:
+        # Don't let the wrapper close the underlying upload
+        text.detach()
+
+
+STATEMENT_EXTENSIONS = {'.ofx': 'ofx', '.qfx': 'ofx', '.qif': 'qif', '.csv': 'csv'}
+
+
+def detect_file_format(filename, requested='auto'):
+    """Pick csv/ofx/qif from the requested format or the file extension"""
+    if requested and requested != 'auto':
+        return requested
+    name = (filename or '').lower()
+    for extension, file_format in STATEMENT_EXTENSIONS.items():
+        if name.endswith(extension):
+            return file_format
+    return 'csv'
+
+
+def read_rows(fileobj, file_format='csv', column_mapping=None):
+    """Stream (position, record) pairs from a file in any supported format"""
+    if file_format == 'ofx':
+        return read_ofx_rows(fileobj)
+    if file_format == 'qif':
+        return read_qif_rows(fileobj)
+    return read_csv_rows(fileobj, column_mapping)
+
+
+def parse_amount(value):
+    """Parse an amount such as '$1,234.50' or '(12.00)' into a Decimal"""
+    value = (value or '').strip()
+    negative = value.startswith('(') and value.endswith(')')
+    if not value:
+        raise ValueError('Missing amount')
+    cleaned = AMOUNT_CLEANUP.sub('', value)
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount "{value}"')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount "{value}"')
+    if negative:
+        amount = -amount
+    return amount.quantize(Decimal('0.01'))
+
+
+def parse_date(value, default=None):
+    """Parse a date string using the formats commonly found in bank exports"""
+    value = (value or '').strip()
+    if not value:
+        return default or timezone.now().date()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognised date "{value}"')
+
+
+def validate_records(rows):
+    """Validate a batch of (line, record) pairs.
+
+    Returns ``(valid, errors)`` where ``valid`` holds normalized records and
+    ``errors`` holds ``{'line': ..., 'error': ...}`` dicts for rejected rows.
+    """
+    valid = []
+    errors = []
+    today = timezone.now().date()
+    for line, record in rows:
+        try:
+            amount = parse_amount(record.get('amount'))
+            trans_date = record['date'] if isinstance(record.get('date'), date) else parse_date(record.get('date'), today)
+            raw_type = (record.get('type') or '').strip().lower()
+            if raw_type:
+                trans_type = TRANS_TYPE_ALIASES.get(raw_type)
+                if trans_type is None:
+                    raise ValueError(f'Unknown transaction type "{record.get("type")}"')
+            else:
+                trans_type = 'expense'
+        except ValueError as e:
+            errors.append({'line': line, 'error': str(e)})
+            continue
+
+        valid.append({
+            'line': line,
+            'amount': abs(amount),
+            'date': trans_date,
+            'trans_type': trans_type,
+            'description': record.get('description') or '',
+            'category': (record.get('category') or '').strip(),
+            'account': (record.get('account') or '').strip(),
+            'tags': (record.get('tags') or '')[:200],
+            'account_ref': (record.get('account_ref') or '').strip()[:64],
+            'account_type': record.get('account_type') or 'bank',
+            'fitid': (record.get('fitid') or '').strip()[:255],
+        })
+    return valid, errors
+
+
+class TransactionImporter:
+    """Import normalized records for one user in batches"""
+
+    def __init__(self, user, batch_size=None, progress=None, skip_duplicates=True):
+        self.user = user
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.skip_duplicates = skip_duplicates
+        self.error_limit = settings.IMPORT_ERROR_REPORT_LIMIT
+        self.category_ids = {}
+        self.account_ids = None
+        self.account_refs = {}
+        self.seen_fitids = set()  # (account id, FITID) pairs already imported from this file
+        self.processed = 0
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.duplicate_count = 0
+
+    def run(self, rows):
+        """Consume an iterable of (line, record) pairs"""
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.process_batch(batch)
+            if self.progress:
+                self.progress(self)
+        return self
+
+    def add_errors(self, errors):
+        self.error_count += len(errors)
+        room = self.error_limit - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    def process_batch(self, rows):
+        from ..models import Transaction, Account, DataVersion
+
+        self.processed += len(rows)
+        valid, errors = validate_records(rows)
+
+        self.resolve_categories({r['category'] for r in valid if r['category']})
+        if any(r['account'] for r in valid):
+            self.load_accounts()
+        self.resolve_account_refs({r['account_ref']: r['account_type'] for r in valid if r['account_ref']})
+        if self.skip_duplicates and any(r['fitid'] for r in valid):
+            valid = self.drop_known_fitids(valid, errors)
+
+        objs = []
+        for record in valid:
+            account_id = self.record_account_id(record)
+            if account_id is None and record['account'] and not record['account_ref']:
+                errors.append({'line': record['line'], 'error': f'Unknown account "{record["account"]}"'})
+                continue
+            obj = Transaction(
+                user=self.user,
+                amount=record['amount'],
+                date=record['date'],
+                trans_type=record['trans_type'],
+                description=record['description'],
+                tags=record['tags'],
+                category_id=self.category_ids.get(record['category']) if record['category'] else None,
+                account_id=account_id,
+                fingerprint=transaction_fingerprint(record['date'], record['amount'], record['description']),
+                external_id=record['fitid'],
+            )
+            obj._import_line = record['line']
+            objs.append(obj)
+
+        if objs and self.skip_duplicates:
+            objs = self.drop_duplicates(objs, errors)
+
+        if objs:
+            deltas = {}
+            for obj in objs:
+                for account_id, delta in obj.balance_deltas().items():
+                    deltas[account_id] = deltas.get(account_id, 0) + delta
+            with db_transaction.atomic():
+                Transaction.objects.bulk_create(objs)
+                Account.apply_balance_deltas(deltas)
+                DataVersion.bump(self.user.pk)
+                change_events.record_transactions(objs)
+            self.imported += len(objs)
+
+        self.add_errors(sorted(errors, key=lambda e: e['line']))
+
+    def drop_duplicates(self, objs, errors):
+        """Drop rows whose fingerprint already exists for this user.
+
+        Existing rows are counted per fingerprint in one query, so a file that
+        legitimately contains the same purchase twice only loses as many rows
+        as are already stored.
+        """
+        from ..models import Transaction
+
+        existing = dict(
+            Transaction.objects.filter(user=self.user, fingerprint__in={o.fingerprint for o in objs})
+            .values('fingerprint').annotate(n=Count('id')).values_list('fingerprint', 'n')
+        )
+        kept = []
+        for obj in objs:
+            if existing.get(obj.fingerprint, 0) > 0:
+                existing[obj.fingerprint] -= 1
+                self.duplicate_count += 1
+                errors.append({'line': obj._import_line, 'error': 'Duplicate of an existing transaction'})
+            else:
+                kept.append(obj)
+        return kept
+
+    def record_account_id(self, record):
+        """The account a validated record goes into, or None when it has none (or an unknown one)"""
+        if record['account_ref']:
+            return self.account_refs[record['account_ref']]
+        if record['account']:
+            return self.account_ids.get(record['account'].lower())
+        return None
+
+    def drop_known_fitids(self, records, errors):
+        """Drop statement rows whose bank transaction id (FITID) was already imported into their account.
+
+        A FITID is only unique within one bank account, so the same id in
+        another account is a different transaction.
+        """
+        from ..models import Transaction
+
+        fitids = {r['fitid'] for r in records if r['fitid']}
+        known = set(
+            Transaction.objects.filter(user=self.user, external_id__in=fitids)
+            .values_list('account_id', 'external_id')
+        )
+        kept = []
+        for record in records:
+            key = (self.record_account_id(record), record['fitid'])
+            if record['fitid'] and (key in known or key in self.seen_fitids):
+                self.duplicate_count += 1
+                errors.append({'line': record['line'], 'error': f"Transaction {record['fitid']} was already imported"})
+                continue
+            if record['fitid']:
+                self.seen_fitids.add(key)
+            kept.append(record)
+        return kept
+
+    def resolve_account_refs(self, refs):
+        """Map statement account ids to the user's accounts, creating missing ones.
+
+        Accounts are matched on ``external_id`` first and then on name, so a
+        QIF account called "Checking" lands in the existing "Checking" account.
+        """
+        from ..models import Account
+
+        missing = {ref: kind for ref, kind in refs.items() if ref not in self.account_refs}
+        if not missing:
+            return
+        by_name = {}
+        accounts = Account.objects.filter(user=self.user).filter(
+            Q(external_id__in=missing) | Q(name__in=missing)
+        ).order_by('pk').values_list('pk', 'name', 'external_id')
+        for pk, name, external_id in accounts:
+            if external_id in missing:
+                self.account_refs.setdefault(external_id, pk)
+            by_name.setdefault(name, pk)
+        for ref in missing:
+            if ref not in self.account_refs and ref in by_name:
+                self.account_refs[ref] = by_name[ref]
+
+        to_create = [ref for ref in missing if ref not in self.account_refs]
+        if to_create:
+            Account.objects.bulk_create([
+                Account(
+                    user=self.user,
+                    name=self.account_display_name(ref),
+                    account_type=missing[ref] if missing[ref] in dict(Account.ACCOUNT_TYPES) else 'bank',
+                    external_id=ref,
+                )
+                for ref in to_create
+            ])
+            created = Account.objects.filter(user=self.user, external_id__in=to_create).values_list('external_id', 'pk')
+            self.account_refs.update(created)
+
+    @staticmethod
+    def account_display_name(ref):
+        # Bank account numbers are masked; QIF account names are kept as-is
+        if ref.isdigit() and len(ref) > 4:
+            return f"Account ...{ref[-4:]}"
+        return ref[:100]
+
+    def resolve_categories(self, names):
+        """Fill the name -> id cache for ``names``, creating missing categories"""
+        from ..models import Category
+
+        missing = names - self.category_ids.keys()
+        if not missing:
+            return
+        for pk, name in Category.objects.filter(name__in=missing).order_by('pk').values_list('pk', 'name'):
+            self.category_ids.setdefault(name, pk)
+        to_create = missing - self.category_ids.keys()
+        if to_create:
+            Category.objects.bulk_create([Category(name=name[:100]) for name in sorted(to_create)])
+            for pk, name in Category.objects.filter(name__in=to_create).order_by('pk').values_list('pk', 'name'):
+                self.category_ids.setdefault(name, pk)
+
+    def load_accounts(self):
+        from ..models import Account
+
+        if self.account_ids is None:
+            self.account_ids = {}
+            for pk, name in Account.objects.filter(user=self.user).order_by('pk').values_list('pk', 'name'):
+                self.account_ids.setdefault(name.lower(), pk)
+
+
+def run_import_job(job_id):
+    """Run a queued ImportJob to completion, recording progress as it goes"""
+    from ..models import ImportJob
+
+    job = ImportJob.objects.select_related('user').get(pk=job_id)
+    if job.status not in ('pending', 'running'):
+        return f"Import job {job_id} already {job.status}"
+
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        with job.file.open('rb') as f:
+            def progress(importer):
+                ImportJob.objects.filter(pk=job.pk).update(
+                    bytes_processed=f.tell(),
+                    processed_rows=importer.processed,
+                    imported_rows=importer.imported,
+                    error_count=importer.error_count,
+                    duplicate_count=importer.duplicate_count,
+                )
+
+            importer = TransactionImporter(job.user, progress=progress, skip_duplicates=job.skip_duplicates)
+            importer.run(read_rows(f, job.file_format, job.column_mapping))
+    except Exception as e:
+        job.status = 'failed'
+        job.message = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'finished_at'])
+        raise
+
+    job.status = 'completed'
+    job.bytes_processed = job.file_size
+    job.processed_rows = importer.processed
+    job.imported_rows = importer.imported
+    job.error_count = importer.error_count
+    job.duplicate_count = importer.duplicate_count
+    job.errors = importer.errors
+    job.finished_at = timezone.now()
+    job.save()
+    record_rows(importer.processed)
+    return f"Imported {importer.imported} of {importer.processed} rows for job {job_id}"
@@ -0,0 +1,141 @@
+"""Database query instrumentation.
+
+``QueryRecorder`` is installed as a connection execute wrapper and keeps
+per-fingerprint counts and timings, plus the call sites of queries that
+repeat (the usual sign of an N+1 pattern). It backs the query middleware
+and the ``query_budget`` helper used to pin query counts.
+"""
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+# Name of the view or task currently running, for attributing queries
+current_source = ContextVar('current_source', default='')
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+IGNORED_PATHS = ('site-packages', 'dist-packages', str(Path(__file__).resolve()))
+
+
+def fingerprint_sql(sql):
+    """Normalize SQL so queries differing only in literals share a fingerprint"""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def find_call_site(ignore=()):
+    """Return 'path:line in function' for the innermost project frame on the stack"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = frame.filename
+        if filename.startswith(PROJECT_ROOT) and not any(p in filename for p in IGNORED_PATHS + tuple(ignore)):
+            return f"{Path(filename).relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+class QueryStats:
+    __slots__ = ('fingerprint', 'sql', 'count', 'total_time', 'call_sites')
+
+    def __init__(self, fingerprint, sql):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.count = 0
+        self.total_time = 0.0
+        self.call_sites = Counter()
+
+
+class QueryRecorder:
+    """Execute wrapper that aggregates queries by fingerprint"""
+
+    def __init__(self):
+        self.queries = {}
+        self.count = 0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql, duration):
+        fingerprint = fingerprint_sql(sql)
+        stats = self.queries.get(fingerprint)
+        if stats is None:
+            stats = self.queries[fingerprint] = QueryStats(fingerprint, sql)
+        stats.count += 1
+        stats.total_time += duration
+        # Walking the stack is expensive, so only do it once a query repeats
+        if stats.count > 1:
+            stats.call_sites[find_call_site()] += 1
+        self.count += 1
+        self.total_time += duration
+
+    def duplicates(self, threshold=2):
+        """Fingerprints executed at least ``threshold`` times, most frequent first"""
+        repeated = [s for s in self.queries.values() if s.count >= threshold]
+        return sorted(repeated, key=lambda s: s.count, reverse=True)
+
+    def report(self, duplicate_threshold=2, limit=10):
+        return {
+            'query_count': self.count,
+            'db_time_ms': round(self.total_time * 1000, 2),
+            'duplicates': [
+                {
+                    'count': s.count,
+                    'time_ms': round(s.total_time * 1000, 2),
+                    'sql': s.fingerprint[:500],
+                    'call_sites': dict(s.call_sites.most_common(5)),
+                }
+                for s in self.duplicates(duplicate_threshold)[:limit]
+            ],
+        }
+
+
+@contextmanager
+def record_queries(recorder=None, using=None):
+    """Record queries on one connection alias, or on all of them by default"""
+    recorder = recorder or QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=None, using=None):
+    """Fail with an AssertionError when the wrapped block exceeds its query budget.
+
+    ``max_duplicates`` additionally caps how often any single query
+    fingerprint may repeat, which catches N+1 loops early.
+    """
+    with record_queries(using=using) as recorder:
+        yield recorder
+    problems = []
+    if recorder.count > max_queries:
+        problems.append(f"{recorder.count} queries executed, budget is {max_queries}")
+    if max_duplicates is not None:
+        for stats in recorder.duplicates(max_duplicates + 1):
+            problems.append(f"query repeated {stats.count} times (limit {max_duplicates}): {stats.fingerprint[:200]}")
+    if problems:
+        details = '\n'.join(
+            f"  {s.count}x {s.fingerprint[:200]}\n    at {', '.join(s.call_sites) or 'n/a'}"
+            for s in recorder.duplicates()[:10]
+        )
+        raise AssertionError('; '.join(problems) + (f"\nRepeated queries:\n{details}" if details else ''))
@@ -0,0 +1,92 @@
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared in-process pool used when no Celery broker is configured"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                thread_name_prefix='tracker-jobs',
+            )
+    return _executor
+
+
+def celery_enabled():
+    """Whether background work should be sent to Celery"""
+    return bool(getattr(settings, 'CELERY_BROKER_URL', ''))
+
+
+def dispatch(task_name, func, *args, **kwargs):
+    """Queue a background job.
+
+    The job is sent to Celery as ``task_name`` when a broker is configured,
+    otherwise ``func`` runs on the local thread pool. ``func`` must be the
+    plain function behind the Celery task so both paths do the same work.
+    """
+    if celery_enabled():
+        from expense_tracker.celery import app
+        return app.send_task(task_name, args=args, kwargs=kwargs)
+    from .metrics import instrument_task
+    func = instrument_task(func, name=task_name.rsplit('.', 1)[-1])
+    return get_executor().submit(run_in_thread, func, *args, **kwargs)
+
+
+def run_in_thread(func, *args, **kwargs):
+    """Run a job outside the request cycle and release its DB connections"""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background job %s failed", getattr(func, '__name__', func))
+        raise
+    finally:
+        connections.close_all()
+
+
+class LocalTask:
+    """Stand-in for a Celery task when Celery is not installed.
+
+    Calling it runs the task here; ``delay`` and ``apply_async`` run it on
+    the local thread pool, after ``countdown`` seconds if one is given.
+    """
+
+    def __init__(self, func):
+        functools.update_wrapper(self, func)
+        self.run = func
+        self.name = f"{func.__module__}.{func.__name__}"
+
+    def __call__(self, *args, **kwargs):
+        return self.run(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.apply_async(args, kwargs)
+
+    def apply_async(self, args=None, kwargs=None, countdown=None, **options):
+        args, kwargs = tuple(args or ()), dict(kwargs or {})
+        if not countdown:
+            return get_executor().submit(run_in_thread, self.run, *args, **kwargs)
+        timer = threading.Timer(countdown, get_executor().submit, (run_in_thread, self.run, *args), kwargs)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+def shared_task(func=None, **options):
+    """``celery.shared_task`` for installs without Celery; options are ignored"""
+    if func is None:
+        return LocalTask
+    return LocalTask(func)
@@ -0,0 +1,302 @@
+"""Concurrent load test against a running server.
+
+Each simulated client logs in as a seeded user with its own cookie jar and
+repeatedly picks a journey (dashboard, create transaction, search, export,
+import) from a weighted mix. Samples are collected per journey and turned
+into throughput, latency percentiles and error rates. Balances of the
+users' accounts are snapshotted before the run so ``check_balances`` can
+tell whether concurrent writes lost or doubled any update.
+"""
+import http.cookiejar
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from decimal import Decimal
+
+from .benchmarks import percentile
+
+
+DEFAULT_MIX = 'dashboard=40,create_transaction=25,search=20,export=10,import=5'
+SEARCH_TERMS = ('cafe', 'grocer', 'metro', 'store', 'salary', 'pharmacy', 'hotel')
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def parse_mix(value):
+    """Parse ``name=weight,...`` into {journey: weight}"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in value.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in JOURNEYS:
+            raise LoadTestError(f"Unknown journey '{name}'. Choose from: {', '.join(JOURNEYS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise LoadTestError(f"Invalid weight for '{name}': {weight}")
+    if not mix or sum(mix.values()) <= 0:
+        raise LoadTestError('The journey mix needs at least one journey with a positive weight')
+    return mix
+
+
+class Session:
+    """One simulated user: a cookie jar plus the ids it needs to fill in forms"""
+
+    def __init__(self, base_url, username, account_ids, category_ids, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.account_ids = account_ids
+        self.category_ids = category_ids
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None, files=None):
+        """Send a GET (or a POST when ``data`` is given) and return ``(status, body)``"""
+        url = self.base_url + path
+        headers = {'Referer': url}
+        body = None
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.csrf_token())
+            if files:
+                body, content_type = encode_multipart(data, files)
+            else:
+                body, content_type = urllib.parse.urlencode(data).encode(), 'application/x-www-form-urlencoded'
+            headers['Content-Type'] = content_type
+        req = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self, password):
+        self.request('/accounts/login/')
+        status, body = self.request('/accounts/login/', {'username': self.username, 'password': password})
+        if status != 200 or b'name="password"' in body:
+            raise LoadTestError(f"Could not log in as {self.username} (HTTP {status})")
+
+
+def encode_multipart(data, files):
+    """Encode form fields and ``{name: (filename, bytes)}`` files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in data.items():
+        lines += [f'--{boundary}', f'Content-Disposition: form-data; name="{name}"', '', str(value)]
+    parts = ['\r\n'.join(lines).encode()] if lines else []
+    for name, (filename, content) in files.items():
+        header = (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                  f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        parts.append(header + content)
+    body = b'\r\n'.join(parts) + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def journey_dashboard(session, rng):
+    return session.request('/dashboard/')
+
+
+def journey_create_transaction(session, rng):
+    session.request('/transactions/new/')
+    return session.request('/transactions/new/', {
+        'amount': f"{rng.uniform(1, 120):.2f}",
+        'category': rng.choice(session.category_ids),
+        'account': rng.choice(session.account_ids),
+        'trans_type': rng.choice(('expense', 'expense', 'expense', 'income')),
+        'date': time.strftime('%Y-%m-%d'),
+        'description': f"Load test {rng.choice(SEARCH_TERMS)}",
+    })
+
+
+def journey_search(session, rng):
+    return session.request('/search/advanced/?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)}))
+
+
+def journey_export(session, rng):
+    return session.request('/export-csv/')
+
+
+def journey_import(session, rng):
+    session.request('/import-csv/')
+    today = time.strftime('%Y-%m-%d')
+    rows = ['date,amount,type,description'] + [
+        f"{today},{rng.uniform(1, 80):.2f},expense,Load import {uuid.uuid4().hex[:8]}" for _ in range(20)
+    ]
+    return session.request('/import-csv/', {'file_format': 'csv'},
+                           files={'file': ('loadtest.csv', '\n'.join(rows).encode())})
+
+
+JOURNEYS = {
+    'dashboard': journey_dashboard,
+    'create_transaction': journey_create_transaction,
+    'search': journey_search,
+    'export': journey_export,
+    'import': journey_import,
+}
+
+
+def run_client(session, mix, deadline, max_requests, samples, lock, seed):
+    """Run journeys for one session until the deadline or request limit; append samples"""
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    done = 0
+    while time.monotonic() < deadline and (not max_requests or done < max_requests):
+        name = rng.choices(names, weights=weights)[0]
+        start = time.perf_counter()
+        try:
+            status, _ = JOURNEYS[name](session, rng)
+            error = None if status < 400 else f"HTTP {status}"
+        except Exception as e:  # timeouts and dropped connections count as errors
+            error = type(e).__name__
+        with lock:
+            samples.append((name, time.perf_counter() - start, error))
+        done += 1
+
+
+def run_load(sessions, mix, duration, max_requests=None, ramp_up=0.0):
+    """Drive every session from its own thread; return ``(samples, elapsed seconds)``"""
+    samples, lock = [], threading.Lock()
+    started = time.monotonic()
+    deadline = started + ramp_up + duration
+    threads = []
+    for i, session in enumerate(sessions):
+        thread = threading.Thread(target=run_client, daemon=True,
+                                  args=(session, mix, deadline, max_requests, samples, lock, i))
+        threads.append(thread)
+        thread.start()
+        if ramp_up and len(sessions) > 1:
+            time.sleep(ramp_up / len(sessions))
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - started
+
+
+def summarize_samples(samples, elapsed):
+    """Per-journey and overall throughput, latency percentiles and error rate"""
+    groups = {}
+    for name, seconds, error in samples:
+        groups.setdefault(name, []).append((seconds, error))
+    groups['total'] = [(seconds, error) for _, seconds, error in samples]
+
+    summary = {}
+    for name, rows in groups.items():
+        timings = [seconds for seconds, _ in rows]
+        errors = [error for _, error in rows if error]
+        summary[name] = {
+            'requests': len(rows),
+            'rps': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(timings, 50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 99) * 1000, 2),
+            'max_ms': round(max(timings, default=0) * 1000, 2),
+            'errors': len(errors),
+            'error_rate': round(len(errors) / len(rows), 4) if rows else 0.0,
+            'error_types': sorted(set(errors)),
+        }
+    return summary
+
+
+def balance_snapshot(user_ids):
+    """Return ``(balances, last transaction id)`` for the users' accounts"""
+    from django.db.models import Max
+    from ..models import Account, Transaction
+
+    balances = dict(Account.objects.filter(user__in=user_ids).values_list('pk', 'balance'))
+    last_id = Transaction.objects.aggregate(last=Max('pk'))['last'] or 0
+    return balances, last_id
+
+
+def check_balances(user_ids, snapshot):
+    """Compare balances with the snapshot plus every transaction created since.
+
+    The journeys only create transactions, so each account must have moved
+    by exactly the sum of the new transactions' balance deltas. Returns a
+    list of ``(account_id, expected, actual)`` mismatches.
+    """
+    from ..models import Account, Transaction
+
+    balances, last_id = snapshot
+    expected = dict(balances)
+    for transaction in Transaction.objects.filter(user__in=user_ids, pk__gt=last_id).iterator():
+        for account_id, delta in transaction.balance_deltas().items():
+            expected[account_id] = expected.get(account_id, Decimal('0')) + delta
+    actual = dict(Account.objects.filter(user__in=user_ids).values_list('pk', 'balance'))
+    return [(pk, expected[pk], actual.get(pk)) for pk in sorted(expected) if expected[pk] != actual.get(pk)]
+
+
+def cache_counts():
+    """Cache hits and misses recorded by every server process, as {cache: {'hit': n, 'miss': n}}.
+
+    With a per-process cache such as locmem, each worker warms its own copy,
+    so the hit rate drops as workers are added.
+    """
+    from .metrics import collect
+
+    counts = {}
+    counters, _ = collect()
+    for (name, labels), value in counters.items():
+        if name == 'tracker_cache_requests_total':
+            labels = dict(labels)
+            counts.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] += value
+    return counts
+
+
+def cache_hit_rates(before, after):
+    """Hit rate per cache between two ``cache_counts`` snapshots"""
+    rates = {}
+    for cache_name, counts in after.items():
+        previous = before.get(cache_name, {})
+        hits = counts['hit'] - previous.get('hit', 0)
+        misses = counts['miss'] - previous.get('miss', 0)
+        if hits + misses:
+            rates[cache_name] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 4)}
+    return rates
+
+def start_server(port, workers, threads=1, timeout=30, log_file=None):
+    """Start gunicorn on 127.0.0.1:``port`` with the current environment and wait until it answers"""
+    env = dict(os.environ)
+    hosts = [h for h in env.get('ALLOWED_HOSTS', '').split(',') if h]
+    env['ALLOWED_HOSTS'] = ','.join(hosts + ['127.0.0.1'])
+    command = [
+        sys.executable, '-m', 'gunicorn', 'expense_tracker.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+        '--timeout', str(timeout),
+    ]
+    output = open(log_file, 'ab') if log_file else subprocess.DEVNULL
+    process = subprocess.Popen(command, env=env, stdout=output, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise LoadTestError(f"gunicorn exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(base_url + '/accounts/login/', timeout=2).read()
+            return process, base_url
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    stop_server(process)
+    raise LoadTestError('gunicorn did not start within 30 seconds')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
@@ -0,0 +1,164 @@
+"""Single-instance background tasks.
+
+``single_instance`` wraps a task so only one run of it holds the task's
+lease at a time. The lease is a TaskLock row that expires after
+TASK_LOCK_LEASE_SECONDS; a heartbeat thread extends it while the run is
+alive, so a long run keeps its lock and a crashed worker's lock lapses on
+its own. A run that finds the lock held is skipped, or with
+``on_conflict='queue'`` sent again after TASK_LOCK_RETRY_SECONDS. Every
+run, skipped ones included, is stored as a TaskRun.
+"""
+import functools
+import logging
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .metrics import current_run_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name, owner, lease):
+    """Take the lock if it is free or its lease has expired; return whether we hold it"""
+    from ..models import TaskLock
+
+    now = timezone.now()
+    fields = dict(owner=owner, acquired_at=now, heartbeat_at=now, expires_at=now + timedelta(seconds=lease))
+    # Released locks are deleted, so the insert usually succeeds
+    try:
+        with transaction.atomic():
+            TaskLock.objects.create(name=name, **fields)
+        return True
+    except IntegrityError:
+        return bool(TaskLock.objects.filter(name=name, expires_at__lt=now).update(**fields))
+
+
+def extend(name, owner, lease):
+    """Push the lease out again; False means another run has taken the lock"""
+    from ..models import TaskLock
+
+    now = timezone.now()
+    return bool(TaskLock.objects.filter(name=name, owner=owner).update(
+        heartbeat_at=now, expires_at=now + timedelta(seconds=lease)
+    ))
+
+
+def release(name, owner):
+    from ..models import TaskLock
+
+    TaskLock.objects.filter(name=name, owner=owner).delete()
+
+
+class Heartbeat(threading.Thread):
+    """Extends a lease every third of its length until stopped"""
+
+    def __init__(self, name, owner, lease):
+        super().__init__(name=f"lock-heartbeat-{name}", daemon=True)
+        self.lock_name = name
+        self.owner = owner
+        self.lease = lease
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.lease / 3):
+                try:
+                    if not extend(self.lock_name, self.owner, self.lease):
+                        logger.warning("Lost the lock on %s; another run may start", self.lock_name)
+                        return
+                except Exception:
+                    logger.exception("Could not extend the lock on %s", self.lock_name)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def record_run(task_name, outcome, started_at, start, rows=0, message=''):
+    from ..models import TaskRun
+
+    try:
+        TaskRun.objects.create(
+            task_name=task_name, outcome=outcome, started_at=started_at, finished_at=timezone.now(),
+            duration_ms=(time.perf_counter() - start) * 1000, rows_processed=rows,
+            hostname=socket.gethostname()[:255], message=message[:1000],
+        )
+    except Exception:
+        logger.exception("Could not record a run of %s", task_name)
+
+
+def requeue(task_name, args, kwargs, delay):
+    """Send a run of ``task_name`` after ``delay`` seconds, e.g. one that found its lock held"""
+    from .jobs import celery_enabled
+
+    if celery_enabled():
+        from expense_tracker.celery import app
+        app.send_task(f"tracker.tasks.{task_name}", args=args, kwargs=kwargs, countdown=delay)
+    else:
+        timer = threading.Timer(delay, _run_requeued, (task_name, args, kwargs))
+        timer.daemon = True
+        timer.start()
+
+
+def _run_requeued(task_name, args, kwargs):
+    from .. import tasks
+    from .jobs import dispatch
+
+    dispatch(f"tracker.tasks.{task_name}", getattr(tasks, task_name), *args, **kwargs)
+
+
+def single_instance(lease=None, on_conflict='skip', key=None):
+    """Decorate a task so overlapping runs are skipped (or queued) and every run is recorded.
+
+    ``key(*args, **kwargs)`` names the lock for tasks whose runs only clash
+    with the same arguments. Each shard of a sharded task locks its own
+    ``index/count``.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            task_name = func.__name__
+            lock_name = f"{task_name}:{key(*args, **kwargs)}" if key else task_name
+            if kwargs.get('shard'):
+                lock_name += ':shard:{}/{}'.format(*kwargs['shard'])
+            lease_seconds = lease or settings.TASK_LOCK_LEASE_SECONDS
+            owner = uuid.uuid4().hex
+            started_at, start = timezone.now(), time.perf_counter()
+
+            if not acquire(lock_name, owner, lease_seconds):
+                if on_conflict == 'queue':
+                    requeue(task_name, args, kwargs, settings.TASK_LOCK_RETRY_SECONDS)
+                    message = f"{lock_name} is already running; queued again"
+                else:
+                    message = f"{lock_name} is already running; skipped"
+                record_run(task_name, 'skipped', started_at, start, message=message)
+                return f"Skipped: {message}"
+
+            heartbeat = Heartbeat(lock_name, owner, lease_seconds)
+            heartbeat.start()
+            rows = [0]
+            rows_token = current_run_rows.set(rows)
+            outcome, message = 'failure', ''
+            try:
+                result = func(*args, **kwargs)
+                outcome, message = 'success', str(result or '')
+                return result
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                current_run_rows.reset(rows_token)
+                heartbeat.stop()
+                release(lock_name, owner)
+                record_run(task_name, outcome, started_at, start, rows=rows[0], message=message)
+        return wrapper
+    return decorator
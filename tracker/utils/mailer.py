@@ -0,0 +1,166 @@
+"""Mail outbox.
+
+Tasks append messages to ``OutgoingEmail`` with ``queue_emails`` instead of
+sending them inline. ``drain_outbox`` claims pending messages in batches,
+opens one backend connection per batch and sends every message in it over
+that connection, so connection setup is paid once per MAIL_BATCH_SIZE
+messages rather than once per message. A message that fails is retried
+with exponential backoff until MAIL_MAX_ATTEMPTS, without holding up the
+rest of its batch. Any EMAIL_BACKEND works, including locmem and file.
+"""
+import logging
+import mimetypes
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .metrics import record_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+def queue_emails(emails):
+    """Save unsaved OutgoingEmail instances in one insert and schedule a drain"""
+    from ..models import OutgoingEmail
+
+    if not emails:
+        return []
+    created = OutgoingEmail.objects.bulk_create(emails)
+    schedule_drain()
+    return created
+
+
+def queue_email(to_email, subject, body, **fields):
+    from ..models import OutgoingEmail
+
+    return queue_emails([OutgoingEmail(to_email=to_email, subject=subject, body=body, **fields)])[0]
+
+
+def schedule_drain():
+    """Drain the outbox in the background once the current transaction commits"""
+    from django.db import transaction
+    from .jobs import dispatch
+
+    transaction.on_commit(lambda: dispatch('tracker.tasks.drain_mail_outbox', drain_outbox))
+
+
+def claim_batch(batch_size):
+    """Mark up to ``batch_size`` due messages as sending for this drainer and return them.
+
+    Messages left in 'sending' by a drainer that died are claimed again
+    after MAIL_CLAIM_TIMEOUT.
+    """
+    from ..models import OutgoingEmail
+
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(
+        status='sending', claimed_at__lt=now - timedelta(seconds=settings.MAIL_CLAIM_TIMEOUT)
+    )
+    ids = list(OutgoingEmail.objects.filter(due).order_by('next_attempt_at', 'pk').values_list(
+        'pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Rows another drainer claimed in the meantime no longer match ``due`` and are skipped
+    OutgoingEmail.objects.filter(due, pk__in=ids).update(status='sending', claim_token=token, claimed_at=now)
+    return list(OutgoingEmail.objects.filter(claim_token=token).order_by('pk'))
+
+
+def build_message(email, connection):
+    from django.core.files.storage import default_storage
+
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    if email.attachment_path:
+        with default_storage.open(email.attachment_path, 'rb') as f:
+            name = email.attachment_name or email.attachment_path.rsplit('/', 1)[-1]
+            message.attach(name, f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    return message
+
+
+def send_batch(emails):
+    """Send claimed messages over one connection; return ``(sent ids, [(email, error)])``"""
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        return sent, [(email, e) for email in emails]
+    try:
+        for email in emails:
+            try:
+                build_message(email, connection).send()
+                sent.append(email.pk)
+            except Exception as e:
+                failed.append((email, e))
+                # The connection may be broken; carry on with a fresh one
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception as e:
+                    failed += [(rest, e) for rest in emails[emails.index(email) + 1:]]
+                    break
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def record_results(sent, failed):
+    """Mark sent messages done and reschedule or give up on failed ones"""
+    from ..models import OutgoingEmail
+
+    now = timezone.now()
+    if sent:
+        OutgoingEmail.objects.filter(pk__in=sent).update(status='sent', sent_at=now, claim_token='')
+    for email, error in failed:
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        email.claim_token = ''
+        if email.attempts >= settings.MAIL_MAX_ATTEMPTS:
+            email.status = 'failed'
+            logger.error("Giving up on email %s to %s after %s attempts: %s",
+                         email.pk, email.to_email, email.attempts, error)
+        else:
+            email.status = 'pending'
+            email.next_attempt_at = now + timedelta(
+                seconds=settings.MAIL_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1))
+    if failed:
+        OutgoingEmail.objects.bulk_update(
+            [email for email, _ in failed],
+            ['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'],
+        )
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """Send every due message in the outbox, one connection per batch"""
+    from ..models import OutgoingEmail
+
+    batch_size = batch_size or settings.MAIL_BATCH_SIZE
+    sent_count = failed_count = batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim_batch(batch_size)
+        if not emails:
+            break
+        sent, failed = send_batch(emails)
+        record_results(sent, failed)
+        sent_count += len(sent)
+        failed_count += len(failed)
+        batches += 1
+
+    OutgoingEmail.objects.filter(
+        status='sent', sent_at__lt=timezone.now() - timedelta(days=settings.MAIL_OUTBOX_RETENTION_DAYS)
+    ).delete()
+    record_rows(sent_count)
+    return f"Sent {sent_count} emails in {batches} batches, {failed_count} failed"
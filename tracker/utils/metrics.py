@@ -0,0 +1,335 @@
+"""Prometheus-style metrics with multi-process aggregation.
+
+Each process (gunicorn worker, Celery worker, management command) keeps
+its samples in memory and periodically writes them to its own file in
+METRICS_DIR. The /metrics endpoint merges the files, so counters and
+histograms cover all workers behind the load balancer. When a process
+exits its samples are added to one archive file there, as are those of
+processes that died without doing so (found by /metrics), so totals never
+go down when a worker is recycled; only half-written files are dropped.
+Process ids are only checked on this host, so every host needs its own
+METRICS_DIR.
+"""
+import atexit
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: processes exiting at the same moment may race on the archive
+    fcntl = None
+
+from django.conf import settings
+
+from .instrumentation import current_source
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+
+# Samples of processes that have exited, merged into one file
+ARCHIVE_FILE = 'metrics_archive.json'
+
+# name -> (type, help, buckets)
+METRICS = {
+    'tracker_requests_total': ('counter', 'HTTP requests by view, method and status.', None),
+    'tracker_request_duration_seconds': ('histogram', 'Request latency by view.', DEFAULT_BUCKETS),
+    'tracker_request_db_seconds': ('histogram', 'Database time per request by view.', DEFAULT_BUCKETS),
+    'tracker_cache_requests_total': ('counter', 'Cache lookups by cache and result.', None),
+    'tracker_task_runs_total': ('counter', 'Background task runs by task and outcome.', None),
+    'tracker_task_duration_seconds': ('histogram', 'Background task duration.', TASK_BUCKETS),
+    'tracker_task_rows_processed_total': ('counter', 'Rows processed by background tasks.', None),
+}
+
+current_task = ContextVar('current_task', default=None)
+# Rows counted for the TaskRun being recorded, if any
+current_run_rows = ContextVar('current_run_rows', default=None)
+
+
+class MetricsRegistry:
+    """In-process samples plus the file they are flushed to"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.path = os.path.join(metrics_dir(), f"metrics_{self.pid}_{uuid.uuid4().hex[:8]}.json")
+
+    def check_fork(self):
+        # Workers forked from a preloaded master must not share the master's file
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_fork()
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_fork()
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(hist, buckets=list(hist['buckets']))]
+                               for (name, labels), hist in self.histograms.items()],
+            }
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        with self.flush_lock:
+            data = self.snapshot()
+            if not data['counters'] and not data['histograms']:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+    def archive(self):
+        """Add this process's samples to the archive at exit so /metrics keeps counting them"""
+        if os.getpid() != self.pid:
+            return
+        with self.flush_lock:
+            data = self.snapshot()
+            if not data['counters'] and not data['histograms'] and not os.path.exists(self.path):
+                return
+            directory = os.path.dirname(self.path)
+            try:
+                with archive_lock(directory):
+                    add_to_archive(directory, [data], remove=[self.path])
+            except OSError:
+                return
+            with self.lock:
+                # Anything recorded later starts from zero rather than counting these again
+                self.counters = {}
+                self.histograms = {}
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '') or os.path.join(tempfile.gettempdir(), 'expense_tracker_metrics')
+
+
+registry = MetricsRegistry()
+atexit.register(registry.archive)
+
+
+def inc(name, labels=None, amount=1):
+    registry.inc(name, labels or {}, amount)
+
+
+def observe(name, labels, value):
+    registry.observe(name, labels or {}, value)
+
+
+def record_cache(cache_name, hit):
+    inc('tracker_cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+def record_rows(count):
+    """Add to the rows-processed counter of the task currently running"""
+    task_name = current_task.get()
+    if task_name and count:
+        inc('tracker_task_rows_processed_total', {'task': task_name}, count)
+    run_rows = current_run_rows.get()
+    if run_rows is not None and count:
+        run_rows[0] += count
+
+
+def instrument_task(func, name=None):
+    """Time a task function and count its runs by outcome"""
+    task_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        task_token = current_task.set(task_name)
+        source_token = current_source.set(f"task:{task_name}")
+        start = time.perf_counter()
+        outcome = 'failure'
+        try:
+            result = func(*args, **kwargs)
+            outcome = 'success'
+            return result
+        finally:
+            observe('tracker_task_duration_seconds', {'task': task_name}, time.perf_counter() - start)
+            inc('tracker_task_runs_total', {'task': task_name, 'outcome': outcome})
+            current_source.reset(source_token)
+            current_task.reset(task_token)
+            registry.flush()
+    return wrapper
+
+
+def file_pid(filename):
+    """The process id in a ``metrics_<pid>_<id>.json`` file name, or None"""
+    pid = filename.split('_')[1] if filename.count('_') >= 2 else ''
+    return int(pid) if pid.isdigit() else None
+
+
+def process_alive(pid):
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    return True
+
+
+def read_samples(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def merge_samples(counters, histograms, data):
+    """Add the samples of one file (or snapshot) to ``counters`` and ``histograms``"""
+    for name, labels, value in data.get('counters', []):
+        key = (name, tuple(tuple(label) for label in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, hist in data.get('histograms', []):
+        key = (name, tuple(tuple(label) for label in labels))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = {'buckets': list(hist['buckets']), 'sum': hist['sum'], 'count': hist['count']}
+        else:
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], hist['buckets'])]
+            merged['sum'] += hist['sum']
+            merged['count'] += hist['count']
+
+
+@contextmanager
+def archive_lock(directory):
+    """Hold the lock that keeps the archive and the per-process files consistent"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'archive.lock'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def add_to_archive(directory, samples, remove=()):
+    """Merge ``samples`` into the archive file, then delete the files in ``remove``; needs ``archive_lock``"""
+    path = os.path.join(directory, ARCHIVE_FILE)
+    counters, histograms = {}, {}
+    for data in [read_samples(path)] + list(samples):
+        merge_samples(counters, histograms, data)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), hist] for (name, labels), hist in histograms.items()],
+        }, f)
+    os.replace(tmp_path, path)
+    for filename in remove:
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+
+def collect():
+    """Merge the samples of every process that wrote to METRICS_DIR"""
+    registry.flush()
+    counters = {}
+    histograms = {}
+    directory = metrics_dir()
+    try:
+        filenames = [f for f in os.listdir(directory) if f.startswith('metrics_')]
+    except FileNotFoundError:
+        return counters, histograms
+    with archive_lock(directory):
+        # Left behind by workers that were killed: keep their samples, drop any half-written file
+        dead = [os.path.join(directory, f) for f in filenames if not process_alive(file_pid(f))]
+        if dead:
+            add_to_archive(directory, [read_samples(path) for path in dead if path.endswith('.json')],
+                           remove=dead)
+            filenames = [f for f in os.listdir(directory) if f.startswith('metrics_')]
+        for filename in filenames:
+            if filename.endswith('.json'):
+                merge_samples(counters, histograms, read_samples(os.path.join(directory, filename)))
+    return counters, histograms
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Render the aggregated metrics in the Prometheus text exposition format"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        else:
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, hist['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return '\n'.join(lines) + '\n'
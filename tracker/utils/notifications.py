@@ -0,0 +1,194 @@
+"""Alert delivery and notification digests.
+
+The alert tasks hand their alerts to ``notify`` as unsaved
+``NotificationEvent`` instances. Users on the default 'immediate' digest
+mode get a Notification, and an email when the event asks for one, straight
+away. Users on an hourly or daily digest get the events queued instead, and
+``send_digests`` rolls each user's queued events into one Notification and
+at most one email per window. Goal milestones are rare and their titles are
+the record the milestone check reads, so they are always delivered on their
+own.
+
+``purge_notifications`` applies the retention policy to read notifications.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .mailer import queue_emails
+from .sharding import shard_q
+
+
+# Digested events are kept long enough to cover the longest "already sent"
+# window the alert tasks check, unusual spending's week
+EVENT_RETENTION = timedelta(days=8)
+
+PRIORITY_ORDER = ('low', 'medium', 'high', 'urgent')
+
+# Never rolled into a digest
+IMMEDIATE_TYPES = ('goal_milestone',)
+
+
+def event_notification(event):
+    from ..models import Notification
+
+    return Notification(user_id=event.user_id, title=event.title, message=event.message,
+                        notification_type=event.notification_type, priority=event.priority)
+
+
+def event_email(event):
+    from ..models import OutgoingEmail
+
+    return OutgoingEmail(user_id=event.user_id, to_email=event.user.email, subject=event.title,
+                         body=event.message, category=event.notification_type)
+
+
+def digest_user_ids(events):
+    """Return the ids of the events' users who are on an hourly or daily digest.
+
+    Preferences already loaded with ``select_related('user__userpreferences')``
+    are used as they are; the rest are fetched in one query.
+    """
+    from django.contrib.auth.models import User
+    from ..models import NotificationEvent, UserPreferences
+
+    digest, unknown = set(), set()
+    for event in events:
+        if NotificationEvent.user.is_cached(event) and User.userpreferences.is_cached(event.user):
+            preferences = getattr(event.user, 'userpreferences', None)
+            if preferences and preferences.digest_mode != 'immediate':
+                digest.add(event.user_id)
+        else:
+            unknown.add(event.user_id)
+    if unknown:
+        digest.update(UserPreferences.objects.filter(user__in=unknown).exclude(
+            digest_mode='immediate').values_list('user_id', flat=True))
+    return digest
+
+
+def notify(events):
+    """Deliver unsaved NotificationEvents now or queue them for their user's digest.
+
+    Events that ask for an email must have ``user`` loaded. Returns the
+    number of events delivered immediately.
+    """
+    from ..models import Notification, NotificationEvent
+
+    if not events:
+        return 0
+    digest_users = digest_user_ids(
+        [event for event in events if event.notification_type not in IMMEDIATE_TYPES]
+    )
+    immediate, queued = [], []
+    for event in events:
+        digest = event.user_id in digest_users and event.notification_type not in IMMEDIATE_TYPES
+        (queued if digest else immediate).append(event)
+
+    Notification.create_many([event_notification(event) for event in immediate])
+    queue_emails([event_email(event) for event in immediate if event.send_email and event.user.email])
+    NotificationEvent.objects.bulk_create(queued)
+    return len(immediate)
+
+
+def already_notified(notification_type, user_ids, since=None):
+    """Return ``{(user_id, title)}`` for alerts of this type the users were sent or have queued.
+
+    Alerts that went out in a digest count too, through their retained events.
+    """
+    from ..models import Notification, NotificationEvent
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    created = Q(created_at__gte=since) if since else Q()
+    # One query; each part drops Notification's default ordering, which unions do not allow
+    rows = Notification.objects.filter(created, user__in=user_ids, notification_type=notification_type).values_list(
+        'user_id', 'title'
+    ).order_by().union(
+        NotificationEvent.objects.filter(created, user__in=user_ids, notification_type=notification_type)
+        .values_list('user_id', 'title').order_by(),
+    )
+    return set(rows)
+
+
+def digest_message(events):
+    return '\n'.join(f"{event.title}\n  {event.message}" for event in events)
+
+
+def send_digests(mode, now=None, shard=None):
+    """Roll every queued event of users on ``mode`` into one notification and email each.
+
+    Users who switched back to immediate delivery have their leftover events
+    sent with the hourly digests. ``shard`` limits the run to one range of
+    user ids (see utils.sharding).
+    """
+    from ..models import Notification, NotificationEvent, OutgoingEmail
+
+    now = now or timezone.now()
+    modes = [mode, 'immediate'] if mode == 'hourly' else [mode]
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.filter(
+                shard_q(shard), digested_at__isnull=True, user__userpreferences__digest_mode__in=modes
+            )
+            .select_related('user').order_by('user_id', 'created_at', 'pk')
+        )
+        notifications, emails = [], []
+        for _, group in groupby(events, key=lambda event: event.user_id):
+            group = list(group)
+            user = group[0].user
+            title = f"Your {mode} digest: {len(group)} alert{'s' if len(group) != 1 else ''}"
+            message = digest_message(group)
+            notifications.append(Notification(
+                user=user,
+                title=title,
+                message=message,
+                notification_type='digest',
+                priority=max((event.priority for event in group), key=PRIORITY_ORDER.index),
+            ))
+            if user.email and any(event.send_email for event in group):
+                emails.append(OutgoingEmail(user=user, to_email=user.email, subject=title, body=message,
+                                            category='digest'))
+        Notification.create_many(notifications)
+        queue_emails(emails)
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(digested_at=now)
+        NotificationEvent.objects.filter(shard_q(shard), digested_at__lt=now - EVENT_RETENTION).delete()
+    return len(notifications), len(events)
+
+
+def purge_notifications(now=None, batch_size=None):
+    """Delete read notifications past NOTIFICATION_RETENTION_DAYS in batches.
+
+    With NOTIFICATION_ARCHIVE on, each batch is copied to NotificationArchive
+    first. Unread notifications are never touched, so counters stay right.
+    Returns ``(purged, archived)``.
+    """
+    from django.conf import settings
+    from ..models import Notification, NotificationArchive
+
+    now = now or timezone.now()
+    batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+    expired = Notification.objects.filter(
+        is_read=True, created_at__lt=now - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    ).exclude(notification_type__in=Notification.RETAINED_TYPES).order_by('created_at')
+    fields = ('id', 'user_id', 'title', 'message', 'notification_type', 'priority', 'created_at')
+    purged = archived = 0
+    while True:
+        # Each batch commits on its own so a long purge never holds a big transaction
+        with transaction.atomic():
+            if settings.NOTIFICATION_ARCHIVE:
+                rows = list(expired.values(*fields)[:batch_size])
+                ids = [row.pop('id') for row in rows]
+                archived += len(NotificationArchive.objects.bulk_create(
+                    [NotificationArchive(**row) for row in rows]
+                ))
+            else:
+                ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if ids:
+                Notification.objects.filter(pk__in=ids).delete()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            return purged, archived
@@ -0,0 +1,103 @@
+"""Batch rendering of monthly PDF statements.
+
+Report data is loaded for chunks of users with ``ReportData.load_many``
+and the PDFs are rendered on a process pool, because ReportLab is
+CPU-bound and would serialize on the GIL in threads. Each worker builds
+the stylesheet and table styles once and reuses them for every statement
+it renders. Statements are stored under the same keys the report view
+uses, so the link in the monthly email is served straight from storage.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .reports import FinancialReportGenerator, ReportData, add_months, render_report, report_cache_path, save_report
+
+
+logger = logging.getLogger(__name__)
+
+
+def statement_period(month=None):
+    """First and last day of ``month`` (any date in it), by default last month"""
+    first = (month or add_months(timezone.now().date(), -1)).replace(day=1)
+    return first, add_months(first, 1) - timedelta(days=1)
+
+
+def init_worker():
+    """Pool initializer: spawned workers start without Django set up"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def render_statement(data):
+    """Render one statement from preloaded ReportData; runs inside a pool worker"""
+    generator = FinancialReportGenerator(data.user, data.start_date, data.end_date, data=data)
+    return render_report(generator)
+
+
+def statement_workers(requested=None):
+    """Number of render processes to use; 0 or 1 renders in this process"""
+    workers = settings.STATEMENT_WORKERS if requested is None else requested
+    if workers > 1 and multiprocessing.current_process().daemon:
+        # Celery's prefork children are daemonic and may not start processes
+        logger.info("Rendering statements in-process: daemonic processes cannot start a pool")
+        return 0
+    return workers
+
+
+def generate_statements(users, start_date, end_date, workers=None, chunk_size=None, progress=None):
+    """Render and store statements for ``users``; return ``({user_id: path}, rendered count)``.
+
+    Users whose statement for their current data is already stored are
+    skipped. With a pool, each chunk's data is loaded while the previous
+    chunk renders, so at most two chunks are held in memory.
+    """
+    from ..models import DataVersion
+
+    workers = statement_workers(workers)
+    chunk_size = chunk_size or settings.STATEMENT_CHUNK_SIZE
+    paths, rendered = {}, 0
+    pool = None
+    if workers > 1:
+        # spawn rather than fork: forked workers would share this process's database connections
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_worker)
+    pending = []
+    try:
+        for offset in range(0, len(users), chunk_size):
+            chunk = users[offset:offset + chunk_size]
+            versions = DataVersion.current_many([user.pk for user in chunk])
+            todo = []
+            for user in chunk:
+                path = report_cache_path(user, 'monthly', start_date, end_date, versions[user.pk])
+                paths[user.pk] = path
+                if not default_storage.exists(path):
+                    todo.append(ReportData(user, start_date, end_date))
+            ReportData.load_many(todo)
+
+            if pool is None:
+                for data in todo:
+                    save_report(paths[data.user.pk], render_statement(data))
+                rendered += len(todo)
+            else:
+                submitted = [(paths[data.user.pk], pool.submit(render_statement, data)) for data in todo]
+                for path, future in pending:
+                    save_report(path, future.result())
+                rendered += len(pending)
+                pending = submitted
+            if progress:
+                progress(min(offset + chunk_size, len(users)), rendered)
+        for path, future in pending:
+            save_report(path, future.result())
+        rendered += len(pending)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return paths, rendered
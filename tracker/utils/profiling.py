@@ -0,0 +1,143 @@
+"""On-demand request profiling.
+
+A profiled request runs under cProfile for exact per-function timings
+(saved in pstats format) while a background thread samples the request
+thread's stack to build collapsed stacks, the one-line-per-stack format
+that flamegraph.pl, speedscope and similar tools read.
+"""
+import cProfile
+import io
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .instrumentation import PROJECT_ROOT
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+
+
+def profile_trigger(request):
+    """Return 'flag' or 'sample' when this request should be profiled, else None"""
+    if request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1':
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            return 'flag'
+    rate = settings.PROFILING_SAMPLE_RATE
+    if rate > 0 and random.random() * 100 < rate:
+        return 'sample'
+    return None
+
+
+def frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's stack at a fixed interval and count collapsed stacks"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileResult:
+    def __init__(self, duration, pstats_data, collapsed, sample_count):
+        self.duration = duration
+        self.pstats_data = pstats_data
+        self.collapsed = collapsed
+        self.sample_count = sample_count
+
+
+def profile_call(func, *args, **kwargs):
+    """Run ``func`` under cProfile and the stack sampler; return ``(result, ProfileResult)``"""
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        duration = time.perf_counter() - start
+        sampler.stop()
+    profiler.create_stats()
+    # The same bytes Profile.dump_stats writes, readable with pstats.Stats(path)
+    pstats_data = marshal.dumps(profiler.stats)
+    return result, ProfileResult(duration, pstats_data, sampler.collapsed(), sum(sampler.stacks.values()))
+
+
+def top_functions(pstats_data, limit=25):
+    """Render the slowest functions of stored pstats data by cumulative time"""
+    import pstats
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(suffix='.pstats') as f:
+        f.write(pstats_data)
+        f.flush()
+        out = io.StringIO()
+        pstats.Stats(f.name, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def save_profile(request, response, trigger, result, recorder):
+    """Store a profile and trim old ones beyond PROFILING_MAX_PROFILES"""
+    from django.core.files.base import ContentFile
+    from ..models import RequestProfile
+
+    match = getattr(request, 'resolver_match', None)
+    user = getattr(request, 'user', None)
+    url_name = match.url_name if match and match.url_name else ''
+    profile = RequestProfile(
+        url_name=url_name,
+        path=request.get_full_path()[:500],
+        method=request.method,
+        user=user if user is not None and user.is_authenticated else None,
+        status_code=response.status_code,
+        trigger=trigger,
+        duration_ms=round(result.duration * 1000, 2),
+        query_count=recorder.count,
+        db_time_ms=recorder.report()['db_time_ms'],
+        sample_count=result.sample_count,
+    )
+    stem = f"{url_name or 'request'}-{int(time.time() * 1000)}"
+    profile.pstats_file.save(f"{stem}.pstats", ContentFile(result.pstats_data), save=False)
+    profile.stacks_file.save(f"{stem}.folded", ContentFile(result.collapsed.encode()), save=False)
+    profile.save()
+
+    stale = RequestProfile.objects.values_list('pk', flat=True)[settings.PROFILING_MAX_PROFILES:]
+    for old in RequestProfile.objects.filter(pk__in=list(stale)):
+        old.delete()
+    return profile
@@ -0,0 +1,213 @@
+"""Query budgets pinned per view and per task.
+
+Every URL in ``tracker/urls.py`` and every task in ``tracker/tasks.py`` has
+an upper bound on the queries it may run for one user. The staff profile
+detail and download pages are left out because they serve stored files.
+``manage.py test`` (tracker.tests.test_query_budgets) and the
+``check_query_budgets`` command measure them against a seeded dataset and
+again after doubling it; a count that grows with the data is an O(n)
+query pattern and fails the check even when it is still under budget.
+"""
+from django.db import transaction as db_transaction
+from django.urls import reverse
+
+from .benchmarks import TASK_TARGETS, reset_caches
+from .instrumentation import record_queries
+
+
+# Per-user dataset for the base run; the scaled run multiplies every count
+BASE_DATASET = {
+    'users': 2, 'years': 1, 'transactions_per_month': 20, 'budgets': 3, 'bills': 3,
+    'goals': 2, 'recurring': 2, 'templates': 2, 'notifications': 10,
+}
+
+
+# url name -> (max queries, object the URL needs a pk of, query string)
+VIEW_BUDGETS = {
+    'index': (2, None, {}),
+    'signup': (2, None, {}),
+    'profile': (3, None, {}),
+    'transactions': (6, None, {}),
+    'transaction_create': (5, None, {}),
+    'transaction_edit': (7, 'transaction', {}),
+    'transaction_delete': (3, 'transaction', {}),
+    'transaction_duplicate': (3, 'transaction', {}),
+    'transaction_duplicates': (4, None, {}),
+    'export_csv': (4, None, {}),
+    'dashboard': (15, None, {}),
+    'import_csv': (3, None, {}),
+    'import_job_detail': (3, 'import_job', {}),
+    'import_job_status': (3, 'import_job', {}),
+    'budgets': (3, None, {}),
+    'budget_create': (3, None, {}),
+    'budget_edit': (4, 'budget', {}),
+    'budget_delete': (3, 'budget', {}),
+    'recurrings': (3, None, {}),
+    'recurring_create': (4, None, {}),
+    'recurring_edit': (5, 'recurring', {}),
+    'recurring_delete': (3, 'recurring', {}),
+    'split_create': (4, 'transaction', {}),
+    'split_edit': (5, 'split', {}),
+    'split_delete': (4, 'split', {}),
+    'templates': (3, None, {}),
+    'template_create': (4, None, {}),
+    'template_use': (8, 'template', {}),
+    'template_delete': (3, 'template', {}),
+    'goals': (3, None, {}),
+    'goal_create': (2, None, {}),
+    'goal_detail': (5, 'goal', {}),
+    'goal_contribute': (4, 'goal', {}),
+    'goal_delete': (3, 'goal', {}),
+    'bills': (5, None, {}),
+    'bill_create': (4, None, {}),
+    'bill_pay': (4, 'bill', {}),
+    'bill_delete': (3, 'bill', {}),
+    'transactions_advanced': (8, None, {}),
+    'transactions_bulk_action': (2, None, {}),
+    'dashboard_enhanced': (20, None, {}),
+    'notifications': (6, None, {}),
+    'notification_count': (3, None, {}),
+    'event_stream': (0, None, {}),
+    'event_poll': (2, None, {}),
+    'financial_health': (12, None, {}),
+    'generate_pdf_report': (8, None, {'type': 'monthly'}),
+    'report_job_detail': (3, 'report_job', {}),
+    'report_job_status': (3, 'report_job', {}),
+    'report_job_download': (3, 'report_job', {}),
+    'advanced_search': (10, None, {'q': 'cafe'}),
+    'calendar_view': (4, None, {}),
+    'voice_transaction': (4, None, {}),
+    'ai_insights': (19, None, {}),
+    'query_report': (2, None, {}),
+    'metrics': (2, None, {}),
+    'slow_queries': (4, None, {}),
+    'request_profiles': (4, None, {}),
+}
+
+TASK_BUDGETS = {
+    'calculate_financial_health_scores': 13,
+    'check_budget_alerts': 12,
+    'send_budget_alert_email': 2,
+    'check_bill_reminders': 12,
+    'send_bill_reminder_email': 2,
+    'generate_monthly_reports': 18,
+    'send_monthly_report_email': 2,
+    'drain_mail_outbox': 6,
+    'send_notification_digests': 14,
+    'purge_old_notifications': 9,
+    'check_savings_goal_milestones': 10,
+    'detect_unusual_spending': 8,
+    'process_change_events': 23,
+    'process_import_job': 17,
+    'process_report_job': 13,
+}
+
+
+def target_object(user, kind):
+    """Return the pk of the user's first object of ``kind`` for URLs that need one"""
+    from ..models import (
+        Bill, Budget, ImportJob, RecurringTransaction, ReportJob, SavingsGoal, Transaction,
+        TransactionSplit, TransactionTemplate,
+    )
+    from .reports import report_period
+
+    if kind == 'import_job':
+        job = ImportJob.objects.filter(user=user).first()
+        if job is None:
+            job = ImportJob.objects.create(user=user, file='imports/budget.csv', original_name='budget.csv')
+        return job.pk
+    if kind == 'report_job':
+        start_date, end_date = report_period()
+        return ReportJob.objects.create(user=user, start_date=start_date, end_date=end_date).pk
+    querysets = {
+        'transaction': Transaction.objects.filter(user=user, splits__isnull=False),
+        'budget': Budget.objects.filter(user=user),
+        'recurring': RecurringTransaction.objects.filter(user=user),
+        'split': TransactionSplit.objects.filter(transaction__user=user),
+        'template': TransactionTemplate.objects.filter(user=user),
+        'goal': SavingsGoal.objects.filter(user=user),
+        'bill': Bill.objects.filter(user=user),
+    }
+    return querysets[kind].order_by('pk').values_list('pk', flat=True).first()
+
+
+def measure_view(client, user, url_name):
+    """Queries run by one GET of ``url_name``, with the data rolled back afterwards"""
+    _, kind, params = VIEW_BUDGETS[url_name]
+    with db_transaction.atomic():
+        args = [target_object(user, kind)] if kind else []
+        url = reverse(url_name, args=args)
+        reset_caches(user)
+        with record_queries() as recorder:
+            response = client.get(url, params)
+        db_transaction.set_rollback(True)
+    return recorder.count, response.status_code
+
+
+def measure_task(user, name):
+    """Queries run by one call of the task ``name``, with the data rolled back afterwards"""
+    from .. import tasks
+
+    args, cleanup = TASK_TARGETS[name](user)
+    try:
+        with db_transaction.atomic():
+            with record_queries() as recorder:
+                getattr(tasks, name)(*args)
+            db_transaction.set_rollback(True)
+    finally:
+        cleanup()
+    return recorder.count
+
+
+def measure_dataset(scale, views, tasks):
+    """Seed BASE_DATASET times ``scale`` and measure the views and tasks against it, then roll back.
+
+    Returns ``(counts, failed)``: query counts by name, and the views that
+    answered with a server error.
+    """
+    from django.test import Client
+    from .seeding import seed_users
+
+    counts, failed = {}, []
+    with db_transaction.atomic():
+        dataset = {key: value * scale for key, value in BASE_DATASET.items()}
+        users = seed_users(prefix='budget', split_ratio=0.2, seed=7, **dataset)
+        user = users[0]
+        # Staff so the diagnostics views render instead of redirecting
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        for name in views:
+            counts[name], status = measure_view(client, user, name)
+            if status >= 500:
+                failed.append(name)
+        for name in tasks:
+            counts[name] = measure_task(user, name)
+        db_transaction.set_rollback(True)
+    return counts, failed
+
+
+def check_results(base, scaled):
+    """Compare query counts from the base and doubled datasets against the budgets.
+
+    Returns ``(rows, failures)`` where rows are
+    ``(name, budget, base_count, scaled_count, status)`` tuples.
+    """
+    budgets = {name: budget for name, (budget, _, _) in VIEW_BUDGETS.items()}
+    budgets.update(TASK_BUDGETS)
+    rows, failures = [], []
+    for name, count in base.items():
+        budget = budgets[name]
+        scaled_count = scaled.get(name, count)
+        if scaled_count > count:
+            status = 'GROWS WITH DATA'
+        elif max(count, scaled_count) > budget:
+            status = 'OVER BUDGET'
+        else:
+            status = 'ok'
+        rows.append((name, budget, count, scaled_count, status))
+        if status != 'ok':
+            failures.append(f"{name}: {count} -> {scaled_count} queries (budget {budget}, {status.lower()})")
+    return rows, failures
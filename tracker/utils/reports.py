@@ -7,45 +7,277 @@ from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics.charts.linecharts import HorizontalLineChart
 from reportlab.graphics.charts.barcharts import VerticalBarChart
-from django.http import HttpResponse
-from django.db.models import Sum, Count
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import TruncMonth
+from django.http import FileResponse, HttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+import functools
 import io
+import math
 import os
+import threading
+
+
+TREND_MONTHS = 6
+RECENT_TRANSACTIONS = 20
+TOP_CATEGORIES = 10
+
+
+_styles = None
+_styles_lock = threading.Lock()
+
+
+def report_styles():
+    """The paragraph styles for reports, built once per process and shared by every generator"""
+    global _styles
+    with _styles_lock:
+        if _styles is None:
+            styles = getSampleStyleSheet()
+            styles.add(ParagraphStyle(
+                name='CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=18,
+                spaceAfter=30,
+                textColor=colors.HexColor('#2c3e50')
+            ))
+            styles.add(ParagraphStyle(
+                name='SectionHeader',
+                parent=styles['Heading2'],
+                fontSize=14,
+                spaceAfter=12,
+                textColor=colors.HexColor('#34495e')
+            ))
+            _styles = styles
+    return _styles
+
+
+@functools.lru_cache(maxsize=None)
+def grid_table_style(header_color, header_font_size=10, body_font_size=None, padding=None):
+    """The gridded table style used by every report table; cached, tables only read it"""
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]
+    if body_font_size:
+        commands.append(('FONTSIZE', (0, 1), (-1, -1), body_font_size))
+    if padding is not None:
+        commands += [('LEFTPADDING', (0, 0), (-1, -1), padding), ('RIGHTPADDING', (0, 0), (-1, -1), padding)]
+    return TableStyle(commands)
+
+
+def add_months(day, months):
+    """First day of the month ``months`` away from ``day``'s month"""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def period_months(start_date, end_date):
+    """First days of every calendar month touched by the period, oldest first"""
+    months, month = [], start_date.replace(day=1)
+    while month <= end_date:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def pivot_buckets(months, max_columns=12):
+    """Group months into at most ``max_columns`` columns: months, else quarters, else years.
+
+    Returns ``(labels, bucket_of)`` where ``bucket_of`` maps a month to its
+    column index.
+    """
+    if len(months) <= max_columns:
+        keys = [(month,) for month in months]
+        label = lambda key: key[0].strftime('%b %y')
+    elif len(months) <= max_columns * 3:
+        keys = [(month.year, (month.month - 1) // 3 + 1) for month in months]
+        label = lambda key: f"Q{key[1]} {key[0] % 100:02d}"
+    else:
+        keys = [(month.year,) for month in months]
+        label = lambda key: str(key[0])
+    columns = list(dict.fromkeys(keys))
+    index = {key: i for i, key in enumerate(columns)}
+    return [label(key) for key in columns], {month: index[key] for month, key in zip(months, keys)}
+
+
+class ReportData:
+    """Everything a report shows, loaded up front with a few grouped queries.
+
+    Totals of any length of period come from one query grouped by
+    ``(month, category, trans_type)``, so a five-year report costs the same
+    number of queries as a one-month report.
+    """
+
+    def __init__(self, user, start_date, end_date, trend_months=TREND_MONTHS):
+        self.user = user
+        self.start_date = start_date
+        self.end_date = end_date
+        self.months = period_months(start_date, end_date)
+        if trend_months:
+            # Calendar months ending with the report's first month, oldest first
+            trend_start = add_months(start_date, 1 - trend_months)
+            self.trend_months = [add_months(trend_start, i) for i in range(trend_months)]
+        else:
+            self.trend_months = self.months
+
+    def load(self):
+        self.load_many([self])
+        return self
+
+    @staticmethod
+    def load_many(reports):
+        """Load several users' reports for the same period with the queries of a single one"""
+        from django.db.models import F, Window
+        from django.db.models.functions import RowNumber
+        from ..models import Account, Budget, SavingsGoal, Transaction
+
+        if not reports:
+            return reports
+        first = reports[0]
+        start_date, end_date = first.start_date, first.end_date
+        by_user = {report.user.pk: report for report in reports}
+        transactions = Transaction.objects.filter(user__in=list(by_user))
+        in_period = Q(date__gte=start_date, date__lte=end_date)
+        range_start = min(first.trend_months[0], start_date)
+        range_end = max(add_months(first.trend_months[-1], 1) - timedelta(days=1), end_date)
+
+        for report in reports:
+            report.income = Decimal('0')
+            report.expenses = Decimal('0')
+            # month -> {'income': total, 'expense': total}; all months in range and in-period only
+            report.month_totals = defaultdict(lambda: defaultdict(Decimal))
+            report.period_month_totals = defaultdict(lambda: defaultdict(Decimal))
+            # category name -> {month: expense total} within the period
+            report.category_month_totals = defaultdict(lambda: defaultdict(Decimal))
+            report.category_counts = defaultdict(int)
+            report.recent_transactions = []
+            report.budgets = []
+            report.goals = []
+
+        # The trend, period totals, monthly breakdown and category pivot all come from this one query
+        rows = transactions.filter(date__gte=range_start, date__lte=range_end).annotate(
+            month=TruncMonth('date')
+        ).values('user', 'month', 'category__name', 'trans_type').annotate(
+            total=Sum('amount'),
+            period_total=Sum('amount', filter=in_period),
+            period_count=Count('id', filter=in_period),
+        ).order_by()
+        for row in rows:
+            report = by_user[row['user']]
+            month = row['month'].date() if isinstance(row['month'], datetime) else row['month']
+            trans_type, period_total = row['trans_type'], row['period_total'] or Decimal('0')
+            report.month_totals[month][trans_type] += row['total']
+            if not row['period_count']:
+                continue
+            report.period_month_totals[month][trans_type] += period_total
+            if trans_type == 'income':
+                report.income += period_total
+            elif trans_type == 'expense':
+                report.expenses += period_total
+                report.category_month_totals[row['category__name']][month] += period_total
+                report.category_counts[row['category__name']] += row['period_count']
+
+        for report in reports:
+            report.net_savings = report.income - report.expenses
+            report.trend = [(month, report.month_totals[month]['income'], report.month_totals[month]['expense'])
+                            for month in report.trend_months]
+            report.monthly = [
+                (month, report.period_month_totals[month]['income'], report.period_month_totals[month]['expense'])
+                for month in report.months
+            ]
+            totals = {name: sum(months.values()) for name, months in report.category_month_totals.items()}
+            ranked = sorted(totals, key=lambda name: (-totals[name], name or ''))
+            report.categories = [
+                {'category__name': name, 'total': totals[name], 'count': report.category_counts[name]}
+                for name in ranked[:TOP_CATEGORIES]
+            ]
+
+        balances = dict(Account.objects.filter(user__in=list(by_user)).values('user').annotate(
+            total=Sum('balance')).order_by().values_list('user', 'total'))
+        for user_id, report in by_user.items():
+            report.total_balance = balances.get(user_id) or Decimal('0')
+
+        # The newest RECENT_TRANSACTIONS per user, numbered within each user
+        recent = transactions.filter(in_period).select_related('category').annotate(
+            position=Window(RowNumber(), partition_by=[F('user_id')],
+                            order_by=[F('date').desc(), F('created_at').desc()])
+        ).filter(position__lte=RECENT_TRANSACTIONS).order_by('user_id', '-date', '-created_at')
+        for trans in recent:
+            by_user[trans.user_id].recent_transactions.append(trans)
+
+        for budget in Budget.objects.filter(user__in=list(by_user)).with_spent(
+            start=start_date, end=end_date, use_budget_dates=True
+        ).order_by('pk'):
+            by_user[budget.user_id].budgets.append(budget)
+        for goal in SavingsGoal.objects.filter(user__in=list(by_user), status='active').order_by('pk'):
+            by_user[goal.user_id].goals.append(goal)
+        return reports
+
+    def category_pivot(self, max_columns=12, max_rows=TOP_CATEGORIES):
+        """Expense totals by category and month (or quarter/year for long periods).
+
+        Returns ``(column labels, rows)`` with rows of
+        ``(category name, [total per column], total)``, biggest first; the
+        categories beyond ``max_rows`` are folded into one 'Other' row.
+        """
+        labels, bucket_of = pivot_buckets(self.months, max_columns)
+        rows = []
+        for name, months in self.category_month_totals.items():
+            cells = [Decimal('0')] * len(labels)
+            for month, total in months.items():
+                cells[bucket_of[month]] += total
+            rows.append((name or 'Uncategorized', cells, sum(cells)))
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        if len(rows) > max_rows:
+            rest = rows[max_rows - 1:]
+            other = [sum(row[1][i] for row in rest) for i in range(len(labels))]
+            rows = rows[:max_rows - 1] + [('Other', other, sum(other))]
+        return labels, rows
 
 
 class FinancialReportGenerator:
     """Generate PDF financial reports with charts and tables"""
     
-    def __init__(self, user, start_date=None, end_date=None):
+    def __init__(self, user, start_date=None, end_date=None, data=None, report_type='monthly'):
         self.user = user
-        self.start_date = start_date or timezone.now().date().replace(day=1)
-        self.end_date = end_date or timezone.now().date()
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
-    
-    def setup_custom_styles(self):
-        """Setup custom paragraph styles"""
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            textColor=colors.HexColor('#2c3e50')
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12,
-            textColor=colors.HexColor('#34495e')
-        ))
+        self.report_type = report_type
+        self.start_date, self.end_date = report_period(start_date, end_date, report_type)
+        self.styles = report_styles()
+        self._data = data  # Preloaded ReportData, e.g. from ReportData.load_many
+
+    @property
+    def data(self):
+        if self._data is None:
+            # Monthly reports show the months leading up to them; longer reports their own months
+            trend_months = TREND_MONTHS if self.report_type == 'monthly' else None
+            self._data = ReportData(self.user, self.start_date, self.end_date, trend_months).load()
+        return self._data
+
+    @property
+    def title(self):
+        start, end = self.start_date, self.end_date
+        if self.report_type == 'monthly':
+            return f"Monthly Financial Report - {start.strftime('%B %Y')}"
+        if self.report_type == 'quarterly':
+            return f"Quarterly Financial Report - Q{(start.month - 1) // 3 + 1} {start.year}"
+        if self.report_type == 'yearly':
+            return f"Yearly Financial Report - {start.year}"
+        return f"Financial Report - {start.strftime('%b %d, %Y')} to {end.strftime('%b %d, %Y')}"
     
-    def generate_monthly_report(self):
-        """Generate comprehensive monthly financial report"""
+    def generate_report(self):
+        """Generate the PDF report for this generator's type and period"""
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
@@ -54,8 +286,7 @@ class FinancialReportGenerator:
         story = []
         
         # Title
-        title = Paragraph(f"Monthly Financial Report - {self.start_date.strftime('%B %Y')}", 
-                         self.styles['CustomTitle'])
+        title = Paragraph(self.title, self.styles['CustomTitle'])
         story.append(title)
         story.append(Spacer(1, 12))
         
@@ -67,6 +298,13 @@ class FinancialReportGenerator:
         story.extend(self._build_income_expense_chart())
         story.append(Spacer(1, 20))
         
+        # Month-by-month and category-by-month tables for periods longer than a month
+        if len(self.data.months) > 1:
+            story.extend(self._build_monthly_breakdown())
+            story.append(Spacer(1, 20))
+            story.extend(self._build_category_pivot())
+            story.append(Spacer(1, 20))
+        
         # Category breakdown
         story.extend(self._build_category_breakdown())
         story.append(Spacer(1, 20))
@@ -86,25 +324,14 @@ class FinancialReportGenerator:
         doc.build(story)
         buffer.seek(0)
         return buffer
-    
+
     def _build_summary_section(self):
         """Build financial summary section"""
-        from ..models import Transaction, Account
-        
-        # Calculate totals
-        income = Transaction.objects.filter(
-            user=self.user, trans_type='income',
-            date__gte=self.start_date, date__lte=self.end_date
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        expenses = Transaction.objects.filter(
-            user=self.user, trans_type='expense',
-            date__gte=self.start_date, date__lte=self.end_date
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        net_savings = income - expenses
-        total_balance = Account.objects.filter(user=self.user).aggregate(
-            Sum('balance'))['balance__sum'] or Decimal('0')
+        data = self.data
+        income = data.income
+        expenses = data.expenses
+        net_savings = data.net_savings
+        total_balance = data.total_balance
         
         # Create summary table
         summary_data = [
@@ -116,16 +343,7 @@ class FinancialReportGenerator:
         ]
         
         summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        summary_table.setStyle(grid_table_style('#3498db', 12))
         
         return [
             Paragraph("Financial Summary", self.styles['SectionHeader']),
@@ -134,28 +352,11 @@ class FinancialReportGenerator:
     
     def _build_income_expense_chart(self):
         """Build income vs expenses bar chart"""
-        from ..models import Transaction
-        
-        # Get monthly data for the last 6 months
-        chart_data = []
-        labels = []
-        
-        for i in range(6):
-            month_start = (self.start_date.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-            month_end = (month_start.replace(month=month_start.month+1) - timedelta(days=1)) if month_start.month < 12 else month_start.replace(year=month_start.year+1, month=1) - timedelta(days=1)
-            
-            income = Transaction.objects.filter(
-                user=self.user, trans_type='income',
-                date__gte=month_start, date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            
-            expenses = Transaction.objects.filter(
-                user=self.user, trans_type='expense',
-                date__gte=month_start, date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            
-            chart_data.append((float(income), float(expenses)))
-            labels.append(month_start.strftime('%b %Y'))
+        chart_data = [(float(income), float(expenses)) for _, income, expenses in self.data.trend]
+        # Label at most 12 months so long periods stay readable
+        step = math.ceil(len(self.data.trend) / 12)
+        labels = [month.strftime('%b %Y') if i % step == 0 else ''
+                  for i, (month, _, _) in enumerate(self.data.trend)]
         
         # Create bar chart
         drawing = Drawing(400, 200)
@@ -177,17 +378,57 @@ class FinancialReportGenerator:
             drawing
         ]
     
+    def _build_monthly_breakdown(self):
+        """Build month-by-month income, expenses and net table"""
+        table_data = [['Month', 'Income', 'Expenses', 'Net']]
+        for month, income, expenses in self.data.monthly:
+            table_data.append([
+                month.strftime('%B %Y'),
+                f"${income:,.2f}",
+                f"${expenses:,.2f}",
+                f"${income - expenses:,.2f}",
+            ])
+        table_data.append([
+            'Total',
+            f"${self.data.income:,.2f}",
+            f"${self.data.expenses:,.2f}",
+            f"${self.data.net_savings:,.2f}",
+        ])
+        
+        monthly_table = Table(table_data, colWidths=[1.8*inch, 1.4*inch, 1.4*inch, 1.4*inch], repeatRows=1)
+        monthly_table.setStyle(grid_table_style('#16a085', 10, 9))
+        
+        return [
+            Paragraph("Month by Month", self.styles['SectionHeader']),
+            monthly_table
+        ]
+    
+    def _build_category_pivot(self):
+        """Build expenses by category and month (quarter or year for long periods)"""
+        labels, rows = self.data.category_pivot()
+        if not rows:
+            return [Paragraph("No expense data available for the category breakdown", 
+                            self.styles['Normal'])]
+        
+        table_data = [['Category'] + labels + ['Total']]
+        for name, cells, total in rows:
+            table_data.append([name[:18]] + [f"{cell:,.0f}" for cell in cells] + [f"{total:,.0f}"])
+        column_totals = [sum(row[1][i] for row in rows) for i in range(len(labels))]
+        table_data.append(['Total'] + [f"{cell:,.0f}" for cell in column_totals] + [f"{self.data.expenses:,.0f}"])
+        
+        # Share the page width left after the category column among the value columns
+        value_width = (6.2 - 1.3) * inch / (len(labels) + 1)
+        pivot_table = Table(table_data, colWidths=[1.3*inch] + [value_width] * (len(labels) + 1), repeatRows=1)
+        pivot_table.setStyle(grid_table_style('#8e44ad', 7, 6, padding=2))
+        
+        return [
+            Paragraph("Spending by Category ($)", self.styles['SectionHeader']),
+            pivot_table
+        ]
+    
     def _build_category_breakdown(self):
         """Build category spending breakdown"""
-        from ..models import Transaction
-        
-        # Get category data
-        categories = Transaction.objects.filter(
-            user=self.user, trans_type='expense',
-            date__gte=self.start_date, date__lte=self.end_date
-        ).values('category__name').annotate(
-            total=Sum('amount'), count=Count('id')
-        ).order_by('-total')[:10]
+        categories = self.data.categories
         
         if not categories:
             return [Paragraph("No expense data available for category breakdown", 
@@ -207,17 +448,7 @@ class FinancialReportGenerator:
             ])
         
         category_table = Table(table_data, colWidths=[2*inch, 1.5*inch, 1*inch, 1*inch])
-        category_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ]))
+        category_table.setStyle(grid_table_style('#9b59b6', 10, 9))
         
         return [
             Paragraph("Top Spending Categories", self.styles['SectionHeader']),
@@ -226,13 +457,7 @@ class FinancialReportGenerator:
     
     def _build_transaction_details(self):
         """Build recent transactions table"""
-        from ..models import Transaction
-        
-        # Get recent transactions
-        transactions = Transaction.objects.filter(
-            user=self.user,
-            date__gte=self.start_date, date__lte=self.end_date
-        ).order_by('-date', '-created_at')[:20]
+        transactions = self.data.recent_transactions
         
         if not transactions:
             return [Paragraph("No transactions found for this period", 
@@ -251,17 +476,7 @@ class FinancialReportGenerator:
             ])
         
         trans_table = Table(table_data, colWidths=[1*inch, 0.8*inch, 1.2*inch, 1*inch, 2*inch])
-        trans_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ]))
+        trans_table.setStyle(grid_table_style('#34495e', 9, 8))
         
         return [
             Paragraph("Recent Transactions", self.styles['SectionHeader']),
@@ -270,9 +485,7 @@ class FinancialReportGenerator:
     
     def _build_budget_analysis(self):
         """Build budget performance analysis"""
-        from ..models import Budget, Transaction
-        
-        budgets = Budget.objects.filter(user=self.user)
+        budgets = self.data.budgets
         if not budgets:
             return [Paragraph("No budgets configured", self.styles['Normal'])]
         
@@ -280,13 +493,7 @@ class FinancialReportGenerator:
         table_data = [['Budget', 'Allocated', 'Spent', 'Remaining', 'Status']]
         
         for budget in budgets:
-            spent = Transaction.objects.filter(
-                user=self.user,
-                category=budget.category,
-                trans_type='expense',
-                date__gte=budget.start_date or self.start_date,
-                date__lte=budget.end_date or self.end_date
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            spent = budget.spent
             
             remaining = budget.amount - spent
             percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
@@ -309,17 +516,7 @@ class FinancialReportGenerator:
             ])
         
         budget_table = Table(table_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1.5*inch])
-        budget_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e67e22')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ]))
+        budget_table.setStyle(grid_table_style('#e67e22', 10, 9))
         
         return [
             Paragraph("Budget Analysis", self.styles['SectionHeader']),
@@ -328,9 +525,7 @@ class FinancialReportGenerator:
     
     def _build_goals_progress(self):
         """Build savings goals progress"""
-        from ..models import SavingsGoal
-        
-        goals = SavingsGoal.objects.filter(user=self.user, status='active')
+        goals = self.data.goals
         if not goals:
             return [Paragraph("No active savings goals", self.styles['Normal'])]
         
@@ -350,17 +545,7 @@ class FinancialReportGenerator:
             ])
         
         goals_table = Table(table_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1.5*inch])
-        goals_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ]))
+        goals_table.setStyle(grid_table_style('#27ae60', 10, 9))
         
         return [
             Paragraph("Savings Goals Progress", self.styles['SectionHeader']),
@@ -368,21 +553,154 @@ class FinancialReportGenerator:
         ]
 
 
-def generate_pdf_report(user, report_type='monthly', start_date=None, end_date=None):
-    """Generate PDF report and return HTTP response"""
-    generator = FinancialReportGenerator(user, start_date, end_date)
-    
+def report_period(start_date=None, end_date=None, report_type='monthly'):
+    """Fill in the period for a report type.
+
+    Monthly, quarterly and yearly reports cover the month, quarter or year
+    containing ``start_date`` (default: today), up to today for the
+    current one. Custom reports default to the current month to date.
+    """
+    today = timezone.now().date()
+    if report_type not in ('monthly', 'quarterly', 'yearly'):
+        return start_date or today.replace(day=1), end_date or today
+    anchor = start_date or today
     if report_type == 'monthly':
-        buffer = generator.generate_monthly_report()
-        filename = f"monthly_report_{generator.start_date.strftime('%Y_%m')}.pdf"
+        start_date = anchor.replace(day=1)
+        last_day = add_months(start_date, 1) - timedelta(days=1)
+    elif report_type == 'quarterly':
+        start_date = date(anchor.year, (anchor.month - 1) // 3 * 3 + 1, 1)
+        last_day = add_months(start_date, 3) - timedelta(days=1)
     else:
-        # Add other report types here
-        buffer = generator.generate_monthly_report()
-        filename = f"financial_report_{generator.start_date.strftime('%Y_%m_%d')}.pdf"
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    response.write(buffer.getvalue())
+        start_date = date(anchor.year, 1, 1)
+        last_day = date(anchor.year, 12, 31)
+    if not end_date:
+        end_date = min(last_day, today) if start_date <= today else last_day
+    return start_date, end_date
+
+
+def report_cache_path(user, report_type, start_date, end_date, version):
+    return f"reports/{user.pk}/{report_type}_{start_date:%Y%m%d}_{end_date:%Y%m%d}_{version}.pdf"
+
+
+def report_filename(report_type, start_date, end_date=None):
+    if report_type == 'monthly':
+        return f"monthly_report_{start_date.strftime('%Y_%m')}.pdf"
+    if report_type == 'quarterly':
+        return f"quarterly_report_{start_date.year}_Q{(start_date.month - 1) // 3 + 1}.pdf"
+    if report_type == 'yearly':
+        return f"yearly_report_{start_date.year}.pdf"
+    if end_date:
+        return f"financial_report_{start_date.strftime('%Y_%m_%d')}_to_{end_date.strftime('%Y_%m_%d')}.pdf"
+    return f"financial_report_{start_date.strftime('%Y_%m_%d')}.pdf"
+
+
+def report_location(user, report_type, start_date, end_date):
+    """Return ``(storage path, download filename)`` of the report for the user's current data.
+
+    Rendered PDFs are stored under a key made of the user, period, report
+    type and the user's DataVersion token, so any change to their data
+    produces a new path.
+    """
+    from ..models import DataVersion
+
+    version = DataVersion.current(user.pk)
+    return (report_cache_path(user, report_type, start_date, end_date, version),
+            report_filename(report_type, start_date, end_date))
+
+
+def find_cached_report(user, report_type='monthly', start_date=None, end_date=None):
+    """``(path, filename)`` when the current version is already rendered, else None"""
+    start_date, end_date = report_period(start_date, end_date, report_type)
+    path, filename = report_location(user, report_type, start_date, end_date)
+    return (path, filename) if default_storage.exists(path) else None
+
+
+def render_report(generator):
+    """Render a report to PDF bytes"""
+    buffer = generator.generate_report()
+    content = buffer.getvalue()
     buffer.close()
-    
-    return response
+    return content
+
+
+def get_or_render_report(user, report_type='monthly', start_date=None, end_date=None):
+    """Return ``(storage path, download filename)`` of the report, rendering it only when needed.
+
+    Rendering a new version removes older versions of the same report.
+    """
+    start_date, end_date = report_period(start_date, end_date, report_type)
+    path, filename = report_location(user, report_type, start_date, end_date)
+    if default_storage.exists(path):
+        return path, filename
+
+    content = render_report(FinancialReportGenerator(user, start_date, end_date, report_type=report_type))
+    return save_report(path, content), filename
+
+
+def save_report(path, content):
+    """Store rendered PDF bytes at ``path``, replacing older versions of the same report"""
+    # Older renders of this report differ only in the version suffix
+    prefix = os.path.basename(path).rsplit('_', 1)[0] + '_'
+    directory = os.path.dirname(path)
+    try:
+        stale = [name for name in default_storage.listdir(directory)[1] if name.startswith(prefix)]
+    except FileNotFoundError:
+        stale = []
+    for name in stale:
+        default_storage.delete(f"{directory}/{name}")
+    return default_storage.save(path, ContentFile(content))
+
+
+def report_file_response(path, filename):
+    """Serve a stored report without reading it into memory.
+
+    With REPORT_ACCEL_REDIRECT_PREFIX set, the response is empty and tells
+    nginx (X-Accel-Redirect) to send the file itself. Otherwise the file is
+    streamed with FileResponse, which gunicorn hands to sendfile() through
+    wsgi.file_wrapper when the storage is on local disk.
+    """
+    prefix = getattr(settings, 'REPORT_ACCEL_REDIRECT_PREFIX', '')
+    if prefix:
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    return FileResponse(default_storage.open(path, 'rb'), as_attachment=True, filename=filename,
+                        content_type='application/pdf')
+
+
+def generate_pdf_report(user, report_type='monthly', start_date=None, end_date=None):
+    """Generate PDF report and return HTTP response"""
+    path, filename = get_or_render_report(user, report_type, start_date, end_date)
+    return report_file_response(path, filename)
+
+
+def run_report_job(job_id):
+    """Render a queued ReportJob to file storage"""
+    from ..models import ReportJob
+
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+    if job.status not in ('pending', 'running'):
+        return f"Report job {job_id} already {job.status}"
+
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        path, filename = get_or_render_report(job.user, job.report_type, job.start_date, job.end_date)
+        size = default_storage.size(path)
+    except Exception as e:
+        job.status = 'failed'
+        job.message = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'finished_at'])
+        raise
+
+    job.status = 'completed'
+    job.file_path = path
+    job.filename = filename
+    job.file_size = size
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file_path', 'filename', 'file_size', 'finished_at'])
+    return f"Rendered {job.report_type} report for job {job_id}"
@@ -0,0 +1,180 @@
+"""Run the periodic tasks without Celery.
+
+``Scheduler`` reads the same schedule as Celery beat (expense_tracker.schedule)
+and runs due entries on a pool of SCHEDULER_WORKERS threads. At most
+SCHEDULER_TASK_CONCURRENCY runs of one task are in flight at a time; an entry
+that comes due while its task is at the limit waits for the next tick.
+
+Each run's duration and result are logged, and the tasks record their own
+TaskRun and metrics as they do under Celery. The time limit is the entry's
+``options['time_limit']``, otherwise SCHEDULER_TASK_TIMEOUT. In thread mode
+it is a soft limit that is only logged, since threads cannot be stopped. In
+process mode (``--processes``) each run gets its own process, which is
+terminated at the limit and recorded as a failed TaskRun.
+
+When each entry last ran is kept in SCHEDULER_STATE_FILE, so a restart does
+not run every daily task again straight away.
+"""
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import run_in_thread
+from .locks import record_run
+
+
+logger = logging.getLogger(__name__)
+
+
+class Entry:
+    """One schedule entry and when it is next due"""
+
+    def __init__(self, name, spec, last_run=None):
+        schedule = spec['schedule']
+        if isinstance(schedule, timedelta):
+            schedule = schedule.total_seconds()
+        if not isinstance(schedule, (int, float)):
+            raise ValueError(f"{name}: only interval schedules (seconds or timedelta) are supported")
+        self.name = name
+        self.task = spec['task']
+        self.interval = float(schedule)
+        self.args = tuple(spec.get('args', ()))
+        self.kwargs = dict(spec.get('kwargs', {}))
+        self.time_limit = spec.get('options', {}).get('time_limit') or settings.SCHEDULER_TASK_TIMEOUT
+        self.last_run = last_run
+
+    @property
+    def task_name(self):
+        return self.task.rsplit('.', 1)[-1]
+
+    def seconds_until_due(self, now):
+        if self.last_run is None:
+            return 0
+        return self.last_run + self.interval - now
+
+
+def run_task(task_path, args, kwargs):
+    """Run a task by dotted path; Celery tasks and LocalTasks both run in process when called"""
+    return import_string(task_path)(*args, **kwargs)
+
+
+def _run_in_child(task_path, args, kwargs):
+    import django
+
+    django.setup()
+    run_in_thread(run_task, task_path, args, kwargs)
+
+
+class Scheduler:
+    def __init__(self, schedule, workers=None, processes=False, state_file=None):
+        self.state_file = settings.SCHEDULER_STATE_FILE if state_file is None else state_file
+        state = self.load_state()
+        self.entries = [Entry(name, spec, state.get(name)) for name, spec in schedule.items()]
+        self.workers = workers or settings.SCHEDULER_WORKERS
+        self.processes = processes
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tracker-scheduler')
+        self.lock = threading.Lock()
+        self.running = defaultdict(int)  # task name -> runs in flight
+        self.stopped = threading.Event()
+
+    def load_state(self):
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        state = {entry.name: entry.last_run for entry in self.entries if entry.last_run is not None}
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump(state, f)
+        except OSError:
+            logger.warning("Could not save scheduler state to %s", self.state_file, exc_info=True)
+
+    def tick(self, now=None):
+        """Start every due entry whose task has a free slot; return seconds until the next is due"""
+        now = time.time() if now is None else now
+        started = False
+        for entry in self.entries:
+            if entry.seconds_until_due(now) > 0:
+                continue
+            with self.lock:
+                if self.running[entry.task_name] >= settings.SCHEDULER_TASK_CONCURRENCY:
+                    continue
+                self.running[entry.task_name] += 1
+            entry.last_run = now
+            started = True
+            self.executor.submit(self.run_entry, entry)
+        if started:
+            self.save_state()
+        # Entries waiting for a free slot are due now; check again in a second
+        return max(1, min(entry.seconds_until_due(now) for entry in self.entries)) if self.entries else 60
+
+    def run_entry(self, entry):
+        started_at, start = timezone.now(), time.perf_counter()
+        try:
+            if self.processes:
+                outcome = self.run_in_process(entry)
+            else:
+                outcome = self.run_in_thread(entry)
+            duration = time.perf_counter() - start
+            if outcome == 'timeout':
+                logger.error("%s was stopped after its %ss time limit", entry.name, entry.time_limit)
+                # A killed run could not record itself; its lock lapses with the lease
+                record_run(entry.task_name, 'failure', started_at, start,
+                           message=f"Stopped after {entry.time_limit}s by the scheduler ({entry.name})")
+            elif duration > entry.time_limit:
+                logger.warning("%s took %.2fs, past its %ss time limit: %s", entry.name, duration,
+                               entry.time_limit, outcome)
+            else:
+                logger.info("%s finished in %.2fs: %s", entry.name, duration, outcome)
+        finally:
+            with self.lock:
+                self.running[entry.task_name] -= 1
+
+    def run_in_thread(self, entry):
+        try:
+            return run_in_thread(run_task, entry.task, entry.args, entry.kwargs)
+        except Exception as e:
+            return f"failed: {type(e).__name__}: {e}"
+
+    def run_in_process(self, entry):
+        process = multiprocessing.get_context('spawn').Process(
+            target=_run_in_child, args=(entry.task, entry.args, entry.kwargs), name=f"task-{entry.name}",
+        )
+        process.start()
+        process.join(entry.time_limit)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+            return 'timeout'
+        return 'done' if process.exitcode == 0 else f"failed with exit code {process.exitcode}"
+
+    def run_forever(self):
+        while not self.stopped.is_set():
+            self.stopped.wait(min(self.tick(), 60))
+
+    def run_once(self):
+        """Start everything that is due and wait for it to finish"""
+        self.tick()
+        self.shutdown()
+
+    def stop(self):
+        self.stopped.set()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
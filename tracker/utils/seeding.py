@@ -0,0 +1,253 @@
+"""Synthetic data for benchmarks and query-budget checks.
+
+``seed_users`` bulk-creates users with accounts, budgets, bills, goals,
+recurring rules, templates, notifications and years of transactions. Amounts follow
+per-category log-normal distributions, with a monthly salary, a weekend
+bump in spending and a small share of split transactions, so aggregates
+look like real data. A fixed seed always produces the same dataset.
+"""
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+
+from .dedup import transaction_fingerprint
+
+
+# name -> (share of expenses, median amount, log-normal sigma)
+EXPENSE_PROFILE = {
+    'Food & Dining': (0.30, 18, 0.6),
+    'Transportation': (0.15, 25, 0.7),
+    'Shopping': (0.15, 45, 0.9),
+    'Entertainment': (0.08, 30, 0.7),
+    'Bills & Utilities': (0.08, 90, 0.4),
+    'Healthcare': (0.05, 60, 0.9),
+    'Education': (0.03, 120, 0.8),
+    'Travel': (0.03, 250, 0.9),
+    'Home & Garden': (0.05, 70, 0.9),
+    'Personal Care': (0.05, 25, 0.5),
+    'Gifts & Donations': (0.03, 50, 0.7),
+}
+INCOME_CATEGORIES = ('Salary', 'Freelance', 'Investment Returns', 'Refund')
+MERCHANTS = {
+    'Food & Dining': ('Corner Cafe', 'Green Grocer', 'Pizza Palace', 'Sushi Bar', 'Bakery'),
+    'Transportation': ('City Metro', 'Fuel Station', 'Ride Share', 'Parking'),
+    'Shopping': ('Online Store', 'Department Store', 'Electronics Hub', 'Bookshop'),
+    'Entertainment': ('Cinema', 'Streaming Service', 'Concert Hall', 'Game Store'),
+    'Bills & Utilities': ('Power Company', 'Water Utility', 'Internet Provider', 'Mobile Carrier'),
+    'Healthcare': ('Pharmacy', 'Clinic', 'Dentist'),
+    'Education': ('Online Course', 'Textbooks', 'Tuition'),
+    'Travel': ('Airline', 'Hotel', 'Car Rental'),
+    'Home & Garden': ('Hardware Store', 'Garden Centre', 'Furniture Shop'),
+    'Personal Care': ('Barber', 'Spa', 'Cosmetics'),
+    'Gifts & Donations': ('Charity', 'Gift Shop', 'Florist'),
+}
+ACCOUNT_TEMPLATES = (
+    ('Checking Account', 'bank', 2500),
+    ('Savings Account', 'bank', 8000),
+    ('Credit Card', 'card', -400),
+    ('Cash Wallet', 'cash', 150),
+    ('M-Pesa', 'mobile', 80),
+)
+BILL_TEMPLATES = (
+    ('Rent', 1200), ('Electricity', 85), ('Internet', 60), ('Phone', 40),
+    ('Insurance', 150), ('Gym', 35), ('Streaming', 15), ('Water', 30),
+)
+GOAL_TEMPLATES = (
+    ('Emergency Fund', 10000), ('Vacation', 3000), ('New Laptop', 1800),
+    ('Car Down Payment', 6000), ('Wedding', 15000),
+)
+
+
+def money(value):
+    return Decimal(str(round(value, 2)))
+
+
+def month_start(day, months_back):
+    month = day.month - 1 - months_back
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def ensure_categories():
+    """Create the seeded category names that do not exist yet; return {name: Category}"""
+    from ..models import Category
+
+    names = list(EXPENSE_PROFILE) + list(INCOME_CATEGORIES)
+    existing = {}
+    for category in Category.objects.filter(name__in=names).order_by('pk'):
+        existing.setdefault(category.name, category)
+    missing = [Category(name=name) for name in names if name not in existing]
+    if missing:
+        Category.objects.bulk_create(missing)
+        for category in Category.objects.filter(name__in=[c.name for c in missing]).order_by('pk'):
+            existing.setdefault(category.name, category)
+    return existing
+
+
+def seed_users(users=10, years=2, accounts=4, transactions_per_month=60, budgets=6, bills=5,
+               goals=3, recurring=4, templates=3, split_ratio=0.05, notifications=20, prefix='bench',
+               password='benchpass', seed=42, start_index=0, today=None, log=None):
+    """Create ``users`` synthetic users and return them.
+
+    Users are named ``<prefix>_user_<n>`` starting at ``start_index`` so
+    repeated calls can grow an existing dataset.
+    """
+    rng = random.Random(f"{seed}:{start_index}")
+    today = today or date.today()
+    categories = ensure_categories()
+    # Hash the password once; hashing per user would dominate seeding time
+    template = User()
+    template.set_password(password)
+    password_hash = template.password
+
+    created = []
+    for index in range(start_index, start_index + users):
+        with db_transaction.atomic():
+            user = _seed_user(rng, f"{prefix}_user_{index}", password_hash, categories, today,
+                              years, accounts, transactions_per_month, budgets, bills, goals,
+                              recurring, templates, split_ratio, notifications)
+        created.append(user)
+        if log:
+            log(f"Seeded {user.username}")
+    return created
+
+
+def _seed_user(rng, username, password_hash, categories, today, years, account_count,
+               transactions_per_month, budget_count, bill_count, goal_count, recurring_count,
+               template_count, split_ratio, notification_count):
+    from ..models import (
+        Account, Bill, Budget, GoalContribution, Notification, Profile, RecurringTransaction,
+        SavingsGoal, Transaction, TransactionSplit, TransactionTemplate, UserPreferences,
+    )
+
+    user = User.objects.create(username=username, email=f"{username}@example.com", password=password_hash)
+    Profile.objects.create(user=user)
+    UserPreferences.objects.create(user=user)
+
+    accounts = Account.objects.bulk_create([
+        Account(user=user, name=name, account_type=account_type, balance=money(opening))
+        for name, account_type, opening in ACCOUNT_TEMPLATES[:max(1, min(account_count, len(ACCOUNT_TEMPLATES)))]
+    ])
+    opening_balances = {account.pk: account.balance for account in accounts}
+    spending_accounts = [a for a in accounts if a.account_type != 'bank' or a.name == 'Checking Account']
+    salary = money(rng.uniform(2500, 7000))
+
+    expense_names = list(EXPENSE_PROFILE)
+    expense_weights = [EXPENSE_PROFILE[name][0] for name in expense_names]
+    start = month_start(today, years * 12 - 1)
+
+    transactions = []
+    current = start
+    while current <= today:
+        next_month = month_start(current, -1)
+        days = [current + timedelta(days=i) for i in range((min(next_month - timedelta(days=1), today) - current).days + 1)]
+        # Weekend days are twice as likely to see spending
+        day_weights = [2 if d.weekday() >= 5 else 1 for d in days]
+        count = max(1, int(rng.gauss(transactions_per_month, transactions_per_month * 0.15)))
+        for trans_date in rng.choices(days, weights=day_weights, k=count):
+            name = rng.choices(expense_names, weights=expense_weights)[0]
+            _, median, sigma = EXPENSE_PROFILE[name]
+            amount = money(min(rng.lognormvariate(math.log(median), sigma), median * 40))
+            transactions.append(Transaction(
+                user=user, amount=max(amount, Decimal('0.50')), category=categories[name],
+                account=rng.choice(spending_accounts), trans_type='expense', date=trans_date,
+                description=rng.choice(MERCHANTS[name]), tags=rng.choice(('', '', 'work', 'family', 'online')),
+            ))
+        payday = date(current.year, current.month, 25)
+        if payday <= today:
+            transactions.append(Transaction(
+                user=user, amount=salary, category=categories['Salary'], account=accounts[0],
+                trans_type='income', date=payday, description='Monthly salary',
+            ))
+        if rng.random() < 0.3:
+            name = rng.choice(INCOME_CATEGORIES[1:])
+            transactions.append(Transaction(
+                user=user, amount=money(rng.uniform(50, 900)), category=categories[name],
+                account=accounts[0], trans_type='income', date=rng.choice(days), description=name,
+            ))
+        if len(accounts) > 1 and rng.random() < 0.5:
+            transactions.append(Transaction(
+                user=user, amount=money(rng.uniform(100, 600)), account=accounts[0],
+                transfer_account=accounts[1], trans_type='transfer', date=rng.choice(days),
+                description='Savings transfer',
+            ))
+        current = next_month
+
+    for t in transactions:
+        t.fingerprint = transaction_fingerprint(t.date, t.amount, t.description)
+    transactions = Transaction.objects.bulk_create(transactions, batch_size=2000)
+
+    deltas = {}
+    for t in transactions:
+        for account_id, delta in t.balance_deltas().items():
+            deltas[account_id] = deltas.get(account_id, Decimal('0')) + delta
+    for account in accounts:
+        account.balance = opening_balances[account.pk] + deltas.get(account.pk, Decimal('0'))
+    Account.objects.bulk_update(accounts, ['balance'])
+
+    splits = []
+    for t in transactions:
+        if t.trans_type == 'expense' and t.amount >= 20 and rng.random() < split_ratio:
+            first = money(float(t.amount) * rng.uniform(0.3, 0.7))
+            other = categories[rng.choice(expense_names)]
+            splits.append(TransactionSplit(transaction=t, category=t.category, amount=first))
+            splits.append(TransactionSplit(transaction=t, category=other, amount=t.amount - first))
+    TransactionSplit.objects.bulk_create(splits, batch_size=2000)
+
+    this_month = today.replace(day=1)
+    month_end = month_start(today, -1) - timedelta(days=1)
+    Budget.objects.bulk_create([
+        Budget(user=user, name=f"{name} budget", category=categories[name],
+               amount=money(EXPENSE_PROFILE[name][1] * transactions_per_month * EXPENSE_PROFILE[name][0] * rng.uniform(0.8, 1.4)),
+               start_date=this_month, end_date=month_end)
+        for name in expense_names[:budget_count]
+    ])
+
+    Bill.objects.bulk_create([
+        Bill(user=user, name=name, amount=money(amount * rng.uniform(0.9, 1.1)),
+             category=categories['Bills & Utilities'], account=accounts[0],
+             due_date=today + timedelta(days=rng.randint(-3, 25)), reminder_days=rng.choice((3, 5, 7)))
+        for name, amount in BILL_TEMPLATES[:bill_count]
+    ])
+
+    goals = SavingsGoal.objects.bulk_create([
+        SavingsGoal(user=user, name=name, target_amount=money(target), current_amount=Decimal('0'),
+                    target_date=today + timedelta(days=rng.randint(90, 720)))
+        for name, target in GOAL_TEMPLATES[:goal_count]
+    ])
+    contributions = []
+    for goal in goals:
+        total = Decimal('0')
+        for months_back in range(rng.randint(2, 12)):
+            amount = money(float(goal.target_amount) * rng.uniform(0.02, 0.08))
+            contributions.append(GoalContribution(goal=goal, amount=amount,
+                                                  date=month_start(today, months_back) + timedelta(days=4)))
+            total += amount
+        goal.current_amount = total
+    GoalContribution.objects.bulk_create(contributions)
+    SavingsGoal.objects.bulk_update(goals, ['current_amount'])
+
+    RecurringTransaction.objects.bulk_create([
+        RecurringTransaction(user=user, amount=money(amount), category=categories['Bills & Utilities'],
+                             account=accounts[0], trans_type='expense', description=name,
+                             frequency='monthly', next_date=today + timedelta(days=rng.randint(1, 28)))
+        for name, amount in BILL_TEMPLATES[:recurring_count]
+    ])
+
+    TransactionTemplate.objects.bulk_create([
+        TransactionTemplate(user=user, name=f"{name} template", amount=money(EXPENSE_PROFILE[name][1]),
+                            category=categories[name], account=rng.choice(spending_accounts),
+                            description=rng.choice(MERCHANTS[name]), use_count=rng.randint(0, 30))
+        for name in expense_names[:template_count]
+    ])
+
+    notification_types = ('budget_alert', 'bill_reminder', 'goal_milestone', 'unusual_spending')
+    Notification.create_many([
+        Notification(user=user, title=f"Notification {i}", message='Synthetic notification',
+                     notification_type=rng.choice(notification_types), is_read=rng.random() < 0.6)
+        for i in range(notification_count)
+    ])
+    return user
@@ -0,0 +1,144 @@
+"""Fan-out of per-user periodic tasks over ranges of user ids.
+
+A task decorated with ``sharded`` and called without a shard splits the
+user id space into up to TASK_SHARDS ranges of roughly equal user counts
+(one per TASK_SHARD_MIN_USERS users) and runs itself once per range. Under
+Celery the shards go out as a group whose start times are spread across
+TASK_SHARD_WINDOW_SECONDS plus random jitter, so extra workers share the
+work and the database sees a steady load instead of a spike. With a result
+backend the group is a chord, and ``merge_results`` sums the shards' result
+strings into one summary. Without a broker the shards run one after another
+in the calling process.
+
+A shard is passed to the task as ``[index, count]``, which names it stably
+for its lock. The task turns it into a ``[low, high]`` pk range only once it
+holds that lock, from the users there are then. ``None`` leaves an end open
+so users created after the split still fall into the first or last shard.
+"""
+import functools
+import math
+import random
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# Counts in task results; digits inside words such as "1st" are left alone
+NUMBER = re.compile(r'(?<!\w)\d+(?!\w)')
+
+
+def shard_count(shard_count=None, min_users=None):
+    """How many shards to split the users into: up to TASK_SHARDS, one per TASK_SHARD_MIN_USERS users"""
+    from django.contrib.auth.models import User
+
+    shard_count = shard_count or settings.TASK_SHARDS
+    min_users = min_users or settings.TASK_SHARD_MIN_USERS
+    return max(1, min(shard_count, math.ceil(User.objects.count() / min_users)))
+
+
+def shard_bounds(index, count):
+    """The ``[low, high]`` user id range of shard ``index`` of ``count``, each with about the same number of users"""
+    from django.contrib.auth.models import User
+
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    total = user_ids.count()
+
+    def id_at(position):
+        # One indexed OFFSET lookup per end rather than loading every id
+        found = list(user_ids[position:position + 1])
+        if found:
+            return found[0]
+        # Past the last user (users deleted since the split): an id no user has, leaving the shard empty
+        last = user_ids.last()
+        return last + 1 if last is not None else 1
+
+    low = None if index == 0 else id_at(index * total // count)
+    high = None if index == count - 1 else id_at((index + 1) * total // count) - 1
+    return [low, high]
+
+
+def shard_q(shard, field='user_id'):
+    """Filter for the rows of users in ``shard``; matches everything when there is no shard"""
+    q = Q()
+    if shard:
+        low, high = shard
+        if low is not None:
+            q &= Q(**{f"{field}__gte": low})
+        if high is not None:
+            q &= Q(**{f"{field}__lte": high})
+    return q
+
+
+def shard_offsets(count, window=None, jitter=None):
+    """Seconds to delay each shard: evenly spaced over the window, plus jitter"""
+    window = settings.TASK_SHARD_WINDOW_SECONDS if window is None else window
+    jitter = settings.TASK_SHARD_JITTER_SECONDS if jitter is None else jitter
+    return [round(i * window / count + random.uniform(0, jitter), 1) for i in range(count)]
+
+
+def merge_results(results):
+    """Combine shard result strings that differ only in their numbers by summing the numbers.
+
+    ``["Created 3 budget alerts", "Created 5 budget alerts"]`` becomes
+    ``"Created 8 budget alerts"``; results that do not line up are listed.
+    """
+    merged = {}
+    for result in results:
+        text = str(result)
+        shape = NUMBER.sub('\0', text)
+        numbers = [int(n) for n in NUMBER.findall(text)]
+        if shape in merged:
+            merged[shape] = [a + b for a, b in zip(merged[shape], numbers)]
+        else:
+            merged[shape] = numbers
+    parts = []
+    for shape, numbers in merged.items():
+        values = iter(numbers)
+        parts.append(re.sub('\0', lambda _: str(next(values)), shape))
+    return '; '.join(parts)
+
+
+def fan_out(task_name, args, kwargs, count):
+    """Run task ``task_name`` once per shard; return a summary for the coordinating run"""
+    shards = [[index, count] for index in range(count)]
+    from .jobs import celery_enabled
+
+    if not celery_enabled():
+        from .. import tasks
+
+        task = getattr(tasks, task_name)
+        results = [task(*args, **dict(kwargs, shard=shard)) for shard in shards]
+        return f"{merge_results(results)} ({len(shards)} shards)"
+
+    from celery import chord, group, signature
+    from expense_tracker.celery import app
+
+    header = group(
+        signature(f"tracker.tasks.{task_name}", args=args, kwargs=dict(kwargs, shard=shard), countdown=offset)
+        for shard, offset in zip(shards, shard_offsets(len(shards)))
+    )
+    if app.conf.result_backend:
+        chord(header)(signature('tracker.tasks.merge_shard_results', kwargs={'task_name': task_name}))
+    else:
+        # Chords need a result backend; each shard still records its own TaskRun
+        header.apply_async()
+    return f"Dispatched {task_name} in {len(shards)} shards"
+
+
+def sharded(func):
+    """Let a task that takes ``shard=None`` fan itself out when called without one.
+
+    Goes below ``single_instance``: the task receives its shard as a pk range.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, shard=None, **kwargs):
+        if shard is not None:
+            # Under single_instance, so the range is worked out while holding the shard's lock
+            return func(*args, shard=shard_bounds(*shard), **kwargs)
+        if settings.TASK_SHARDS > 1:
+            count = shard_count()
+            if count > 1:
+                return fan_out(func.__name__, args, kwargs, count)
+        return func(*args, **kwargs)
+    return wrapper
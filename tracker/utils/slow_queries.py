@@ -0,0 +1,164 @@
+"""Slow-query log with EXPLAIN capture.
+
+``SlowQueryLogger`` is installed as an execute wrapper on every database
+connection (see ``install``). Queries slower than SLOW_QUERY_THRESHOLD_MS
+are logged to ``tracker.queries`` and upserted into ``SlowQuery`` by SQL
+fingerprint, together with the view or task that ran them and the plan
+from ``EXPLAIN`` (PostgreSQL, optionally with ANALYZE) or
+``EXPLAIN QUERY PLAN`` (SQLite). Plans are refreshed at most once per
+SLOW_QUERY_EXPLAIN_INTERVAL per fingerprint.
+"""
+import datetime
+import decimal
+import hashlib
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .instrumentation import current_source, find_call_site, fingerprint_sql
+
+
+logger = logging.getLogger('tracker.queries')
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+}
+EXPLAINABLE = ('SELECT', 'WITH')
+# SQLite receives dates as strings; keep those like other dates
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T][\d:.+-]+)?$')
+THIS_FILE = str(Path(__file__).resolve())
+
+
+def redact_param(value):
+    """Keep values that help reproduce a plan (dates, booleans, NULL) and mask the rest"""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return f"<{type(value).__name__}>"
+    if isinstance(value, (list, tuple)):
+        return [redact_param(item) for item in value]
+    if isinstance(value, str):
+        return value if ISO_DATE.match(value) else f"<str len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def serialize_params(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        params = list(params.values())
+    if not getattr(settings, 'SLOW_QUERY_REDACT_PARAMS', True):
+        return [value if isinstance(value, (int, float, str, bool, type(None))) else str(value) for value in params]
+    return [redact_param(value) for value in params]
+
+
+def explain(connection, sql, params):
+    """Return ``(plan text, analyzed)`` for a SELECT, or ``('', False)`` when it can't be explained"""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return '', False
+    analyze = connection.vendor == 'postgresql' and getattr(settings, 'SLOW_QUERY_EXPLAIN_ANALYZE', False)
+    if analyze:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parent
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return '\n'.join(lines), False
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows), analyze
+
+
+class SlowQueryLogger:
+    """Execute wrapper that records queries slower than the configured threshold"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS and not many and not getattr(self.local, 'busy', False):
+            # Queries run while recording (EXPLAIN, the upsert) must not be recorded themselves
+            self.local.busy = True
+            try:
+                self.record(context['connection'], sql, params, duration_ms)
+            except Exception as e:  # e.g. the table does not exist yet while migrating
+                logger.warning("Could not record slow query: %s", e)
+            finally:
+                self.local.busy = False
+        return result
+
+    def record(self, connection, sql, params, duration_ms):
+        from ..models import SlowQuery
+
+        fingerprint = fingerprint_sql(sql)
+        source = current_source.get() or ''
+        call_site = find_call_site(ignore=(THIS_FILE,))
+        logger.warning("Slow query (%.1f ms) in %s at %s: %s", duration_ms, source or 'unknown',
+                       call_site, fingerprint[:300])
+
+        fingerprint_hash = hashlib.sha1(fingerprint.encode()).hexdigest()
+        now = timezone.now()
+        fields = {
+            'sql': sql[:10000],
+            'params': serialize_params(params),
+            'source': source[:200],
+            'call_site': call_site[:300],
+            'last_time_ms': round(duration_ms, 2),
+            'last_seen': now,
+        }
+        # A savepoint keeps a failed write from breaking the caller's transaction
+        with transaction.atomic(using=connection.alias):
+            existing = SlowQuery.objects.using(connection.alias).filter(
+                fingerprint_hash=fingerprint_hash
+            ).values('pk', 'explained_at').first()
+            refresh_after = datetime.timedelta(seconds=settings.SLOW_QUERY_EXPLAIN_INTERVAL)
+            if existing is None or existing['explained_at'] is None or existing['explained_at'] < now - refresh_after:
+                try:
+                    with transaction.atomic(using=connection.alias):
+                        plan, analyzed = explain(connection, sql, params)
+                    fields.update(explain=plan, explain_analyzed=analyzed, explained_at=now)
+                except DatabaseError as e:
+                    fields.update(explain=f"EXPLAIN failed: {e}", explain_analyzed=False, explained_at=now)
+            if existing is None:
+                SlowQuery.objects.using(connection.alias).create(
+                    fingerprint_hash=fingerprint_hash, fingerprint=fingerprint, vendor=connection.vendor,
+                    count=1, total_time_ms=fields['last_time_ms'], max_time_ms=fields['last_time_ms'], **fields
+                )
+            else:
+                SlowQuery.objects.using(connection.alias).filter(pk=existing['pk']).update(
+                    count=F('count') + 1,
+                    total_time_ms=F('total_time_ms') + fields['last_time_ms'],
+                    max_time_ms=Greatest(F('max_time_ms'), fields['last_time_ms']),
+                    **fields
+                )
+
+
+slow_query_logger = SlowQueryLogger()
+
+
+def install(sender=None, connection=None, **kwargs):
+    """connection_created receiver: add the slow-query wrapper to a connection once"""
+    if getattr(settings, 'SLOW_QUERY_ENABLED', True) and slow_query_logger not in connection.execute_wrappers:
+        # Innermost, and at the front so execute_wrapper() blocks that are open
+        # while the connection is created still pop their own wrapper
+        connection.execute_wrappers.insert(0, slow_query_logger)
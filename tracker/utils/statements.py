@@ -0,0 +1,195 @@
+"""Streaming parsers for OFX/QFX and QIF bank statements.
+
+Both parsers read the file incrementally and yield ``(position, record)``
+pairs in the same shape as ``importers.read_csv_rows`` so statements go
+through the same batched import path. Records additionally carry
+``account_ref`` (the bank account id or QIF account name), ``account_type``
+and, for OFX, the bank's ``fitid``.
+"""
+import html
+import re
+from datetime import date, datetime
+from io import TextIOWrapper
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+OFX_ACCOUNT_AGGREGATES = {'BANKACCTFROM': 'bank', 'CCACCTFROM': 'card'}
+OFX_TRANSACTION_FIELDS = {'TRNTYPE', 'DTPOSTED', 'DTUSER', 'TRNAMT', 'FITID', 'NAME', 'PAYEE', 'MEMO', 'CHECKNUM'}
+
+QIF_SECTIONS = {'bank': 'bank', 'cash': 'cash', 'ccard': 'card', 'oth a': 'bank', 'oth l': 'bank'}
+QIF_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d.%m.%Y')
+
+
+def iter_ofx_tokens(text, chunk_size=64 * 1024):
+    """Yield (is_closing, TAG, value) tokens from an OFX text stream.
+
+    Works for both the SGML (OFX 1.x, unclosed leaf elements) and XML
+    (OFX 2.x) variants. Only one chunk plus a partial tag is held in memory.
+    """
+    buffer = ''
+    while True:
+        chunk = text.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        # Only tokenize up to the last '<' so a tag split across chunks is kept whole
+        cut = buffer.rfind('<')
+        if cut <= 0:
+            continue
+        for match in OFX_TAG.finditer(buffer, 0, cut):
+            yield match.group(1) == '/', match.group(2).upper(), html.unescape(match.group(3).strip())
+        buffer = buffer[cut:]
+    for match in OFX_TAG.finditer(buffer):
+        yield match.group(1) == '/', match.group(2).upper(), html.unescape(match.group(3).strip())
+
+
+def parse_ofx_date(value):
+    """Parse an OFX datetime such as 20240131120000.000[-5:EST]"""
+    try:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    except (TypeError, ValueError):
+        return value
+
+
+def _ofx_record(fields, account):
+    amount = (fields.get('TRNAMT') or '').replace(' ', '')
+    if ',' in amount and '.' not in amount:
+        amount = amount.replace(',', '.')
+    negative = amount.startswith('-')
+    name = fields.get('NAME') or fields.get('PAYEE') or ''
+    memo = fields.get('MEMO') or ''
+    description = f"{name} - {memo}" if name and memo and memo != name else (name or memo)
+    return {
+        'date': parse_ofx_date(fields.get('DTPOSTED') or fields.get('DTUSER') or ''),
+        'amount': amount.lstrip('+-'),
+        'type': 'expense' if negative else 'income',
+        'description': description,
+        'category': '',
+        'account': '',
+        'tags': '',
+        'account_ref': account.get('ACCTID', ''),
+        'account_type': account.get('type', 'bank'),
+        'fitid': fields.get('FITID', ''),
+    }
+
+
+def read_ofx_rows(fileobj, encoding='utf-8'):
+    """Stream (position, record) pairs from an OFX/QFX statement"""
+    text = TextIOWrapper(fileobj, encoding=encoding, errors='replace')
+    account = {}
+    account_aggregate = None
+    current = None
+    position = 0
+    try:
+        for closing, tag, value in iter_ofx_tokens(text):
+            if closing:
+                if tag == 'STMTTRN' and current is not None:
+                    position += 1
+                    yield position, _ofx_record(current, account)
+                    current = None
+                elif tag == account_aggregate:
+                    account_aggregate = None
+                continue
+
+            if tag == 'STMTTRN':
+                # SGML files may omit </STMTTRN>; a new opening tag ends the previous one
+                if current is not None:
+                    position += 1
+                    yield position, _ofx_record(current, account)
+                current = {}
+            elif tag in OFX_ACCOUNT_AGGREGATES:
+                account_aggregate = tag
+                account = {'type': OFX_ACCOUNT_AGGREGATES[tag]}
+            elif current is not None and tag in OFX_TRANSACTION_FIELDS:
+                current[tag] = value
+            elif account_aggregate and tag in ('BANKID', 'ACCTID', 'ACCTTYPE'):
+                account[tag] = value
+            elif tag in ('BANKTRANLIST', 'STMTRS', 'CCSTMTRS') and current is not None:
+                position += 1
+                yield position, _ofx_record(current, account)
+                current = None
+        if current is not None:
+            position += 1
+            yield position, _ofx_record(current, account)
+    finally:
+        text.detach()
+
+
+def parse_qif_date(value):
+    """Parse QIF dates such as 1/31/2024, 1/31'24 or 31.01.2024"""
+    value = value.replace("'", '/').replace(' ', '')
+    for fmt in QIF_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return value
+
+
+def _qif_record(fields, account_name, account_type):
+    amount = (fields.get('T') or fields.get('U') or '').replace(',', '')
+    negative = amount.startswith('-')
+    category = fields.get('L', '')
+    if category.startswith('['):
+        # [Account] categories are transfers between QIF accounts
+        category = ''
+    payee = fields.get('P', '')
+    memo = fields.get('M', '')
+    return {
+        'date': parse_qif_date(fields.get('D', '')),
+        'amount': amount.lstrip('+-'),
+        'type': 'expense' if negative else 'income',
+        'description': f"{payee} - {memo}" if payee and memo else (payee or memo),
+        'category': category,
+        'account': '',
+        'tags': '',
+        'account_ref': account_name,
+        'account_type': account_type,
+        'fitid': '',
+    }
+
+
+def read_qif_rows(fileobj, encoding='utf-8'):
+    """Stream (line_number, record) pairs from a QIF export"""
+    text = TextIOWrapper(fileobj, encoding=encoding, errors='replace')
+    account_name = ''
+    account_type = 'bank'
+    section = None
+    in_account_header = False
+    fields = {}
+    start_line = 0
+    try:
+        for line_number, line in enumerate(text, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            if line.startswith('!'):
+                header = line[1:].strip().lower()
+                if header == 'account':
+                    in_account_header = True
+                elif header.startswith('type:'):
+                    in_account_header = False
+                    section = header[5:].strip()
+                    account_type = QIF_SECTIONS.get(section, account_type)
+                continue
+
+            code, value = line[0], line[1:].strip()
+            if in_account_header:
+                if code == 'N':
+                    account_name = value
+                elif code == '^':
+                    in_account_header = False
+                continue
+            if code == '^':
+                if fields and section in QIF_SECTIONS:
+                    yield start_line, _qif_record(fields, account_name, account_type)
+                fields = {}
+                continue
+            if not fields:
+                start_line = line_number
+            # Split lines (S/E/$) repeat; keep the first value of each code
+            fields.setdefault(code, value)
+        if fields and section in QIF_SECTIONS:
+            yield start_line, _qif_record(fields, account_name, account_type)
+    finally:
+        text.detach()
@@ -0,0 +1,115 @@
+"""Load the independent sections of a page concurrently.
+
+The async views pass ``load_widgets`` a dict of sections, each a function
+of its own arguments that runs its queries and returns plain data. They run
+at the same time on a shared pool of WIDGET_WORKERS threads, so a page takes
+about as long as its slowest section rather than the sum of all of them
+(Django's async ORM would run them one after another on a single thread).
+A section that fails or takes longer than WIDGET_TIMEOUT_SECONDS gets its
+fallback value and is reported as degraded so the template can say so.
+
+Each pool thread keeps its own database connection, closed or kept between
+sections by the usual CONN_MAX_AGE rules. Sections see the request's
+context variables (read replica, query attribution) and its query
+recorders. Inside a transaction, as in tests, the sections run one after
+another on the request's connection so they see its uncommitted rows.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.WIDGET_WORKERS, thread_name_prefix='widget')
+        return _pool
+
+
+def request_wrappers():
+    """The execute wrappers installed on this thread's connections, per alias"""
+    return {alias: list(connections[alias].execute_wrappers) for alias in connections}
+
+
+def run_widget(wrappers, func, args):
+    """Run one section on a pool thread with the request's query wrappers on its connections"""
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for alias, alias_wrappers in wrappers.items():
+                connection = connections[alias]
+                for wrapper in alias_wrappers:
+                    # The slow-query log is installed on every connection already
+                    if wrapper not in connection.execute_wrappers:
+                        stack.enter_context(connection.execute_wrapper(wrapper))
+            return func(*args)
+    finally:
+        close_old_connections()
+
+
+def run_inline(widgets):
+    """Run the sections in order on the request's connection; same result shape as ``load_widgets``"""
+    results, degraded = {}, set()
+    for name, (func, args, fallback) in widgets.items():
+        try:
+            results[name] = func(*args)
+        except Exception:
+            logger.exception("Widget %s failed", name)
+            results[name] = fallback
+            degraded.add(name)
+    return results, degraded
+
+
+async def load_widgets(widgets, timeout=None):
+    """Run ``{name: (func, args, fallback)}`` concurrently; return ``(results, degraded names)``"""
+    timeout = settings.WIDGET_TIMEOUT_SECONDS if timeout is None else timeout
+    in_transaction = await sync_to_async(lambda: connections[DEFAULT_DB_ALIAS].in_atomic_block)()
+    if in_transaction or settings.WIDGET_WORKERS < 2:
+        return await sync_to_async(run_inline)(widgets)
+
+    wrappers = await sync_to_async(request_wrappers)()
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+
+    async def load(name, func, args, fallback):
+        # copy_context per section: each keeps its own changes to the request's variables
+        future = loop.run_in_executor(pool, copy_context().run, run_widget, wrappers, func, args)
+        try:
+            return await asyncio.wait_for(future, timeout), False
+        except asyncio.TimeoutError:
+            # The thread cannot be stopped; it finishes in the background and its result is dropped
+            logger.warning("Widget %s took longer than %.1fs; showing it as unavailable", name, timeout)
+        except Exception:
+            logger.exception("Widget %s failed", name)
+        return fallback, True
+
+    names = list(widgets)
+    loaded = await asyncio.gather(*(load(name, *widgets[name]) for name in names))
+    results = {name: value for name, (value, _) in zip(names, loaded)}
+    return results, {name for name, (_, failed) in zip(names, loaded) if failed}
+
+
+def async_login_required(view):
+    """``login_required`` for async views, which Django 4.2's decorator does not support"""
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            from django.contrib.auth.views import redirect_to_login
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapped
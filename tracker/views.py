@@ -1,16 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.conf import settings
 from .forms import (SignUpForm, ProfileForm, TransactionForm, CSVUploadForm, BudgetForm, 
                    RecurringTransactionForm, TransactionSplitForm, TransactionTemplateForm,
                    SavingsGoalForm, GoalContributionForm, BillForm, AdvancedSearchForm, BulkTransactionForm)
 from .models import (Profile, Transaction, Category, Account, Budget, RecurringTransaction, 
-                    TransactionSplit, TransactionTemplate, SavingsGoal, GoalContribution, Bill)
+                    TransactionSplit, TransactionTemplate, SavingsGoal, GoalContribution, Bill, ImportJob,
+                    ReportJob, RequestProfile, SlowQuery, DataVersion)
+from .utils import metrics
+from .utils.widgets import async_login_required
 import csv
-from io import TextIOWrapper
 from django.utils import timezone
 from datetime import date
 
@@ -51,7 +55,7 @@ def profile(request):
 
 @login_required
 def transactions(request):
-    qs = Transaction.objects.filter(user=request.user).select_related('category', 'account', 'transfer_account').prefetch_related('splits__category').order_by('-date', '-time')
+    qs = Transaction.objects.filter(user=request.user).select_related('category', 'account__user', 'transfer_account').prefetch_related('splits__category').order_by('-date', '-time')
 
     # filters
     q = request.GET.get('q')
@@ -101,6 +105,9 @@ def transaction_create(request):
             t.user = request.user
             t.save()
             messages.success(request, 'Transaction added.')
+            if Transaction.objects.filter(user=request.user, fingerprint=t.fingerprint).exclude(pk=t.pk).exists():
+                messages.warning(request, 'This looks like a duplicate of a transaction you already have. '
+                                          'Review your duplicates report if it was added by mistake.')
             return redirect('transactions')
     else:
         form = TransactionForm()
@@ -131,7 +138,7 @@ def transaction_edit(request, pk):
             return redirect('transactions')
     else:
         form = TransactionForm(instance=t)
-    splits = t.splits.all()
+    splits = t.splits.select_related('category')
     return render(request, 'transaction_form.html', {'form': form, 'edit': True, 'transaction': t, 'splits': splits})
 
 
@@ -145,15 +152,36 @@ def transaction_delete(request, pk):
     return render(request, 'transaction_confirm_delete.html', {'object': t})
 
 
+@login_required
+def transaction_duplicates(request):
+    """Reviewable report of likely duplicate transactions"""
+    from .utils.dedup import find_near_duplicates
+
+    try:
+        days = max(0, min(int(request.GET.get('days', 2)), 7))
+    except ValueError:
+        days = 2
+    pairs = find_near_duplicates(request.user, days=days)
+    ids = {pk for pair in pairs for pk in pair[:2]}
+    by_id = Transaction.objects.filter(user=request.user, pk__in=ids).select_related('category', 'account').in_bulk()
+    duplicates = [
+        {'first': by_id[a], 'second': by_id[b], 'similarity': round(similarity * 100)}
+        for a, b, similarity in pairs if a in by_id and b in by_id
+    ]
+    return render(request, 'transaction_duplicates.html', {'duplicates': duplicates, 'days': days})
+
+
 @login_required
 def export_transactions_csv(request):
-    qs = Transaction.objects.filter(user=request.user).order_by('-date')
+    qs = Transaction.objects.filter(user=request.user).select_related(
+        'category', 'account'
+    ).prefetch_related('splits__category').order_by('-date')
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename=transactions.csv'
     writer = csv.writer(response)
     # include split rows after their parent transaction
     writer.writerow(['date', 'time', 'type', 'amount', 'category', 'account', 'description', 'tags', 'parent_id', 'is_split', 'split_category', 'split_amount'])
-    for t in qs:
+    for t in qs.iterator(chunk_size=2000):
         writer.writerow([t.date, t.time, t.trans_type, t.amount, t.category and t.category.name, t.account and t.account.name, t.description, t.tags, '', '0', '', ''])
         for s in t.splits.all():
             writer.writerow([t.date, t.time, '', '', '', '', '', '', t.pk, '1', s.category and s.category.name, s.amount])
@@ -162,34 +190,162 @@ def export_transactions_csv(request):
 
 @login_required
 def import_transactions_csv(request):
+    from .utils.importers import TransactionImporter, detect_file_format, read_rows, run_import_job
+    from .utils.jobs import dispatch
+
+    report = None
     if request.method == 'POST':
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            f = TextIOWrapper(request.FILES['file'].file, encoding='utf-8')
-            reader = csv.DictReader(f)
-            count = 0
-            for row in reader:
-                try:
-                    t = Transaction(
-                        user=request.user,
-                        amount=row.get('amount', 0) or 0,
-                        date=row.get('date') or date.today(),
-                        description=row.get('description', ''),
-                        trans_type=row.get('type', 'expense'),
-                    )
-                    cat_name = row.get('category')
-                    if cat_name:
-                        cat, _ = Category.objects.get_or_create(name=cat_name)
-                        t.category = cat
-                    t.save()
-                    count += 1
-                except Exception:
-                    continue
-            messages.success(request, f'Imported {count} transactions.')
-            return redirect('transactions')
+            upload = form.cleaned_data['file']
+            column_mapping = form.column_mapping()
+            file_format = detect_file_format(upload.name, form.cleaned_data['file_format'])
+
+            # Large files are imported in the background so they don't tie up a web worker
+            if upload.size > settings.IMPORT_ASYNC_THRESHOLD:
+                job = ImportJob.objects.create(
+                    user=request.user,
+                    file=upload,
+                    original_name=upload.name,
+                    file_format=file_format,
+                    file_size=upload.size,
+                    column_mapping=column_mapping,
+                    skip_duplicates=form.cleaned_data['skip_duplicates'],
+                )
+                dispatch('tracker.tasks.process_import_job', run_import_job, job.pk)
+                messages.info(request, f'"{upload.name}" is being imported in the background.')
+                return redirect('import_job_detail', pk=job.pk)
+
+            importer = TransactionImporter(
+                request.user, skip_duplicates=form.cleaned_data['skip_duplicates']
+            ).run(read_rows(upload.file, file_format, column_mapping))
+            if not importer.error_count:
+                messages.success(request, f'Imported {importer.imported} transactions.')
+                return redirect('transactions')
+            messages.warning(request, f'Imported {importer.imported} transactions, skipped {importer.error_count} rows.')
+            report = importer
     else:
         form = CSVUploadForm()
-    return render(request, 'import_csv.html', {'form': form})
+    recent_jobs = ImportJob.objects.filter(user=request.user)[:5]
+    return render(request, 'import_csv.html', {'form': form, 'report': report, 'recent_jobs': recent_jobs})
+
+
+@staff_member_required
+def query_report_view(request):
+    """Staff JSON report of the worst query offenders seen per view"""
+    from django.core.cache import cache
+    from .middleware import OFFENDERS_CACHE_KEY
+
+    offenders = cache.get(OFFENDERS_CACHE_KEY) or {}
+    if request.method == 'POST' and request.POST.get('clear'):
+        cache.delete(OFFENDERS_CACHE_KEY)
+        offenders = {}
+    ranked = sorted(offenders.items(), key=lambda item: item[1]['query_count'], reverse=True)
+    return JsonResponse({'offenders': [dict(report, view=name) for name, report in ranked]})
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, aggregated across all worker processes.
+
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``;
+    staff users can also view it in the browser.
+    """
+    from django.utils.crypto import constant_time_compare
+
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and constant_time_compare(header, f"Bearer {token}")
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def slow_queries_view(request):
+    """Staff list of slow query fingerprints with their EXPLAIN plans"""
+    queries = SlowQuery.objects.all()
+    source = request.GET.get('source', '')
+    if source:
+        queries = queries.filter(source=source)
+    if request.method == 'POST' and request.POST.get('clear'):
+        queries.delete()
+        messages.success(request, 'Slow query log cleared.')
+        return redirect('slow_queries')
+    order = request.GET.get('order', 'total')
+    orderings = {'total': '-total_time_ms', 'max': '-max_time_ms', 'count': '-count', 'recent': '-last_seen'}
+    return render(request, 'slow_queries.html', {
+        'queries': queries.order_by(orderings.get(order, '-total_time_ms'))[:100],
+        'source': source,
+        'order': order,
+        'sources': SlowQuery.objects.order_by('source').values_list('source', flat=True).distinct(),
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+    })
+
+
+@staff_member_required
+def request_profiles_view(request):
+    """Staff list of stored request profiles, optionally filtered by URL name"""
+    profiles = RequestProfile.objects.select_related('user')
+    url_name = request.GET.get('view', '')
+    if url_name:
+        profiles = profiles.filter(url_name=url_name)
+    if request.method == 'POST' and request.POST.get('clear'):
+        for profile in profiles:
+            profile.delete()
+        messages.success(request, 'Profiles deleted.')
+        return redirect('request_profiles')
+    return render(request, 'request_profiles.html', {
+        'profiles': profiles[:100],
+        'url_name': url_name,
+        'url_names': RequestProfile.objects.order_by('url_name').values_list('url_name', flat=True).distinct(),
+    })
+
+
+@staff_member_required
+def request_profile_detail(request, pk):
+    """Top functions of one profile, with links to download the raw files"""
+    from .utils.profiling import top_functions
+
+    profile = get_object_or_404(RequestProfile.objects.select_related('user'), pk=pk)
+    with profile.pstats_file.open('rb') as f:
+        report = top_functions(f.read())
+    return render(request, 'request_profile.html', {'profile': profile, 'report': report})
+
+
+@staff_member_required
+def request_profile_download(request, pk, kind):
+    """Download a profile as pstats (for snakeviz/pstats) or collapsed stacks (for flamegraphs)"""
+    import os
+    from django.http import FileResponse, Http404
+
+    profile = get_object_or_404(RequestProfile, pk=pk)
+    files = {'pstats': profile.pstats_file, 'stacks': profile.stacks_file}
+    if kind not in files:
+        raise Http404
+    field = files[kind]
+    return FileResponse(field.open('rb'), as_attachment=True, filename=os.path.basename(field.name))
+
+
+@login_required
+def import_job_detail(request, pk):
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    return render(request, 'import_job.html', {'job': job})
+
+
+@login_required
+def import_job_status(request, pk):
+    """JSON progress for an import job, polled by the import page"""
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    return JsonResponse({
+        'status': job.status,
+        'progress': job.progress_percentage,
+        'processed_rows': job.processed_rows,
+        'imported_rows': job.imported_rows,
+        'error_count': job.error_count,
+        'duplicate_count': job.duplicate_count,
+        'finished': job.is_finished,
+        'message': job.message,
+    })
 
 
 @login_required
@@ -200,9 +356,10 @@ def dashboard(request):
     from django.core.cache import cache
     from decimal import Decimal
     
-    # Create cache key based on user and current date
-    cache_key = f'dashboard_data_{request.user.id}_{timezone.now().date()}'
+    # Create cache key based on user, current date and data version, so edits show up at once
+    cache_key = f'dashboard_data_{request.user.id}_{timezone.now().date()}_{DataVersion.current(request.user.id)}'
     cached_data = cache.get(cache_key)
+    metrics.record_cache('dashboard', bool(cached_data))
     
     if cached_data:
         return render(request, 'dashboard.html', cached_data)
@@ -237,7 +394,7 @@ def dashboard(request):
     expense_change = ((expenses - last_month_expenses) / last_month_expenses * 100) if last_month_expenses else 0
     
     # Account balances - single query
-    accounts = Account.objects.filter(user=request.user).only('balance')
+    accounts = Account.objects.filter(user=request.user).only('name', 'account_type', 'balance')
     total_balance = sum(float(acc.balance) for acc in accounts)
     
     # Recent transactions (last 5) - optimized query
@@ -259,18 +416,12 @@ def dashboard(request):
     by_category = sorted([{'category__name': k, 'total': v} for k, v in cat_totals.items()], key=lambda x: x['total'], reverse=True)[:6]
     
     # Budget analysis with alerts
-    budgets = Budget.objects.filter(user=request.user)
+    budgets = Budget.objects.filter(user=request.user).select_related('category').with_spent(start=start_month, end=today)
     budget_data = []
     budget_alerts = []
     
     for b in budgets:
-        spent = Transaction.objects.filter(
-            user=request.user, 
-            category=b.category, 
-            trans_type='expense',
-            date__gte=start_month, 
-            date__lte=today
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        spent = b.spent
         
         pct = (spent / b.amount * 100) if b.amount and b.amount > 0 else 0
         remaining = float(b.amount) - float(spent)
@@ -351,7 +502,9 @@ def calculate_financial_health_score(user, income, expenses, total_balance):
     from decimal import Decimal
     score = 0
     
-    # Convert total_balance to Decimal for consistent arithmetic
+    # Convert to Decimal for consistent arithmetic; the dashboard passes floats
+    income = Decimal(str(income))
+    expenses = Decimal(str(expenses))
     total_balance = Decimal(str(total_balance))
     
     # Savings rate (40 points max)
@@ -378,19 +531,10 @@ def calculate_financial_health_score(user, income, expenses, total_balance):
             score += 10
     
     # Budget adherence (20 points max)
-    budgets = Budget.objects.filter(user=user)
-    if budgets.exists():
-        over_budget_count = 0
-        for budget in budgets:
-            spent = Transaction.objects.filter(
-                user=user, 
-                category=budget.category, 
-                trans_type='expense'
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            if spent > budget.amount:
-                over_budget_count += 1
-        
-        adherence_rate = 1 - (over_budget_count / budgets.count())
+    budgets = list(Budget.objects.filter(user=user).with_spent())
+    if budgets:
+        over_budget_count = sum(1 for budget in budgets if budget.spent > budget.amount)
+        adherence_rate = 1 - (over_budget_count / len(budgets))
         score += adherence_rate * 20
     else:
         score += 10  # Bonus for having budgets set up
@@ -452,7 +596,7 @@ def generate_spending_insights(user, transactions, by_category, current_expenses
 
 @login_required
 def budgets_list(request):
-    qs = Budget.objects.filter(user=request.user).order_by('-created_at')
+    qs = Budget.objects.filter(user=request.user).select_related('category').order_by('-created_at')
     return render(request, 'budgets_list.html', {'budgets': qs})
 
 
@@ -586,7 +730,7 @@ def split_delete(request, pk):
 # Transaction Templates Views
 @login_required
 def templates_list(request):
-    templates = TransactionTemplate.objects.filter(user=request.user).order_by('-use_count', 'name')
+    templates = TransactionTemplate.objects.filter(user=request.user).select_related('category', 'account').order_by('-use_count', 'name')
     return render(request, 'templates_list.html', {'templates': templates})
 
 
@@ -653,7 +797,7 @@ def goal_detail(request, pk):
     # Get recent contributions for this goal (last 5)
     recent_contributions = GoalContribution.objects.filter(
         goal=goal
-    ).order_by('-date_created')[:5]
+    ).order_by('-date', '-created_at')[:5]
     
     # Calculate days remaining if there's a target date
     days_remaining = None
@@ -675,6 +819,9 @@ def goal_detail(request, pk):
     }
     
     return render(request, 'goal_detail.html', context)
+
+
+@login_required
 def goal_contribute(request, pk):
     goal = get_object_or_404(SavingsGoal, pk=pk, user=request.user)
     remaining_balance = goal.target_amount - goal.current_amount
@@ -734,13 +881,10 @@ def goal_delete(request, pk):
 def bills_list(request):
     from django.utils import timezone
     
-    bills = Bill.objects.filter(user=request.user).order_by('due_date')
+    bills = Bill.objects.filter(user=request.user).select_related('category').order_by('due_date')
     
-    # Update overdue status
-    for bill in bills:
-        if bill.is_overdue and bill.status == 'pending':
-            bill.status = 'overdue'
-            bill.save()
+    # Update overdue status in one query
+    bills.filter(status='pending', due_date__lt=timezone.now().date()).update(status='overdue')
     
     # Separate bills by status
     upcoming_bills = bills.filter(status='pending', due_date__gte=timezone.now().date())
@@ -798,7 +942,9 @@ def transactions_advanced(request):
     bulk_form = BulkTransactionForm(user=request.user)
     
     # Start with all user transactions
-    qs = Transaction.objects.filter(user=request.user).order_by('-date', '-time')
+    qs = Transaction.objects.filter(user=request.user).select_related(
+        'category', 'account', 'transfer_account'
+    ).order_by('-date', '-time')
     
     # Apply search filters
     if search_form.is_valid():
@@ -831,7 +977,7 @@ def transactions_advanced(request):
         'transactions': transactions,
         'search_form': search_form,
         'bulk_form': bulk_form,
-        'total_count': qs.count()
+        'total_count': paginator.count
     })
 
 
@@ -840,6 +986,8 @@ def transactions_bulk_action(request):
     from .forms import BulkTransactionForm
     import csv
     from django.http import HttpResponse
+    from django.db import transaction as db_transaction
+    from .utils import change_events
     
     if request.method == 'POST':
         form = BulkTransactionForm(request.POST, user=request.user)
@@ -862,7 +1010,10 @@ def transactions_bulk_action(request):
             elif action == 'change_category':
                 category = form.cleaned_data['category']
                 if category:
-                    count = transactions.update(category=category)
+                    with db_transaction.atomic():
+                        change_events.record_recategorized(transactions, category)
+                        count = transactions.update(category=category)
+                        DataVersion.bump(request.user.id)
                     messages.success(request, f'Updated category for {count} transactions.')
                 else:
                     messages.error(request, 'Please select a category.')
@@ -906,51 +1057,45 @@ def transactions_bulk_action(request):
 
 # Enhanced Dashboard and Analytics Views
 
-@login_required
-def dashboard_enhanced(request):
-    """Enhanced dashboard with charts and advanced analytics"""
-    from django.db.models import Q, Count
-    from datetime import datetime, timedelta
-    import json
-    
-    today = timezone.now().date()
-    current_month = today.replace(day=1)
-    last_month = (current_month - timedelta(days=1)).replace(day=1)
-    
-    # Basic statistics
-    current_month_income = Transaction.objects.filter(
-        user=request.user, trans_type='income', date__gte=current_month
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    current_month_expenses = Transaction.objects.filter(
-        user=request.user, trans_type='expense', date__gte=current_month
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    last_month_income = Transaction.objects.filter(
-        user=request.user, trans_type='income', 
-        date__gte=last_month, date__lt=current_month
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    last_month_expenses = Transaction.objects.filter(
-        user=request.user, trans_type='expense',
-        date__gte=last_month, date__lt=current_month
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
+def dashboard_summary(user, current_month, last_month):
+    """This and last month's income and expenses, in one query"""
+    from django.db.models import Q
+
+    totals = Transaction.objects.filter(user=user, date__gte=last_month).aggregate(
+        current_month_income=Sum('amount', filter=Q(trans_type='income', date__gte=current_month)),
+        current_month_expenses=Sum('amount', filter=Q(trans_type='expense', date__gte=current_month)),
+        last_month_income=Sum('amount', filter=Q(trans_type='income', date__lt=current_month)),
+        last_month_expenses=Sum('amount', filter=Q(trans_type='expense', date__lt=current_month)),
+    )
+    current_month_income = totals['current_month_income'] or 0
+    current_month_expenses = totals['current_month_expenses'] or 0
+    last_month_income = totals['last_month_income'] or 0
+    last_month_expenses = totals['last_month_expenses'] or 0
+
     # Calculate percentage changes
-    income_change = ((current_month_income - last_month_income) / last_month_income * 100) if last_month_income else 0
-    expense_change = ((current_month_expenses - last_month_expenses) / last_month_expenses * 100) if last_month_expenses else 0
-    
-    # Account balances
-    total_balance = Account.objects.filter(user=request.user).aggregate(
-        Sum('balance'))['balance__sum'] or 0
-    
-    # Category breakdown for pie chart
+    return {
+        'current_month_income': current_month_income,
+        'current_month_expenses': current_month_expenses,
+        'net_savings': current_month_income - current_month_expenses,
+        'income_change': ((current_month_income - last_month_income) / last_month_income * 100) if last_month_income else 0,
+        'expense_change': ((current_month_expenses - last_month_expenses) / last_month_expenses * 100) if last_month_expenses else 0,
+    }
+
+
+def dashboard_balance(user):
+    return Account.objects.filter(user=user).aggregate(Sum('balance'))['balance__sum'] or 0
+
+
+def dashboard_category_data(user, current_month):
+    """Top ten expense categories this month, for the pie chart"""
+    import json
+
     category_data_raw = Transaction.objects.filter(
-        user=request.user, trans_type='expense', date__gte=current_month
+        user=user, trans_type='expense', date__gte=current_month
     ).values('category__name').annotate(
         total=Sum('amount')
     ).order_by('-total')[:10]
-    
+
     # Convert Decimal values to float for JSON serialization
     category_data = []
     for item in category_data_raw:
@@ -958,31 +1103,35 @@ def dashboard_enhanced(request):
             'category__name': item['category__name'],
             'total': float(item['total']) if item['total'] else 0.0
         })
-    
-    # Daily spending trend for line chart (last 30 days)
+    return json.dumps(category_data)
+
+
+def dashboard_daily_spending(user, today):
+    """Daily spending trend for the line chart (last 30 days)"""
+    from datetime import timedelta
+    import json
+
     thirty_days_ago = today - timedelta(days=30)
+    spending_by_day = dict(Transaction.objects.filter(
+        user=user, trans_type='expense',
+        date__gte=thirty_days_ago, date__lt=thirty_days_ago + timedelta(days=30)
+    ).values('date').annotate(total=Sum('amount')).values_list('date', 'total'))
     daily_spending = []
     for i in range(30):
         day = thirty_days_ago + timedelta(days=i)
-        spending = Transaction.objects.filter(
-            user=request.user, trans_type='expense', date=day
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
         daily_spending.append({
             'date': day.strftime('%Y-%m-%d'),
-            'amount': float(spending)
+            'amount': float(spending_by_day.get(day) or 0)
         })
-    
-    # Budget progress
-    budgets = Budget.objects.filter(user=request.user)
+    return json.dumps(daily_spending)
+
+
+def dashboard_budget_progress(user, current_month):
+    budgets = Budget.objects.filter(user=user).with_spent(start=current_month, use_budget_dates=True)
     budget_progress = []
     for budget in budgets:
-        spent = Transaction.objects.filter(
-            user=request.user,
-            category=budget.category,
-            trans_type='expense',
-            date__gte=budget.start_date or current_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
+        spent = budget.spent
+
         progress_percent = (spent / budget.amount * 100) if budget.amount else 0
         budget_progress.append({
             'name': budget.name,
@@ -991,61 +1140,150 @@ def dashboard_enhanced(request):
             'progress': min(100, progress_percent),
             'status': 'danger' if progress_percent > 90 else 'warning' if progress_percent > 75 else 'success'
         })
-    
-    # Financial health score
-    from .models import FinancialHealthScore, Notification
-    health_score, created = FinancialHealthScore.objects.get_or_create(user=request.user)
+    return budget_progress
+
+
+def dashboard_health_score(user):
+    """The user's financial health score, recalculated when a day old"""
+    from .models import FinancialHealthScore
+
+    health_score, created = FinancialHealthScore.objects.get_or_create(user=user)
     if created or (timezone.now() - health_score.last_calculated).days >= 1:
         health_score.calculate_score()
-    
-    # Recent notifications
-    notifications = Notification.objects.filter(user=request.user, is_read=False)[:5]
-    
-    # Savings goals progress
-    goals = SavingsGoal.objects.filter(user=request.user, status='active')
-    
-    context = {
-        'current_month_income': current_month_income,
-        'current_month_expenses': current_month_expenses,
-        'net_savings': current_month_income - current_month_expenses,
-        'total_balance': total_balance,
-        'income_change': income_change,
-        'expense_change': expense_change,
-        'category_data': json.dumps(category_data),
-        'daily_spending': json.dumps(daily_spending),
-        'budget_progress': budget_progress,
-        'health_score': health_score,
-        'notifications': notifications,
-        'goals': goals,
-    }
-    
-    return render(request, 'dashboard_enhanced.html', context)
+    return health_score
+
+
+def dashboard_notifications(user):
+    from .models import Notification
+
+    return list(Notification.objects.filter(user=user, is_read=False)[:5])
+
+
+def dashboard_goals(user):
+    return list(SavingsGoal.objects.filter(user=user, status='active'))
+
+
+@async_login_required
+async def dashboard_enhanced(request):
+    """Enhanced dashboard with charts and advanced analytics.
+
+    The sections query independently, so they load concurrently and one
+    that fails or is slow is shown as unavailable instead of failing the page.
+    """
+    from asgiref.sync import sync_to_async
+    from datetime import timedelta
+    from .utils.widgets import load_widgets
+
+    user = request.user
+    today = timezone.now().date()
+    current_month = today.replace(day=1)
+    last_month = (current_month - timedelta(days=1)).replace(day=1)
+
+    sections, degraded = await load_widgets({
+        'summary': (dashboard_summary, (user, current_month, last_month), None),
+        'total_balance': (dashboard_balance, (user,), None),
+        'category_data': (dashboard_category_data, (user, current_month), '[]'),
+        'daily_spending': (dashboard_daily_spending, (user, today), '[]'),
+        'budget_progress': (dashboard_budget_progress, (user, current_month), []),
+        'health_score': (dashboard_health_score, (user,), None),
+        'notifications': (dashboard_notifications, (user,), []),
+        'goals': (dashboard_goals, (user,), []),
+    })
+    context = dict(sections.pop('summary') or {}, **sections)
+    context['degraded'] = degraded
+
+    return await sync_to_async(render)(request, 'dashboard_enhanced.html', context)
 
 
 @login_required
 def notifications_view(request):
     """View and manage notifications"""
-    from .models import Notification
-    notifications = Notification.objects.filter(user=request.user)
+    from urllib.parse import urlencode
+    from django.core.paginator import Paginator
+    from django.urls import reverse
+    from .models import Notification, NotificationCounter
     
     # Mark as read if requested
     if request.method == 'POST':
         notification_id = request.POST.get('notification_id')
         if notification_id:
-            try:
-                notification = Notification.objects.get(id=notification_id, user=request.user)
-                notification.is_read = True
-                notification.save()
+            changed = Notification.mark_read(request.user.id, pk=notification_id)
+            if changed or Notification.objects.filter(id=notification_id, user=request.user).exists():
                 messages.success(request, 'Notification marked as read.')
-            except Notification.DoesNotExist:
+            else:
                 messages.error(request, 'Notification not found.')
         
         # Mark all as read
         elif request.POST.get('mark_all_read'):
-            notifications.update(is_read=True)
+            Notification.mark_read(request.user.id)
             messages.success(request, 'All notifications marked as read.')
+        page = request.GET.get('page')
+        return redirect(f"{reverse('notifications')}?{urlencode({'page': page})}" if page else 'notifications')
     
-    return render(request, 'notifications.html', {'notifications': notifications})
+    paginator = Paginator(Notification.objects.filter(user=request.user), settings.NOTIFICATIONS_PER_PAGE)
+    notifications = paginator.get_page(request.GET.get('page'))
+    return render(request, 'notifications.html', {
+        'notifications': notifications,
+        'unread_count': NotificationCounter.unread_for(request.user.id),
+    })
+
+
+@login_required
+def notification_count(request):
+    """Unread count for the navbar badge, read from the user's counter row"""
+    from .models import NotificationCounter
+    response = JsonResponse({'unread': NotificationCounter.unread_for(request.user.id)})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+async def event_stream(request):
+    """Server-sent events for the signed-in user's open pages; served under ASGI only"""
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from .utils.events import get_broker, sse_stream
+
+    if not isinstance(request, ASGIRequest):
+        # 204 tells EventSource not to reconnect; the page falls back to long polling
+        return HttpResponse(status=204)
+    user_id = await sync_to_async(lambda: request.user.id if request.user.is_authenticated else None)()
+    if user_id is None:
+        return HttpResponse(status=401)
+    current = await sync_to_async(get_broker().last_id, thread_sensitive=False)(user_id)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_id') or ''
+    # Ids ahead of the broker come from before a restart of a LocalBroker process
+    last_id = min(int(last_id), current) if last_id.isdigit() else current
+    response = StreamingHttpResponse(sse_stream(user_id, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+
+@login_required
+def event_poll(request):
+    """Long-poll fallback for event_stream.
+
+    Without ``last_id`` this returns at once with the current id to wait
+    from; with it, it waits up to EVENTS_LONG_POLL_TIMEOUT for new events.
+    """
+    from django.db import connection
+    from .utils.events import event_payload, get_broker
+
+    broker = get_broker()
+    current = broker.last_id(request.user.id)
+    last_id = request.GET.get('last_id', '')
+    # Ids ahead of the broker come from before a restart of a LocalBroker process
+    if not last_id.isdigit() or int(last_id) > current:
+        return JsonResponse({'events': [], 'last_id': current})
+    last_id = int(last_id)
+    # Nothing below touches the database; don't hold a connection while waiting
+    connection.close()
+    events = broker.wait(request.user.id, last_id, settings.EVENTS_LONG_POLL_TIMEOUT)
+    return JsonResponse({
+        'events': [event_payload(entry) for entry in events],
+        'last_id': events[-1][0] if events else last_id,
+    })
 
 
 @login_required
@@ -1112,12 +1350,20 @@ def financial_health_view(request):
 
 @login_required
 def generate_pdf_report_view(request):
-    """Generate and download PDF reports"""
-    from .utils.reports import generate_pdf_report
-    from datetime import datetime
+    """Download a PDF report, queueing a background job when it isn't rendered yet.
+
+    ``type`` is monthly, quarterly, yearly or custom; ``start_date`` picks
+    the month, quarter or year, and custom ranges also take ``end_date``.
+    """
+    from django.db import transaction as db_transaction
+    from .utils.jobs import dispatch
+    from .utils.reports import find_cached_report, report_file_response, report_period, run_report_job
+    from datetime import datetime, timedelta
     
     # Get parameters
     report_type = request.GET.get('type', 'monthly')
+    if report_type not in dict(ReportJob.REPORT_TYPES):
+        report_type = 'monthly'
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     
@@ -1133,13 +1379,70 @@ def generate_pdf_report_view(request):
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         except ValueError:
             end_date = None
-    
-    try:
-        return generate_pdf_report(request.user, report_type, start_date, end_date)
-    except Exception as e:
-        messages.error(request, f'Error generating report: {str(e)}')
+    start_date, end_date = report_period(start_date, end_date, report_type)
+    if start_date > end_date:
+        messages.error(request, 'The report start date must be before its end date.')
         return redirect('dashboard_enhanced')
 
+    cached = find_cached_report(request.user, report_type, start_date, end_date)
+    if cached:
+        return report_file_response(*cached)
+
+    # Rendering takes seconds, so it runs outside the request; a report
+    # already being rendered is not queued twice. A job unfinished after
+    # REPORT_JOB_TIMEOUT was lost (worker crash or restart) and is replaced
+    queued = ReportJob.objects.filter(
+        user=request.user, report_type=report_type, start_date=start_date, end_date=end_date,
+        status__in=('pending', 'running'),
+    )
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    queued.filter(created_at__lt=cutoff).update(
+        status='failed', message='The report job did not finish in time', finished_at=timezone.now(),
+    )
+    job = queued.filter(created_at__gte=cutoff).first()
+    if job is None:
+        job = ReportJob.objects.create(
+            user=request.user, report_type=report_type, start_date=start_date, end_date=end_date,
+        )
+        # The worker must be able to see the job row
+        db_transaction.on_commit(lambda: dispatch('tracker.tasks.process_report_job', run_report_job, job.pk))
+    return redirect('report_job_detail', pk=job.pk)
+
+
+@login_required
+def report_job_detail(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk, user=request.user)
+    return render(request, 'report_job.html', {'job': job})
+
+
+@login_required
+def report_job_status(request, pk):
+    """JSON status for a report job, polled by the report page"""
+    job = get_object_or_404(ReportJob, pk=pk, user=request.user)
+    return JsonResponse({
+        'status': job.status,
+        'finished': job.is_finished,
+        'message': job.message,
+    })
+
+
+@login_required
+def report_job_download(request, pk):
+    """Serve the PDF rendered by a finished report job"""
+    from django.core.files.storage import default_storage
+    from django.urls import reverse
+    from .utils.reports import report_file_response
+
+    job = get_object_or_404(ReportJob, pk=pk, user=request.user)
+    if job.status != 'completed':
+        return redirect('report_job_detail', pk=job.pk)
+    if not default_storage.exists(job.file_path):
+        # A newer render of the same report replaced this file
+        messages.info(request, 'Your data changed since this report was generated; generating it again.')
+        query = f"type={job.report_type}&start_date={job.start_date}&end_date={job.end_date}"
+        return redirect(f"{reverse('generate_pdf_report')}?{query}")
+    return report_file_response(job.file_path, job.filename)
+
 
 @login_required
 def advanced_search_view(request):
@@ -1196,7 +1499,7 @@ def advanced_search_view(request):
         return JsonResponse({'suggestions': list(suggestions)})
     
     # Handle search form submission
-    transactions = Transaction.objects.filter(user=request.user)
+    transactions = Transaction.objects.filter(user=request.user).select_related('category', 'account')
     
     # Get search parameters
     query = request.GET.get('q', '')
@@ -1405,16 +1708,15 @@ def calendar_view(request):
     return render(request, 'calendar_view.html', context)
 
 
-@login_required
-def ai_insights_view(request):
+@async_login_required
+async def ai_insights_view(request):
     """AI-powered financial insights and predictions"""
-    from django.db.models import Avg, Count
-    from datetime import datetime, timedelta
-    import json
-    
+    from asgiref.sync import sync_to_async
+    from datetime import timedelta
+    from .utils.widgets import load_widgets
+
     today = timezone.now().date()
     current_month = today.replace(day=1)
-    last_month = (current_month - timedelta(days=1)).replace(day=1)
     three_months_ago = (current_month - timedelta(days=90)).replace(day=1)
     
     # Get user's transaction data for analysis
@@ -1423,26 +1725,16 @@ def ai_insights_view(request):
         date__gte=three_months_ago
     ).select_related('category', 'account')
     
-    # Generate AI insights
-    insights = generate_ai_insights(request.user, recent_transactions)
-    
-    # Spending predictions
-    predictions = generate_spending_predictions(request.user, recent_transactions)
-    
-    # Category analysis
-    category_insights = analyze_spending_categories(request.user, recent_transactions)
-    
-    # Savings opportunities
-    savings_opportunities = find_savings_opportunities(request.user, recent_transactions)
-    
-    context = {
-        'insights': insights,
-        'predictions': predictions,
-        'category_insights': category_insights,
-        'savings_opportunities': savings_opportunities,
-    }
+    # The analyses are independent; each gets its own copy of the queryset
+    context, degraded = await load_widgets({
+        'insights': (generate_ai_insights, (request.user, recent_transactions.all()), []),
+        'predictions': (generate_spending_predictions, (request.user, recent_transactions.all()), []),
+        'category_insights': (analyze_spending_categories, (request.user, recent_transactions.all()), []),
+        'savings_opportunities': (find_savings_opportunities, (request.user, recent_transactions.all()), []),
+    })
+    context['degraded'] = degraded
     
-    return render(request, 'ai_insights.html', context)
+    return await sync_to_async(render)(request, 'ai_insights.html', context)
 
 
 def generate_ai_insights(user, transactions):